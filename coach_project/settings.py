@@ -4,6 +4,7 @@ import os
 from pathlib import Path
 import dj_database_url
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 from datetime import timedelta
 import datetime
 
@@ -24,6 +25,10 @@ DEBUG = os.environ.get('DEBUG', 'False').lower() == 'true'
 BONUS_SESSION_START_TIME = datetime.time(6, 0, 0)  # 6:00 AM
 BONUS_SESSION_AMOUNT = 22.00
 
+# Player and coach photo renditions are made by a background thread after each upload.
+# Set to false to leave them to `manage.py process_photos` (e.g. from cron).
+PHOTO_PROCESSING_IN_BACKGROUND = os.environ.get('PHOTO_PROCESSING_IN_BACKGROUND', 'True').lower() == 'true'
+
 
 # React App Path
 
@@ -131,6 +136,29 @@ DATABASES = {
     )
 }
 
+# --- Cache ---
+# Dashboard fragments and other per-user caches are invalidated by bumping version
+# keys, so every worker process must share one cache. Production defaults to the
+# database cache (create its table with `manage.py createcachetable`); LocMem, which
+# each process keeps to itself, is only the default for a local DEBUG runserver.
+# CACHE_BACKEND/CACHE_LOCATION select another shared backend, e.g. Redis.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or (
+    'django.core.cache.backends.locmem.LocMemCache' if DEBUG else 'django.core.cache.backends.db.DatabaseCache'
+)
+if CACHE_BACKEND.endswith('.LocMemCache') and not DEBUG:
+    raise ImproperlyConfigured(
+        "LocMemCache is not shared between worker processes, so cache invalidation would not "
+        "reach them. Set CACHE_BACKEND to a shared cache in production."
+    )
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION') or (
+            'squashsync-default' if CACHE_BACKEND.endswith('.LocMemCache') else 'squashsync_cache'
+        ),
+    }
+}
+
 # --- Password Validation ---
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -19,11 +19,14 @@ from .models import (
     CoachSessionCompletion,
     Venue,
     GroupAssessment,
-    Event  # <<< Make sure Event is imported
+    Event,  # <<< Make sure Event is imported
+    PlayerGroupMembership
 )
 
 # Import the service function for generating sessions
 from .session_generation_service import generate_sessions_for_rules 
+from .conflicts import build_conflict_index, describe_conflicts
+from .photo_service import photo_urls
 
 User = get_user_model()
 
@@ -120,17 +123,17 @@ class CoachAdmin(admin.ModelAdmin):
             'whatsapp_phone_number', 'whatsapp_opt_in', 
             'receive_weekly_schedule_email' # <<< ADDED HERE
         )}),
-        ('Profile & Qualifications', {'fields': ('profile_photo', 'profile_photo_thumbnail', 'experience_notes', 'qualification_wsf_level', 'qualification_ssa_level')}),
+        ('Profile & Qualifications', {'fields': ('profile_photo', 'profile_photo_thumbnail', 'profile_photo_status', 'experience_notes', 'qualification_wsf_level', 'qualification_ssa_level')}),
         ('Financial', {'fields': ('hourly_rate',)}),
     )
-    readonly_fields = ('profile_photo_thumbnail',)
+    readonly_fields = ('profile_photo_thumbnail', 'profile_photo_status')
     raw_id_fields = ('user',)
     actions = ['trigger_payslip_generation_action']
 
     @admin.display(description='Photo')
     def profile_photo_thumbnail(self, obj):
         if obj.profile_photo:
-            return format_html('<img src="{}" style="width: 45px; height: 45px; border-radius: 50%; object-fit: cover;" />', obj.profile_photo.url)
+            return format_html('<img src="{}" style="width: 45px; height: 45px; border-radius: 50%; object-fit: cover;" />', photo_urls(obj, 'thumb')[1])
         return "No photo"
     profile_photo_thumbnail.short_description = 'Photo'
 
@@ -195,6 +198,15 @@ class SessionAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
         if obj.school_group and (not change or (change and not Session.objects.get(pk=obj.pk).school_group)):
             players_in_group = obj.school_group.players.filter(is_active=True); obj.attendees.set(players_in_group)
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        session = form.instance
+        if session.is_cancelled: return
+        # Warn, but don't block: a double-booking is sometimes intended (e.g. a coach covering two courts).
+        coaches = list(session.coaches_attending.all())
+        conflicts = build_conflict_index(session.session_date, session.session_date).session_conflicts(session, [coach.pk for coach in coaches])
+        for warning in describe_conflicts(conflicts, {coach.pk: coach.name for coach in coaches}):
+            self.message_user(request, f"Double-booking: {warning}", messages.WARNING)
     @admin.display(description='Assigned Coaches')
     def get_assigned_coaches_display(self, obj): return ", ".join([coach.name for coach in obj.coaches_attending.all()])
     @admin.display(description='Generated by Rule', ordering='generated_from_rule__school_group__name')
@@ -329,6 +341,8 @@ class ScheduledClassAdmin(admin.ModelAdmin):
                 self.message_user(request, f"Session Generation Complete: {results['created']} created, {results['skipped_exists']} skipped (already exist/clashed), {results['errors']} errors.", messages.SUCCESS if results['errors'] == 0 else messages.WARNING)
                 for detail in results['details']:
                     self.message_user(request, detail, messages.INFO)
+                for warning in results.get('conflicts', []):
+                    self.message_user(request, f"Double-booking: {warning}", messages.WARNING)
                 return HttpResponseRedirect(request.get_full_path())
             else:
                 self.message_user(request, "Please correct the errors below.", messages.ERROR)
@@ -390,4 +404,13 @@ class CoachSessionCompletionAdmin(admin.ModelAdmin):
     list_select_related = ('coach', 'session', 'session__school_group')
     readonly_fields = ('last_updated',); fields = ('coach', 'session', 'assessments_submitted', 'confirmed_for_payment', 'last_updated')
     def session_display(self, obj): return str(obj.session)
-    session_display.short_description = 'Session'; session_display.admin_order_field = 'session__session_date'
\ No newline at end of file
+    session_display.short_description = 'Session'; session_display.admin_order_field = 'session__session_date'
+
+@admin.register(PlayerGroupMembership)
+class PlayerGroupMembershipAdmin(admin.ModelAdmin):
+    # Rows are kept by the school_groups signals; dates can be corrected here (e.g. true join dates).
+    list_display = ('player', 'school_group', 'start_date', 'end_date')
+    list_filter = ('school_group',)
+    search_fields = ('player__first_name', 'player__last_name', 'school_group__name')
+    list_select_related = ('player', 'school_group')
+    date_hierarchy = 'start_date'
@@ -0,0 +1,170 @@
+# planning/assessment_ledger.py
+
+"""
+Maintains CoachAssessmentLedger: one row per (assigned coach, session) holding the
+numbers the assessment reminders need (players to assess, assessed so far, group
+assessment done, marked complete).
+
+Rows are recomputed per session, set-based, whenever something that feeds them
+changes (see planning/signals.py). Bulk code paths that skip model signals must call
+refresh_assessment_ledger themselves. `manage.py rebuild_assessment_ledger`
+recomputes everything to repair drift.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import (
+    Session, SessionAssessment, GroupAssessment, CoachSessionCompletion, CoachAssessmentLedger
+)
+
+LEDGER_BATCH_SIZE = 500
+LEDGER_FIELDS = (
+    'session_date', 'session_ends_at', 'is_cancelled', 'expected_player_count',
+    'assessed_player_count', 'group_assessment_done', 'assessments_submitted',
+)
+
+
+def _session_ends_at(session):
+    end = session.end_datetime
+    if end is not None and timezone.is_naive(end):
+        end = timezone.make_aware(end)
+    return end
+
+
+def _ledger_values(session_ids):
+    """{(coach_id, session_id): {field: value}} for every assigned coach of the sessions."""
+    assignments = list(Session.coaches_attending.through.objects.filter(
+        session_id__in=session_ids
+    ).values_list('session_id', 'coach_id', 'coach__user_id'))
+    if not assignments:
+        return {}
+    sessions = {
+        session.pk: session for session in Session.objects.filter(pk__in=session_ids).only(
+            'session_date', 'session_start_time', 'planned_duration_minutes', 'is_cancelled'
+        )
+    }
+
+    attendee_link = Session.attendees.through
+    expected = dict(
+        attendee_link.objects.filter(session_id__in=session_ids).order_by()
+        .values('session_id').annotate(total=Count('*')).values_list('session_id', 'total')
+    )
+    # Only assessments of players who actually attended count towards the total.
+    assessed = {
+        (session_id, user_id): total
+        for session_id, user_id, total in SessionAssessment.objects.filter(
+            session_id__in=session_ids, submitted_by__isnull=False
+        ).filter(
+            Exists(attendee_link.objects.filter(session_id=OuterRef('session_id'), player_id=OuterRef('player_id')))
+        ).order_by().values('session_id', 'submitted_by_id').annotate(
+            total=Count('player_id', distinct=True)
+        ).values_list('session_id', 'submitted_by_id', 'total')
+    }
+    group_done = set(
+        GroupAssessment.objects.filter(session_id__in=session_ids, assessing_coach__isnull=False)
+        .values_list('session_id', 'assessing_coach_id')
+    )
+    submitted = set(
+        CoachSessionCompletion.objects.filter(session_id__in=session_ids, assessments_submitted=True)
+        .values_list('session_id', 'coach_id')
+    )
+
+    values = {}
+    for session_id, coach_id, user_id in assignments:
+        session = sessions.get(session_id)
+        if session is None:
+            continue  # Being deleted; the cascade removes its rows.
+        values[(coach_id, session_id)] = {
+            'session_date': session.session_date,
+            'session_ends_at': _session_ends_at(session),
+            'is_cancelled': session.is_cancelled,
+            'expected_player_count': expected.get(session_id, 0),
+            'assessed_player_count': assessed.get((session_id, user_id), 0),
+            'group_assessment_done': (session_id, user_id) in group_done,
+            'assessments_submitted': (session_id, coach_id) in submitted,
+        }
+    return values
+
+
+def refresh_assessment_ledger(session_ids):
+    """
+    Recomputes the ledger rows of the given sessions: adds rows for newly assigned
+    coaches, removes rows of coaches no longer assigned and rewrites rows whose
+    numbers changed. Unchanged rows are not written. Returns (created, updated, deleted).
+    """
+    session_ids = sorted({session_id for session_id in session_ids if session_id})
+    created = updated = deleted = 0
+    for offset in range(0, len(session_ids), LEDGER_BATCH_SIZE):
+        batch = session_ids[offset:offset + LEDGER_BATCH_SIZE]
+        with transaction.atomic():
+            values = _ledger_values(batch)
+            existing = {
+                (row.coach_id, row.session_id): row
+                for row in CoachAssessmentLedger.objects.filter(session_id__in=batch)
+            }
+
+            stale = [row.pk for key, row in existing.items() if key not in values]
+            if stale:
+                deleted += CoachAssessmentLedger.objects.filter(pk__in=stale).delete()[0]
+
+            to_create, to_update = [], []
+            now = timezone.now()
+            for (coach_id, session_id), fields in values.items():
+                row = existing.get((coach_id, session_id))
+                if row is None:
+                    to_create.append(CoachAssessmentLedger(coach_id=coach_id, session_id=session_id, **fields))
+                elif any(getattr(row, name) != value for name, value in fields.items()):
+                    for name, value in fields.items():
+                        setattr(row, name, value)
+                    row.updated_at = now  # bulk_update skips auto_now.
+                    to_update.append(row)
+            if to_create:
+                CoachAssessmentLedger.objects.bulk_create(to_create, batch_size=LEDGER_BATCH_SIZE)
+            if to_update:
+                CoachAssessmentLedger.objects.bulk_update(
+                    to_update, LEDGER_FIELDS + ('updated_at',), batch_size=LEDGER_BATCH_SIZE
+                )
+            created += len(to_create)
+            updated += len(to_update)
+    return created, updated, deleted
+
+
+def rebuild_assessment_ledger(since=None):
+    """Recomputes every ledger row (optionally only for sessions on or after `since`)."""
+    assigned = Session.coaches_attending.through.objects.values_list('session_id', flat=True)
+    tracked = CoachAssessmentLedger.objects.values_list('session_id', flat=True)
+    if since is not None:
+        assigned = assigned.filter(session__session_date__gte=since)
+        tracked = tracked.filter(session_date__gte=since)
+    return refresh_assessment_ledger(set(assigned) | set(tracked))
+
+
+def pending_ledger_entries(coach_profile, lookback_weeks, now=None):
+    """
+    Ledger rows for the coach's ended, non-cancelled sessions in the last `lookback_weeks`
+    that still owe player and/or group assessments, newest first. One indexed query.
+    """
+    now = now or timezone.now()
+    today = timezone.localtime(now).date()
+    return CoachAssessmentLedger.objects.filter(
+        coach=coach_profile,
+        session_date__gte=today - timedelta(weeks=lookback_weeks),
+        session_ends_at__lte=now,
+        is_cancelled=False,
+    ).filter(
+        Q(assessments_submitted=False) | Q(group_assessment_done=False)
+    ).select_related('session__school_group', 'session__venue').order_by(
+        '-session_date', '-session_ends_at'
+    )
+
+
+def ledger_for_period(start_date, end_date):
+    """{(coach_id, session_id): ledger row} for sessions between the dates (inclusive). One query."""
+    return {
+        (row.coach_id, row.session_id): row
+        for row in CoachAssessmentLedger.objects.filter(session_date__gte=start_date, session_date__lte=end_date)
+    }
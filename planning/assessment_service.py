@@ -0,0 +1,125 @@
+# planning/assessment_service.py
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .assessment_ledger import pending_ledger_entries, refresh_assessment_ledger
+from .models import Player, SessionAssessment, CoachSessionCompletion
+
+PENDING_LOOKBACK_WEEKS = 4
+ASSESSMENT_FIELDS = (
+    'effort_rating', 'focus_rating', 'resilience_rating',
+    'composure_rating', 'decision_making_rating', 'coach_notes',
+)
+
+
+class BulkAssessmentError(ValueError):
+    """Raised when a bulk assessment submission is rejected; nothing has been saved."""
+
+
+def get_pending_assessment_sessions(coach_profile, now=None):
+    """
+    Ended sessions from the last four weeks where the coach still owes player
+    and/or group assessments, newest first, as CoachAssessmentLedger rows (with
+    the session loaded). One indexed read of the ledger; see get_players_to_assess
+    for the players of one session.
+    """
+    return pending_ledger_entries(coach_profile, PENDING_LOOKBACK_WEEKS, now=now)
+
+
+def build_pending_items(entries):
+    """The per-session flags planning/pending_assessments.html shows, from the ledger rows only."""
+    items = []
+    for entry in entries:
+        has_players = entry.expected_player_count > 0
+        players_to_assess_count = entry.players_to_assess_count
+        items.append({
+            'session': entry.session,
+            'players_to_assess_count': players_to_assess_count,
+            'all_players_assessed_by_coach': has_players and players_to_assess_count == 0,
+            # Coaches may mark player assessments complete once everyone is assessed,
+            # or after at least one assessment when the list is long.
+            'coach_can_mark_player_assessments_complete': (
+                not entry.assessments_submitted and has_players and (
+                    players_to_assess_count == 0 or entry.assessed_player_count > 0
+                )
+            ),
+            'player_assessments_done': entry.assessments_submitted,
+            'group_assessment_submitted': entry.group_assessment_done,
+        })
+    return items
+
+
+def get_players_to_assess(session, user):
+    """Attendees of the session the coach has not assessed yet. One query."""
+    assessed = SessionAssessment.objects.filter(session=session, player=OuterRef('pk'), submitted_by=user)
+    return list(
+        Player.objects.filter(attended_sessions=session).filter(~Exists(assessed))
+        .order_by('last_name', 'first_name')
+    )
+
+
+def save_bulk_assessments(session, user, coach_profile, rows, mark_complete=False):
+    """
+    Saves one coach's assessments of many attendees of a session in one transaction.
+
+    rows maps player id to a dict of ASSESSMENT_FIELDS values (already validated, e.g.
+    by BulkAssessmentRowForm). Rows with no rating and no notes are skipped. Existing
+    assessments by this coach are updated with one bulk_update and the rest created with
+    one bulk_create, so the (session, player, submitted_by) uniqueness holds. The coach's
+    CoachSessionCompletion is confirmed for payment (as single assessments do) and, with
+    mark_complete, marked as submitted.
+
+    Returns {'created': n, 'updated': n}. Raises BulkAssessmentError if a player did not
+    attend the session.
+    """
+    from .signals import invalidate_dashboard
+
+    rows = {
+        int(player_id): values for player_id, values in rows.items()
+        if any(values.get(name) not in (None, '') for name in ASSESSMENT_FIELDS)
+    }
+    attendee_ids = set(session.attendees.filter(pk__in=list(rows)).values_list('pk', flat=True))
+    not_attending = set(rows) - attendee_ids
+    if not_attending:
+        raise BulkAssessmentError(f"Players did not attend this session: {sorted(not_attending)}")
+
+    with transaction.atomic():
+        existing = {
+            assessment.player_id: assessment
+            for assessment in SessionAssessment.objects.select_for_update().filter(
+                session=session, submitted_by=user, player_id__in=list(rows)
+            )
+        }
+        to_create, to_update = [], []
+        for player_id, values in rows.items():
+            assessment = existing.get(player_id)
+            if assessment is None:
+                assessment = SessionAssessment(
+                    session=session, player_id=player_id, submitted_by=user, date_recorded=session.session_date
+                )
+                to_create.append(assessment)
+            else:
+                to_update.append(assessment)
+            for name in ASSESSMENT_FIELDS:
+                value = values.get(name)
+                setattr(assessment, name, value if value is not None or name != 'coach_notes' else '')
+        if to_create:
+            SessionAssessment.objects.bulk_create(to_create)
+        if to_update:
+            SessionAssessment.objects.bulk_update(to_update, ASSESSMENT_FIELDS)
+
+        if coach_profile is not None and (rows or mark_complete):
+            defaults = {'confirmed_for_payment': True}
+            if mark_complete:
+                defaults['assessments_submitted'] = True
+            CoachSessionCompletion.objects.update_or_create(
+                coach=coach_profile, session=session, defaults=defaults
+            )
+
+        # bulk_create/bulk_update skip the SessionAssessment signals.
+        if rows:
+            refresh_assessment_ledger([session.pk])
+            invalidate_dashboard('assessments', user_ids=[user.pk])
+
+    return {'created': len(to_create), 'updated': len(to_update)}
@@ -0,0 +1,247 @@
+# planning/attendance_analytics.py
+
+"""
+Attendance and assessment trends across groups, on NumPy arrays.
+
+AttendanceAnalytics loads a date window in four queries (sessions, memberships,
+attendance rows, assessment ratings) into players x sessions arrays:
+
+  attended   bool     the player attended the session
+  expected   bool     the player's membership of the session's group covered its date
+  ratings    float    mean rating per SessionAssessment rating field (all coaches), NaN where unrated
+
+Sessions are columns in date order. Every figure below is computed with whole-array
+operations, so a season of every group costs a few milliseconds. The arrays can be
+saved as a compressed .npz or as CSV for offline analysis.
+"""
+
+import csv
+
+import numpy as np
+from django.db.models import Q
+
+from .models import Session, Player, PlayerGroupMembership, SessionAssessment
+
+RATING_FIELDS = (
+    'effort_rating', 'focus_rating', 'resilience_rating',
+    'composure_rating', 'decision_making_rating',
+)
+DEFAULT_ROLLING_DAYS = 28
+DEFAULT_RECENT_SESSIONS = 4
+
+SessionAttendee = Session.attendees.through
+
+
+class AttendanceAnalytics:
+    """Players x sessions attendance, expectation and rating arrays for start..end (inclusive)."""
+
+    def __init__(self, start, end, school_group_ids=None):
+        self.start = start
+        self.end = end
+
+        sessions = Session.objects.filter(session_date__gte=start, session_date__lte=end, is_cancelled=False)
+        if school_group_ids:
+            sessions = sessions.filter(school_group_id__in=list(school_group_ids))
+        session_rows = list(sessions.order_by('session_date', 'session_start_time', 'pk').values_list(
+            'pk', 'session_date', 'school_group_id'
+        ))
+        self.session_ids = np.array([row[0] for row in session_rows], dtype=np.int64)
+        self.session_dates = np.array([row[1] for row in session_rows], dtype='datetime64[D]')
+        session_groups = np.array([row[2] or 0 for row in session_rows], dtype=np.int64)
+        session_index = {session_id: column for column, session_id in enumerate(self.session_ids.tolist())}
+
+        memberships = PlayerGroupMembership.objects.filter(
+            Q(end_date__isnull=True) | Q(end_date__gte=start), start_date__lte=end,
+            school_group_id__in=set(session_groups.tolist()) - {0},
+        ).order_by().values_list('player_id', 'school_group_id', 'start_date', 'end_date')
+        membership_rows = list(memberships)
+        attendance_rows = list(SessionAttendee.objects.filter(
+            session_id__in=sessions.values('pk')
+        ).order_by().values_list('player_id', 'session_id'))
+
+        player_ids = {row[0] for row in membership_rows} | {row[0] for row in attendance_rows}
+        players = list(Player.objects.filter(pk__in=player_ids).order_by('last_name', 'first_name', 'pk').values_list(
+            'pk', 'first_name', 'last_name'
+        ))
+        self.player_ids = np.array([row[0] for row in players], dtype=np.int64)
+        self.player_names = [f"{first} {last}" for _, first, last in players]
+        player_index = {player_id: row for row, player_id in enumerate(self.player_ids.tolist())}
+        shape = (len(self.player_ids), len(self.session_ids))
+
+        self.attended = np.zeros(shape, dtype=bool)
+        if attendance_rows:
+            rows, columns = zip(*((player_index[p], session_index[s]) for p, s in attendance_rows))
+            self.attended[list(rows), list(columns)] = True
+
+        # memberships x sessions coverage, folded onto each membership's player row.
+        self.expected = np.zeros(shape, dtype=bool)
+        if membership_rows and shape[1]:
+            member_rows = np.array([player_index[row[0]] for row in membership_rows])
+            member_groups = np.array([row[1] for row in membership_rows], dtype=np.int64)
+            member_starts = np.array([row[2] for row in membership_rows], dtype='datetime64[D]')
+            member_ends = np.array([row[3] or end for row in membership_rows], dtype='datetime64[D]')
+            covers = (
+                (member_groups[:, None] == session_groups[None, :])
+                & (member_starts[:, None] <= self.session_dates[None, :])
+                & (self.session_dates[None, :] <= member_ends[:, None])
+            )
+            np.logical_or.at(self.expected, member_rows, covers)
+
+        sums = np.zeros(shape + (len(RATING_FIELDS),))
+        counts = np.zeros(shape + (len(RATING_FIELDS),))
+        rating_rows = [
+            row for row in SessionAssessment.objects.filter(session_id__in=sessions.values('pk')).order_by().values_list(
+                'player_id', 'session_id', *RATING_FIELDS
+            )
+            if row[0] in player_index
+        ]
+        if rating_rows:
+            rows = np.array([player_index[row[0]] for row in rating_rows])
+            columns = np.array([session_index[row[1]] for row in rating_rows])
+            values = np.array([row[2:] for row in rating_rows], dtype=float)  # None -> nan
+            rated = ~np.isnan(values)
+            np.add.at(sums, (rows, columns), np.where(rated, values, 0.0))
+            np.add.at(counts, (rows, columns), rated)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.ratings = np.where(counts > 0, sums / counts, np.nan)
+
+    # --- Figures per player ---
+
+    @property
+    def present(self):
+        """Attended sessions the player was expected at."""
+        return self.attended & self.expected
+
+    @property
+    def missed(self):
+        return self.expected & ~self.attended
+
+    def attendance_rate(self):
+        """Share of expected sessions attended, per player (NaN when none were expected)."""
+        expected = self.expected.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(expected > 0, self.present.sum(axis=1) / expected, np.nan)
+
+    def _window_starts(self, days):
+        """For each session column, the first column within `days` days up to and including it."""
+        return np.searchsorted(self.session_dates, self.session_dates - np.timedelta64(days - 1, 'D'), side='left')
+
+    def _rolling_sum(self, values, days):
+        """Sum over the trailing `days`-day window ending at each column, along axis 1."""
+        padded = np.concatenate([np.zeros(values.shape[:1] + (1,) + values.shape[2:]), np.cumsum(values, axis=1)], axis=1)
+        ends = np.arange(1, values.shape[1] + 1)
+        return padded[:, ends] - padded[:, self._window_starts(days)]
+
+    def rolling_attendance(self, days=DEFAULT_ROLLING_DAYS):
+        """players x sessions: attendance rate over the `days` days up to each session (NaN when nothing was expected)."""
+        present = self._rolling_sum(self.present.astype(float), days)
+        expected = self._rolling_sum(self.expected.astype(float), days)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(expected > 0, present / expected, np.nan)
+
+    def rolling_ratings(self, days=DEFAULT_ROLLING_DAYS):
+        """players x sessions x RATING_FIELDS: mean rating over the `days` days up to each session."""
+        rated = ~np.isnan(self.ratings)
+        sums = self._rolling_sum(np.where(rated, self.ratings, 0.0), days)
+        counts = self._rolling_sum(rated.astype(float), days)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    def average_ratings(self):
+        """players x RATING_FIELDS: mean of each rating over the window."""
+        rated = ~np.isnan(self.ratings)
+        counts = rated.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, np.where(rated, self.ratings, 0.0).sum(axis=1) / counts, np.nan)
+
+    def streaks(self):
+        """
+        (current, longest) attendance streaks per player, counted in expected sessions.
+        Sessions the player was not expected at neither extend nor break a streak.
+        """
+        present_so_far = np.cumsum(self.present, axis=1)
+        at_last_miss = np.maximum.accumulate(np.where(self.missed, present_so_far, 0), axis=1)
+        runs = present_so_far - at_last_miss
+        if not runs.shape[1]:
+            empty = np.zeros(runs.shape[0], dtype=np.int64)
+            return empty, empty
+        return runs[:, -1], runs.max(axis=1)
+
+    def trailing_misses(self):
+        """Expected sessions missed in a row since the player last attended, per player."""
+        missed_so_far = np.cumsum(self.missed, axis=1)
+        if not missed_so_far.shape[1]:
+            return np.zeros(missed_so_far.shape[0], dtype=np.int64)
+        at_last_present = np.maximum.accumulate(np.where(self.present, missed_so_far, 0), axis=1)
+        return missed_so_far[:, -1] - at_last_present[:, -1]
+
+    def dropout_risk(self, recent_sessions=DEFAULT_RECENT_SESSIONS):
+        """
+        Share of the player's last `recent_sessions` expected sessions they missed, raised
+        to 1 once they have missed that many in a row. 0 is no concern; NaN when nothing
+        was expected.
+        """
+        from_the_end = np.cumsum(self.expected[:, ::-1], axis=1)[:, ::-1]
+        recent = self.expected & (from_the_end <= recent_sessions)
+        recent_count = recent.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            risk = np.where(recent_count > 0, (recent & self.missed).sum(axis=1) / recent_count, np.nan)
+        return np.where(self.trailing_misses() >= recent_sessions, 1.0, risk)
+
+    def player_summary(self, recent_sessions=DEFAULT_RECENT_SESSIONS):
+        """One dict per player with the window's figures, highest dropout risk first."""
+        current, longest = self.streaks()
+        rates = self.attendance_rate()
+        risks = self.dropout_risk(recent_sessions)
+        averages = self.average_ratings()
+        expected, present = self.expected.sum(axis=1), self.present.sum(axis=1)
+        rows = []
+        for row, player_id in enumerate(self.player_ids.tolist()):
+            summary = {
+                'player_id': player_id,
+                'player': self.player_names[row],
+                'expected_sessions': int(expected[row]),
+                'attended_sessions': int(present[row]),
+                'attendance_rate': _float_or_none(rates[row]),
+                'current_streak': int(current[row]),
+                'longest_streak': int(longest[row]),
+                'dropout_risk': _float_or_none(risks[row]),
+            }
+            for column, field in enumerate(RATING_FIELDS):
+                summary[f'average_{field}'] = _float_or_none(averages[row, column])
+            rows.append(summary)
+        rows.sort(key=lambda summary: -(summary['dropout_risk'] or 0))
+        return rows
+
+    # --- Export ---
+
+    def save_npz(self, file):
+        """All arrays, with the player and session ids labelling their axes, as a compressed .npz."""
+        np.savez_compressed(
+            file,
+            player_ids=self.player_ids, session_ids=self.session_ids, session_dates=self.session_dates,
+            attended=self.attended, expected=self.expected, ratings=self.ratings,
+            rating_fields=np.array(RATING_FIELDS),
+        )
+
+    def write_attendance_csv(self, file):
+        """Players x sessions: 1 attended, 0 expected but absent, empty when not expected (attended anyway shows 1)."""
+        writer = csv.writer(file)
+        writer.writerow(['player_id', 'player'] + [
+            f"{session_date} #{session_id}" for session_date, session_id in zip(self.session_dates.astype(str), self.session_ids.tolist())
+        ])
+        cells = np.where(self.attended, '1', np.where(self.expected, '0', ''))
+        for row, player_id in enumerate(self.player_ids.tolist()):
+            writer.writerow([player_id, self.player_names[row]] + cells[row].tolist())
+
+    def write_summary_csv(self, file, recent_sessions=DEFAULT_RECENT_SESSIONS):
+        rows = self.player_summary(recent_sessions)
+        if not rows:
+            return
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _float_or_none(value):
+    return None if np.isnan(value) else round(float(value), 3)
@@ -0,0 +1,142 @@
+# planning/attendance_service.py
+
+"""
+Attendance figures, computed in SQL.
+
+Attendance is counted over the attendees through table (Session.attendees), grouped by
+player, for the group's non-cancelled sessions that have ended (Session.objects.ended,
+decided in SQL), so late sessions still running are left out.
+
+Who was expected at a session comes from PlayerGroupMembership: the players whose
+membership of the session's group covers the session date. The history is kept by the
+Player.school_groups signals through start_memberships / end_memberships below.
+"""
+
+from django.db.models import Count, Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import Session, PlayerGroupMembership
+
+SessionAttendee = Session.attendees.through
+
+
+# --- Membership history ---
+
+def start_memberships(pairs, on=None):
+    """
+    Opens a membership for each (player_id, school_group_id) pair from `on` (default today).
+    A membership closed on or after that day is reopened instead, so leaving and rejoining
+    on the same day leaves one unbroken stretch. One query plus a bulk update and insert,
+    however many pairs there are.
+    """
+    on = on or timezone.localdate()
+    pairs = set(pairs)
+    if not pairs:
+        return
+    open_pairs, reopen = set(), {}
+    for membership in PlayerGroupMembership.objects.filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=on),
+        player_id__in={player_id for player_id, _ in pairs},
+        school_group_id__in={group_id for _, group_id in pairs},
+    ):
+        pair = (membership.player_id, membership.school_group_id)
+        if pair not in pairs:
+            continue
+        if membership.end_date is None:
+            open_pairs.add(pair)
+        elif pair not in reopen or membership.end_date > reopen[pair].end_date:
+            reopen[pair] = membership
+    reopened = [membership for pair, membership in reopen.items() if pair not in open_pairs]
+    for membership in reopened:
+        membership.end_date = None
+    PlayerGroupMembership.objects.bulk_update(reopened, ['end_date'])
+    PlayerGroupMembership.objects.bulk_create(
+        PlayerGroupMembership(player_id=player_id, school_group_id=group_id, start_date=on)
+        for player_id, group_id in pairs - open_pairs - set(reopen)
+    )
+
+
+def end_memberships(player_ids=None, school_group_ids=None, on=None):
+    """Closes the open memberships of the given players and/or groups, `on` (default today) being the last day."""
+    on = on or timezone.localdate()
+    memberships = PlayerGroupMembership.objects.filter(end_date__isnull=True)
+    if player_ids is not None:
+        memberships = memberships.filter(player_id__in=list(player_ids))
+    if school_group_ids is not None:
+        memberships = memberships.filter(school_group_id__in=list(school_group_ids))
+    memberships.update(end_date=on)
+
+
+# --- Expected attendance ---
+
+def _expected_attendance_rows(sessions):
+    """
+    One row per (membership, session) where the membership covers the session date,
+    flagged `present` when that player attended. Indexed joins on the membership dates
+    and the attendees table, however many sessions there are.
+    """
+    return PlayerGroupMembership.objects.filter(
+        Q(school_group__sessions__in=sessions),
+        Q(school_group__sessions__session_date__gte=F('start_date')),
+        Q(end_date__isnull=True) | Q(end_date__gte=F('school_group__sessions__session_date')),
+    ).order_by().annotate(present=Exists(SessionAttendee.objects.filter(
+        session_id=OuterRef('school_group__sessions'), player_id=OuterRef('player_id')
+    )))
+
+
+def attendance_by_player(sessions, player_ids=None):
+    """{player_id: (expected, attended)} over `sessions`, counting only sessions the player was expected at. One query."""
+    rows = _expected_attendance_rows(sessions)
+    if player_ids is not None:
+        rows = rows.filter(player_id__in=list(player_ids))
+    return {
+        player_id: (expected, attended)
+        for player_id, expected, attended in rows.values('player_id').annotate(
+            expected=Count('pk'), attended=Count('pk', filter=Q(present=True))
+        ).values_list('player_id', 'expected', 'attended')
+    }
+
+
+def attendance_by_session(sessions):
+    """{session_id: (expected, attended)}: the players expected at each session and how many of them came. One query."""
+    return {
+        session_id: (expected, attended)
+        for session_id, expected, attended in _expected_attendance_rows(sessions).values('school_group__sessions').annotate(
+            expected=Count('pk'), attended=Count('pk', filter=Q(present=True))
+        ).values_list('school_group__sessions', 'expected', 'attended')
+    }
+
+
+def group_attendance_summary(school_group, players, start_date, end_date, now=None):
+    """
+    (rows, group_average) for the group's ended sessions between start_date and end_date.
+
+    rows is one dict per player in `players` (player, attended_sessions,
+    total_group_sessions, percentage), counting the sessions held while the player was
+    in the group. group_average is the mean over sessions of the share of expected
+    players who attended, as a percentage.
+    """
+    players = list(players)
+    sessions = Session.objects.filter(
+        school_group=school_group,
+        session_date__gte=start_date,
+        session_date__lte=end_date,
+        is_cancelled=False,
+    ).ended(now)
+
+    by_player = attendance_by_player(sessions, [player.pk for player in players]) if players else {}
+    rows = []
+    for player in players:
+        expected, attended = by_player.get(player.pk, (0, 0))
+        rows.append({
+            'player': player,
+            'attended_sessions': attended,
+            'total_group_sessions': expected,
+            'percentage': (attended / expected) * 100 if expected else 0,
+        })
+
+    session_shares = [
+        attended / expected * 100 for expected, attended in attendance_by_session(sessions).values() if expected
+    ]
+    group_average = sum(session_shares) / len(session_shares) if session_shares else 0
+    return rows, group_average
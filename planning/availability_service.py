@@ -0,0 +1,128 @@
+# planning/availability_service.py
+
+"""
+Coaches' availability for the sessions generated from the recurring rules.
+
+A bulk submission sets one status per rule for a month. It is applied as a single
+upsert: the month's target sessions come from one query and their CoachAvailability
+rows are written with bulk_create(update_conflicts=True), conflicting on (coach,
+session) where the database takes a conflict target (MySQL's ON DUPLICATE KEY UPDATE
+uses the unique key itself). Only databases without any upsert fall back to one
+bulk_update plus one bulk_create. Bulk writes bypass the post_save signal, so the
+dashboard is invalidated here.
+
+The form is pre-filled with each rule's current state for the month, derived in one
+grouped query, so coaches only submit what they actually change.
+"""
+
+from django.db import connection, transaction
+from django.db.models import Count, FilteredRelation, Q
+from django.utils import timezone
+
+from .models import CoachAvailability, Session
+
+NO_CHANGE = 'NO_CHANGE'
+# Submitted status -> (is_available, notes).
+BULK_STATUSES = {
+    'AVAILABLE': (True, ""),
+    'UNAVAILABLE': (False, ""),
+    'EMERGENCY': (True, "Emergency only"),
+}
+UPSERT_FIELDS = ['is_available', 'notes', 'status_updated_at', 'timestamp']
+# A rule's state for the month when its sessions disagree, or none has a response.
+STATE_MIXED = 'MIXED'
+STATE_NONE = 'NONE'
+
+
+def bulk_statuses_from_post(data, rules):
+    """{rule_id: status} for the rules whose availability_rule_<id> field carries a status."""
+    statuses = {}
+    for rule in rules:
+        status = data.get(f'availability_rule_{rule.pk}')
+        if status in BULK_STATUSES:
+            statuses[rule.pk] = status
+    return statuses
+
+
+def apply_bulk_availability(user, statuses, start_date, end_date, now=None):
+    """
+    Records the user's availability for every non-cancelled session generated from the
+    given rules ({rule_id: status}) between start_date and end_date. Returns the number
+    of sessions set.
+    """
+    from .signals import invalidate_dashboard
+
+    if not statuses:
+        return 0
+    now = now or timezone.now()
+    sessions = Session.objects.filter(
+        generated_from_rule_id__in=list(statuses),
+        session_date__gte=start_date,
+        session_date__lte=end_date,
+        is_cancelled=False,
+    ).values_list('pk', 'generated_from_rule_id')
+
+    rows = []
+    for session_id, rule_id in sessions:
+        is_available, notes = BULK_STATUSES[statuses[rule_id]]
+        rows.append(CoachAvailability(
+            coach=user, session_id=session_id, is_available=is_available, notes=notes,
+            status_updated_at=now, timestamp=now,
+        ))
+    if not rows:
+        return 0
+
+    with transaction.atomic():
+        if connection.features.supports_update_conflicts:
+            target = ['coach', 'session'] if connection.features.supports_update_conflicts_with_target else None
+            CoachAvailability.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=target, update_fields=UPSERT_FIELDS,
+            )
+        else:
+            existing = dict(CoachAvailability.objects.filter(
+                coach=user, session_id__in=[row.session_id for row in rows]
+            ).values_list('session_id', 'pk'))
+            for row in rows:
+                row.pk = existing.get(row.session_id)
+            CoachAvailability.objects.bulk_update([row for row in rows if row.pk], UPSERT_FIELDS)
+            CoachAvailability.objects.bulk_create([row for row in rows if not row.pk])
+    invalidate_dashboard('availability', user_ids=[user.pk])
+    return len(rows)
+
+
+def rule_availability_states(user, rule_ids, start_date, end_date):
+    """
+    {rule_id: state} for the user's availability over each rule's non-cancelled sessions
+    between start_date and end_date: one of BULK_STATUSES when every session has that
+    status, STATE_NONE when none has a response and STATE_MIXED otherwise. Rules with
+    no sessions in the range are left out. One grouped query.
+    """
+    emergency = Q(mine__notes__icontains='emergency')
+    counts = Session.objects.filter(
+        generated_from_rule_id__in=list(rule_ids),
+        session_date__gte=start_date,
+        session_date__lte=end_date,
+        is_cancelled=False,
+    ).annotate(
+        mine=FilteredRelation('coach_availabilities', condition=Q(coach_availabilities__coach=user)),
+    ).order_by().values('generated_from_rule_id').annotate(
+        sessions=Count('pk'),
+        answered=Count('mine__pk', filter=Q(mine__is_available__isnull=False)),
+        available=Count('mine__pk', filter=Q(mine__is_available=True) & ~emergency),
+        unavailable=Count('mine__pk', filter=Q(mine__is_available=False)),
+        emergency=Count('mine__pk', filter=Q(mine__is_available=True) & emergency),
+    ).values_list('generated_from_rule_id', 'sessions', 'answered', 'available', 'unavailable', 'emergency')
+
+    states = {}
+    for rule_id, sessions, answered, available, unavailable, emergency_only in counts:
+        if not answered:
+            states[rule_id] = STATE_NONE
+        elif available == sessions:
+            states[rule_id] = 'AVAILABLE'
+        elif unavailable == sessions:
+            states[rule_id] = 'UNAVAILABLE'
+        elif emergency_only == sessions:
+            states[rule_id] = 'EMERGENCY'
+        else:
+            states[rule_id] = STATE_MIXED
+    return states
@@ -0,0 +1,49 @@
+# planning/cache_versions.py
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY_PREFIX = 'planning:version:'
+
+
+def _version_key(scope):
+    return f"{VERSION_KEY_PREFIX}{scope}"
+
+
+def get_versions(scopes):
+    """
+    Returns {scope: version} for the given scopes in a single cache round trip.
+    A version is the time.time_ns() of the last change, so it can double as a
+    last-modified timestamp. Scopes that have never been bumped are started now.
+    """
+    keys = {_version_key(scope): scope for scope in scopes}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, scope in keys.items():
+        if key in found:
+            versions[scope] = found[key]
+        else:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[scope] = cache.get(key)
+    return versions
+
+
+def bump_versions(scopes):
+    """Marks every given scope as changed, invalidating anything keyed on its version."""
+    scopes = set(scopes)
+    if not scopes:
+        return
+    now_ns = time.time_ns()
+    cache.set_many({_version_key(scope): now_ns for scope in scopes}, timeout=None)
+
+
+def bump_versions_on_commit(scopes):
+    """
+    Bumps the scopes once the current transaction commits, so no request can
+    re-cache stale data under the new version before the change is visible.
+    """
+    scopes = set(scopes)
+    if scopes:
+        transaction.on_commit(lambda: bump_versions(scopes))
@@ -0,0 +1,261 @@
+# planning/calendar_service.py
+
+"""
+The session calendar's event feed, and the subscribable .ics feeds.
+
+FullCalendar asks for the events of the range it is showing (?start=&end=), so the
+month, week and list views each load only what they display. A range costs two
+queries, sessions with an attendee count annotation and their coaches, and the result
+is cached per user and range until a session, its coaches or attendees, a group, a
+venue or a coach changes (the 'calendar' cache-version scope).
+
+The .ics feeds are what calendar apps subscribe to (webcal://), authenticated by a
+signed token in the URL rather than a login. Each covers a rolling window around
+today and is versioned more narrowly than the JSON feed: a coach's feed by the
+'calendar:user:<id>' scope, bumped only when one of their sessions changes, and the
+admin feed by 'calendar:all'; renaming a group, venue or coach bumps every feed
+('calendar:feeds'). The serialized body is cached under those versions, so a client
+polling an unchanged feed gets a 304 or the cached text without a query.
+"""
+
+import datetime
+import hashlib
+from functools import lru_cache
+
+import ics
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Count, Prefetch
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .cache_versions import get_versions, bump_versions_on_commit
+from .models import Session, Coach
+
+CALENDAR_CACHE_SCOPE = 'calendar'
+CALENDAR_CACHE_TIMEOUT = 60 * 60
+MAX_RANGE_DAYS = 100
+
+GROUP_COLORS = [
+    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf',
+    '#aec7e8', '#ffbb78', '#98df8a', '#ff9896', '#c5b0d5', '#c49c94', '#f7b6d2', '#c7c7c7', '#dbdb8d', '#9edae5',
+]
+CANCELLED_COLOR = '#d3d3d3'
+CANCELLED_TEXT_COLOR = '#a9a9a9'
+_URL_ID_PLACEHOLDER = 999999999
+
+
+FEED_SIGNING_SALT = 'planning.calendar_feed'
+FEED_SCOPE_MINE = 'mine'
+FEED_SCOPE_ALL = 'all'
+FEED_PAST_DAYS = 30
+FEED_FUTURE_DAYS = 180
+FEED_CACHE_TIMEOUT = 24 * 60 * 60
+ALL_SESSIONS_FEED_SCOPE = 'calendar:all'
+ALL_FEEDS_SCOPE = 'calendar:feeds'
+
+
+def user_feed_scope(user_id):
+    return f"calendar:user:{user_id}"
+
+
+def invalidate_calendar(user_ids=None, attendance_only=False):
+    """
+    Bumps the JSON feed and the .ics feeds the change shows up in: the admin feed and
+    the feeds of the coach user ids given, or every feed when user_ids is None (a
+    group, venue or coach changed). Attendance is not part of the .ics feeds.
+    """
+    scopes = {CALENDAR_CACHE_SCOPE}
+    if attendance_only:
+        pass
+    elif user_ids is None:
+        scopes.add(ALL_FEEDS_SCOPE)
+    else:
+        scopes.add(ALL_SESSIONS_FEED_SCOPE)
+        scopes.update(user_feed_scope(user_id) for user_id in user_ids if user_id)
+    bump_versions_on_commit(scopes)
+
+
+def group_color(school_group_id):
+    """A group keeps the same colour in every month and view."""
+    return GROUP_COLORS[school_group_id % len(GROUP_COLORS)]
+
+
+@lru_cache(maxsize=None)
+def _url_pattern(view_name):
+    """The view's URL with '{}' for the id, reversed once per process rather than once per event."""
+    return reverse(view_name, args=[_URL_ID_PLACEHOLDER]).replace(str(_URL_ID_PLACEHOLDER), '{}')
+
+
+def parse_range(start, end):
+    """
+    (start_date, end_date) from FullCalendar's ?start=&end= (ISO dates or datetimes; end
+    exclusive). Raises ValueError for a missing, reversed or too long range.
+    """
+    if not start or not end:
+        raise ValueError("Both start and end are required.")
+    start_date = datetime.date.fromisoformat(start[:10])
+    end_date = datetime.date.fromisoformat(end[:10])
+    if end_date <= start_date:
+        raise ValueError("end must be after start.")
+    if (end_date - start_date).days > MAX_RANGE_DAYS:
+        raise ValueError(f"The range may span at most {MAX_RANGE_DAYS} days.")
+    return start_date, end_date
+
+
+def calendar_sessions(user, start_date, end_date):
+    """The user's sessions from start_date up to (not including) end_date: all of them for superusers."""
+    sessions = Session.objects.filter(session_date__gte=start_date, session_date__lt=end_date)
+    if not user.is_superuser:
+        sessions = sessions.filter(coaches_attending__user=user)
+    return sessions.select_related('school_group', 'venue').prefetch_related(
+        Prefetch('coaches_attending', queryset=Coach.objects.only('pk', 'name').order_by('name'))
+    ).annotate(attendees_count=Count('attendees', distinct=True)).order_by('session_date', 'session_start_time')
+
+
+def build_calendar_events(user, start_date, end_date):
+    """FullCalendar event objects for the user's sessions in the range."""
+    admin_url = _url_pattern('admin:planning_session_change') if user.is_superuser else None
+    planner_url = _url_pattern('planning:session_detail')
+    events = []
+    for session in calendar_sessions(user, start_date, end_date):
+        start = timezone.make_aware(datetime.datetime.combine(session.session_date, session.session_start_time))
+        end = start + datetime.timedelta(minutes=session.planned_duration_minutes)
+        group_name = session.school_group.name if session.school_group else "No Group"
+        color = group_color(session.school_group_id) if session.school_group_id else None
+        if session.is_cancelled:
+            color = CANCELLED_COLOR
+        text_color = CANCELLED_TEXT_COLOR if session.is_cancelled else ('#FFFFFF' if color else None)
+        events.append({
+            'id': session.pk, 'title': f"{start:%H:%M} - {group_name}",
+            'start': start.isoformat(), 'end': end.isoformat(),
+            'allDay': False, 'color': color, 'textColor': text_color, 'borderColor': color,
+            'extendedProps': {
+                'school_group_name': group_name,
+                'session_time_str': f"{start:%H:%M} - {end:%H:%M}",
+                'venue_name': session.venue.name if session.venue else "N/A",
+                'coaches_attending': [coach.name for coach in session.coaches_attending.all()],
+                'attendees_count': session.attendees_count,
+                'duration_minutes': session.planned_duration_minutes,
+                'is_cancelled_bool': session.is_cancelled,
+                'status_display': "Cancelled" if session.is_cancelled else "Scheduled",
+                'notes': session.notes or "",
+                'admin_url': admin_url.format(session.pk) if admin_url else None,
+                'session_planner_url': planner_url.format(session.pk),
+                'event_custom_color': color,
+            },
+        })
+    return events
+
+
+def calendar_cache_key(user, start_date, end_date):
+    """Cache key (and ETag seed) for the user's events in the range; one cache round trip."""
+    version = get_versions([CALENDAR_CACHE_SCOPE])[CALENDAR_CACHE_SCOPE]
+    return f"planning:calendar:{user.pk}:{start_date.isoformat()}:{end_date.isoformat()}:{version}"
+
+
+def get_calendar_events(user, start_date, end_date, cache_key=None):
+    cache_key = cache_key or calendar_cache_key(user, start_date, end_date)
+    events = cache.get(cache_key)
+    if events is None:
+        events = build_calendar_events(user, start_date, end_date)
+        cache.set(cache_key, events, CALENDAR_CACHE_TIMEOUT)
+    return events
+
+
+# --- Subscribable .ics feeds ---
+
+def _password_fingerprint(user):
+    # Changing the password revokes the user's feed tokens.
+    return salted_hmac(FEED_SIGNING_SALT, user.password).hexdigest()[:12]
+
+
+def make_feed_token(user, scope=FEED_SCOPE_MINE):
+    """Signed token for the user's own sessions ('mine') or, for superusers, every session ('all')."""
+    if scope == FEED_SCOPE_ALL and not user.is_superuser:
+        raise ValueError("Only superusers can subscribe to all sessions.")
+    return signing.dumps({'u': user.pk, 's': scope, 'p': _password_fingerprint(user)}, salt=FEED_SIGNING_SALT)
+
+
+def user_for_feed_token(token):
+    """(user, scope) for a valid token of an active staff user, otherwise (None, None)."""
+    try:
+        data = signing.loads(token, salt=FEED_SIGNING_SALT)
+    except signing.BadSignature:
+        return None, None
+    scope = data.get('s')
+    user = get_user_model().objects.filter(pk=data.get('u'), is_active=True, is_staff=True).first()
+    if (
+        user is None
+        or scope not in (FEED_SCOPE_MINE, FEED_SCOPE_ALL)
+        or (scope == FEED_SCOPE_ALL and not user.is_superuser)
+        or not constant_time_compare(data.get('p', ''), _password_fingerprint(user))
+    ):
+        return None, None
+    return user, scope
+
+
+def feed_window(today=None):
+    """(first, last) session dates of the rolling window the .ics feeds cover."""
+    today = today or timezone.localdate()
+    return today - datetime.timedelta(days=FEED_PAST_DAYS), today + datetime.timedelta(days=FEED_FUTURE_DAYS)
+
+
+def feed_sessions(user, scope, start_date, end_date):
+    sessions = Session.objects.filter(session_date__gte=start_date, session_date__lte=end_date, is_cancelled=False)
+    if scope != FEED_SCOPE_ALL:
+        sessions = sessions.filter(coaches_attending__user=user)
+    return sessions.select_related('school_group', 'venue').prefetch_related(
+        Prefetch('coaches_attending', queryset=Coach.objects.only('pk', 'name', 'email').order_by('name'))
+    ).order_by('session_date', 'session_start_time', 'pk')
+
+
+def build_ics(sessions):
+    """An ics.Calendar with one event per session; UIDs are stable so subscribed clients update events in place."""
+    calendar = ics.Calendar()
+    for session in sessions:
+        if not (session.session_date and session.session_start_time):
+            continue
+        begin = timezone.make_aware(datetime.datetime.combine(session.session_date, session.session_start_time))
+        coaches = list(session.coaches_attending.all())
+        calendar.events.add(ics.Event(
+            uid=f"session-{session.pk}@squashsync",
+            name=session.school_group.name if session.school_group else 'Session',
+            begin=begin,
+            end=begin + datetime.timedelta(minutes=session.planned_duration_minutes),
+            description=f"Coaches: {', '.join(coach.name for coach in coaches)}\nNotes: {session.notes or ''}",
+            location=session.venue.name if session.venue else None,
+            attendees=[
+                ics.Attendee(f"mailto:{coach.email}", common_name=coach.name) for coach in coaches if coach.email
+            ],
+        ))
+    return calendar
+
+
+def feed_state(user, scope, today=None):
+    """
+    (cache_key, etag, last_modified) of the feed, from one cache round trip. The window
+    moves at midnight, so the day is part of the key and the last change is never
+    earlier than the start of today.
+    """
+    today = today or timezone.localdate()
+    scopes = [ALL_FEEDS_SCOPE, ALL_SESSIONS_FEED_SCOPE if scope == FEED_SCOPE_ALL else user_feed_scope(user.pk)]
+    versions = get_versions(scopes)
+    cache_key = "planning:calendar-feed:{}:{}:{}:{}".format(
+        user.pk, scope, today.isoformat(), ':'.join(str(versions[name]) for name in scopes)
+    )
+    midnight = timezone.make_aware(datetime.datetime.combine(today, datetime.time.min))
+    last_modified = max(max(versions.values()) / 1e9, midnight.timestamp())
+    return cache_key, '"%s"' % hashlib.md5(cache_key.encode()).hexdigest(), int(last_modified)
+
+
+def get_feed_body(user, scope, cache_key, today=None):
+    """The serialized feed, built (two queries) only when its versions or the day have changed."""
+    body = cache.get(cache_key)
+    if body is None:
+        start_date, end_date = feed_window(today)
+        body = build_ics(feed_sessions(user, scope, start_date, end_date)).serialize()
+        cache.set(cache_key, body, FEED_CACHE_TIMEOUT)
+    return body
@@ -0,0 +1,152 @@
+# planning/chart_data.py
+
+"""
+Date-ranged, downsampled chart series for the player metric charts.
+
+Records are filtered by date in SQL and reduced to at most `max_points` per series
+before they are sent to the browser, so a chart costs the same however many years of
+data a player has. Two reductions are offered:
+
+  'lttb'    Largest-Triangle-Three-Buckets: keeps the points that preserve the visual
+            shape of the line (peaks and dips survive).
+  'bucket'  Splits the range into equal buckets and returns each bucket's mean, with
+            its min and max for an error band.
+
+Both are a single linear pass over the points.
+"""
+
+import datetime
+
+from .player_analytics import METRICS
+
+try:
+    from solosync_api.models import SoloSessionMetric
+except ImportError:
+    SoloSessionMetric = None
+
+DEFAULT_MAX_POINTS = 200
+MAX_POINTS_LIMIT = 2000
+DOWNSAMPLE_METHODS = ('lttb', 'bucket')
+
+
+def _ordinal(day):
+    return day.toordinal() if isinstance(day, datetime.date) else float(day)
+
+
+def lttb(points, threshold):
+    """
+    Largest-Triangle-Three-Buckets over (x, y) points sorted by x. The first and last
+    points are always kept; each bucket in between contributes the point forming the
+    largest triangle with the previously kept point and the next bucket's average.
+    """
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (count - 2) / (threshold - 2)
+    previous = points[0]
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        next_start, next_end = end, min(int((bucket + 2) * bucket_size) + 1, count)
+        next_points = points[next_start:next_end] or [points[-1]]
+        avg_x = sum(_ordinal(x) for x, _ in next_points) / len(next_points)
+        avg_y = sum(y for _, y in next_points) / len(next_points)
+
+        prev_x, prev_y = _ordinal(previous[0]), previous[1]
+        best, best_area = None, -1.0
+        for point in points[start:end]:
+            area = abs(
+                (prev_x - avg_x) * (point[1] - prev_y)
+                - (prev_x - _ordinal(point[0])) * (avg_y - prev_y)
+            )
+            if area > best_area:
+                best, best_area = point, area
+        sampled.append(best)
+        previous = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def bucket_downsample(points, max_points):
+    """
+    Equal-count buckets over (x, y) points sorted by x. Returns (x, mean, min, max) per
+    bucket, x being the bucket's first x.
+    """
+    count = len(points)
+    if count <= max_points:
+        return [(x, y, y, y) for x, y in points]
+    reduced = []
+    bucket_size = count / max_points
+    for bucket in range(max_points):
+        chunk = points[int(bucket * bucket_size):int((bucket + 1) * bucket_size)]
+        if not chunk:
+            continue
+        values = [y for _, y in chunk]
+        reduced.append((chunk[0][0], sum(values) / len(values), min(values), max(values)))
+    return reduced
+
+
+def downsample_series(series, max_points=DEFAULT_MAX_POINTS, method='lttb'):
+    """
+    {kind: [(date, value)]} -> {kind: {'labels', 'data'[, 'min', 'max']}} in the format the
+    profile charts use, each series reduced to at most max_points points.
+    """
+    result = {}
+    for kind, points in series.items():
+        if method == 'bucket':
+            reduced = bucket_downsample(points, max_points)
+            result[kind] = {
+                'labels': [x.isoformat() for x, _, _, _ in reduced],
+                'data': [round(mean, 2) for _, mean, _, _ in reduced],
+                'min': [low for _, _, low, _ in reduced],
+                'max': [high for _, _, _, high in reduced],
+            }
+        else:
+            reduced = lttb(points, max_points)
+            result[kind] = {
+                'labels': [x.isoformat() for x, _ in reduced],
+                'data': [y for _, y in reduced],
+            }
+    return result
+
+
+def get_metric_series(player_id, metric, start=None, end=None):
+    """{kind: [(date, value)]} for one of the player's metrics between start and end. One query."""
+    model, type_field, value_field = METRICS[metric]
+    records = model.objects.filter(player_id=player_id)
+    if start:
+        records = records.filter(date_recorded__gte=start)
+    if end:
+        records = records.filter(date_recorded__lte=end)
+    series = {}
+    for kind, recorded_on, value in records.order_by('date_recorded', 'pk').values_list(
+        type_field, 'date_recorded', value_field
+    ):
+        series.setdefault(kind, []).append((recorded_on, value))
+    return series
+
+
+def get_solo_metric_series(user_id, start=None, end=None):
+    """
+    {"<drill>: <metric>": [(date, value)]} of the numeric values a SoloSync user logged
+    between start and end. Non-numeric values are skipped. One query.
+    """
+    if SoloSessionMetric is None:
+        return {}
+    metrics = SoloSessionMetric.objects.filter(session_log__player_id=user_id)
+    if start:
+        metrics = metrics.filter(session_log__completed_at__date__gte=start)
+    if end:
+        metrics = metrics.filter(session_log__completed_at__date__lte=end)
+    series = {}
+    for drill_name, metric_name, completed_at, raw_value in metrics.order_by(
+        'session_log__completed_at', 'pk'
+    ).values_list('drill__name', 'metric_name', 'session_log__completed_at', 'metric_value'):
+        try:
+            value = float(raw_value)
+        except (TypeError, ValueError):
+            continue
+        series.setdefault(f"{drill_name}: {metric_name}", []).append((completed_at.date(), value))
+    return series
@@ -0,0 +1,193 @@
+# planning/conflicts.py
+
+"""
+Double-booking detection for coaches and venues.
+
+Sessions (and Events, for coaches) in a date window are loaded once and put into
+one interval tree per coach and per venue. "What overlaps 15:00-16:00 for coach X?"
+is then answered in O(log n + k) instead of comparing every pair of bookings.
+Times are naive local datetimes, the same way session dates and start times are stored.
+"""
+
+import datetime
+from collections import defaultdict
+from typing import NamedTuple
+
+from django.utils import timezone
+
+# Events only have a start; assume they block this long.
+DEFAULT_EVENT_DURATION = datetime.timedelta(minutes=120)
+
+
+class Booking(NamedTuple):
+    kind: str  # 'session' or 'event'
+    pk: int
+    start: datetime.datetime
+    end: datetime.datetime
+    label: str
+
+    def overlaps(self, other):
+        return self.start < other.end and other.start < self.end
+
+
+class IntervalTree:
+    """
+    A static, augmented interval tree over half-open [start, end) bookings.
+
+    The bookings are sorted by start and treated as an implicit balanced binary
+    search tree (the middle of each range is the node); each node also stores the
+    latest end in its subtree, which lets a query skip whole subtrees that end
+    before the query window starts.
+    """
+
+    def __init__(self, bookings):
+        self.bookings = sorted(bookings, key=lambda booking: (booking.start, booking.end, booking.pk))
+        self._max_end = [None] * len(self.bookings)
+        self._build(0, len(self.bookings))
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        max_end = self.bookings[mid].end
+        for child_end in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child_end is not None and child_end > max_end:
+                max_end = child_end
+        self._max_end[mid] = max_end
+        return max_end
+
+    def __len__(self):
+        return len(self.bookings)
+
+    def overlapping(self, start, end):
+        """Bookings overlapping [start, end), in start order."""
+        found = []
+        stack = [(0, len(self.bookings))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self._max_end[mid] <= start:
+                continue  # Everything in this subtree ends before the window.
+            booking = self.bookings[mid]
+            if booking.start < end:
+                if booking.end > start:
+                    found.append(booking)
+                stack.append((mid + 1, hi))
+            stack.append((lo, mid))
+        found.sort(key=lambda booking: (booking.start, booking.pk))
+        return found
+
+
+def session_booking(session):
+    start = datetime.datetime.combine(session.session_date, session.session_start_time)
+    end = start + datetime.timedelta(minutes=session.planned_duration_minutes)
+    group_name = session.school_group.name if session.school_group else "General"
+    return Booking('session', session.pk, start, end, f"{group_name} session at {start:%H:%M} on {start:%d %b}")
+
+
+def event_booking(event):
+    start = timezone.localtime(event.event_date).replace(tzinfo=None) if timezone.is_aware(event.event_date) else event.event_date
+    return Booking('event', event.pk, start, start + DEFAULT_EVENT_DURATION, f"{event.name} at {start:%H:%M} on {start:%d %b}")
+
+
+class ConflictIndex:
+    """Interval trees of bookings per coach id and per venue id."""
+
+    def __init__(self, coach_bookings, venue_bookings):
+        self.coach_trees = {coach_id: IntervalTree(items) for coach_id, items in coach_bookings.items()}
+        self.venue_trees = {venue_id: IntervalTree(items) for venue_id, items in venue_bookings.items()}
+
+    @staticmethod
+    def _query(tree, start, end, exclude):
+        if tree is None:
+            return []
+        return [booking for booking in tree.overlapping(start, end) if (booking.kind, booking.pk) != exclude]
+
+    def coach_conflicts(self, coach_id, start, end, exclude=None):
+        """Bookings of coach_id overlapping [start, end); exclude is a (kind, pk) to ignore."""
+        return self._query(self.coach_trees.get(coach_id), start, end, exclude)
+
+    def venue_conflicts(self, venue_id, start, end, exclude=None):
+        return self._query(self.venue_trees.get(venue_id), start, end, exclude)
+
+    def session_conflicts(self, session, coach_ids):
+        """
+        Returns {'coaches': {coach_id: [Booking]}, 'venue': [Booking]} for the session's
+        other bookings overlapping it, for the given coaches and the session's venue.
+        """
+        booking = session_booking(session)
+        exclude = ('session', session.pk)
+        coaches = {}
+        for coach_id in coach_ids:
+            clashes = self.coach_conflicts(coach_id, booking.start, booking.end, exclude)
+            if clashes:
+                coaches[coach_id] = clashes
+        venue = self.venue_conflicts(session.venue_id, booking.start, booking.end, exclude) if session.venue_id else []
+        return {'coaches': coaches, 'venue': venue}
+
+    def all_conflicts(self):
+        """
+        Every overlapping pair, as (kind, key, first, second) with kind 'coach' or 'venue'
+        and key the coach or venue id. Each pair is reported once.
+        """
+        pairs = []
+        for kind, trees in (('coach', self.coach_trees), ('venue', self.venue_trees)):
+            for key, tree in trees.items():
+                for booking in tree.bookings:
+                    for other in tree.overlapping(booking.start, booking.end):
+                        if (other.start, other.end, other.kind, other.pk) > (booking.start, booking.end, booking.kind, booking.pk):
+                            pairs.append((kind, key, booking, other))
+        return pairs
+
+
+def build_conflict_index(start_date, end_date, sessions=None):
+    """
+    Builds a ConflictIndex for every non-cancelled session and every event between
+    start_date and end_date (inclusive).
+
+    Pass sessions already loaded with coaches_attending prefetched to reuse them;
+    otherwise they are loaded here. Costs two queries for events plus, when sessions
+    are not given, two more for sessions and their coaches.
+    """
+    from .models import Session, Event
+
+    coach_bookings = defaultdict(list)
+    venue_bookings = defaultdict(list)
+
+    if sessions is None:
+        sessions = Session.objects.filter(
+            session_date__gte=start_date, session_date__lte=end_date, is_cancelled=False
+        ).select_related('school_group').prefetch_related('coaches_attending')
+    for session in sessions:
+        if session.is_cancelled:
+            continue
+        booking = session_booking(session)
+        for coach in session.coaches_attending.all():
+            coach_bookings[coach.pk].append(booking)
+        if session.venue_id:
+            venue_bookings[session.venue_id].append(booking)
+
+    # Events are stored as aware datetimes; widen the window by a day to cover time zones.
+    window_start = timezone.make_aware(datetime.datetime.combine(start_date - datetime.timedelta(days=1), datetime.time.min))
+    window_end = timezone.make_aware(datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.max))
+    for event in Event.objects.filter(
+        event_date__gte=window_start, event_date__lte=window_end
+    ).prefetch_related('attending_coaches'):
+        booking = event_booking(event)
+        for coach in event.attending_coaches.all():
+            coach_bookings[coach.pk].append(booking)
+
+    return ConflictIndex(coach_bookings, venue_bookings)
+
+
+def describe_conflicts(conflicts, coach_names):
+    """Human-readable warnings for the result of ConflictIndex.session_conflicts."""
+    warnings = []
+    for coach_id, clashes in conflicts['coaches'].items():
+        name = coach_names.get(coach_id, f"Coach {coach_id}")
+        warnings.append(f"{name} is also booked for {', '.join(booking.label for booking in clashes)}.")
+    if conflicts['venue']:
+        warnings.append(f"Venue also booked for {', '.join(booking.label for booking in conflicts['venue'])}.")
+    return warnings
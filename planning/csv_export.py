@@ -0,0 +1,152 @@
+# planning/csv_export.py
+
+"""
+Streaming CSV exports of sessions, attendance and assessments.
+
+Rows are read with values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE) and written
+to the response as they are produced (StreamingHttpResponse), so memory stays flat
+whether the range is a week or five years. No model instances are built: end times
+are plain time arithmetic rather than Session.start_datetime's timezone handling, and
+session coaches are looked up once per chunk.
+"""
+
+import csv
+import datetime
+from itertools import islice
+
+from .models import Session, SessionAssessment
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_KINDS = ('sessions', 'attendance', 'assessments')
+CANCELLED_CHOICES = ('include', 'exclude', 'only')
+_TIME_BASE = datetime.date(2000, 1, 1)
+
+SessionAttendee = Session.attendees.through
+SessionCoach = Session.coaches_attending.through
+
+
+class _Echo:
+    """File-like object whose write() hands the formatted line back, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def parse_export_filters(params):
+    """
+    Export filters from request parameters: kind, start, end (YYYY-MM-DD, inclusive),
+    group, coach, venue (ids) and cancelled (include/exclude/only). Raises ValueError.
+    """
+    kind = params.get('kind') or 'sessions'
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"kind must be one of {', '.join(EXPORT_KINDS)}.")
+    cancelled = params.get('cancelled') or 'include'
+    if cancelled not in CANCELLED_CHOICES:
+        raise ValueError(f"cancelled must be one of {', '.join(CANCELLED_CHOICES)}.")
+    if not params.get('start') or not params.get('end'):
+        raise ValueError("Both start and end are required.")
+    start = datetime.date.fromisoformat(params['start'])
+    end = datetime.date.fromisoformat(params['end'])
+    if end < start:
+        raise ValueError("end must not be before start.")
+    filters = {'kind': kind, 'start': start, 'end': end, 'cancelled': cancelled}
+    for name in ('group', 'coach', 'venue'):
+        filters[name] = int(params[name]) if params.get(name) else None
+    return filters
+
+
+def export_filename(filters):
+    return f"{filters['kind']}_{filters['start']:%Y%m%d}_{filters['end']:%Y%m%d}.csv"
+
+
+def filtered_sessions(filters):
+    sessions = Session.objects.filter(session_date__gte=filters['start'], session_date__lte=filters['end'])
+    if filters['group']:
+        sessions = sessions.filter(school_group_id=filters['group'])
+    if filters['venue']:
+        sessions = sessions.filter(venue_id=filters['venue'])
+    if filters['coach']:
+        sessions = sessions.filter(coaches_attending=filters['coach'])
+    if filters['cancelled'] == 'exclude':
+        sessions = sessions.filter(is_cancelled=False)
+    elif filters['cancelled'] == 'only':
+        sessions = sessions.filter(is_cancelled=True)
+    return sessions
+
+
+def _chunked(rows, size=EXPORT_CHUNK_SIZE):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _time_slot(start_time, duration_minutes):
+    end_time = datetime.datetime.combine(_TIME_BASE, start_time) + datetime.timedelta(minutes=duration_minutes)
+    return f"{start_time:%H:%M} - {end_time:%H:%M}"
+
+
+def session_rows(filters):
+    yield ['Date', 'Day', 'Time Slot', 'Group', 'Coaches', 'Venue', 'Status']
+    rows = filtered_sessions(filters).order_by('session_date', 'session_start_time', 'pk').values_list(
+        'pk', 'session_date', 'session_start_time', 'planned_duration_minutes',
+        'school_group__name', 'venue__name', 'is_cancelled',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for chunk in _chunked(rows):
+        coaches = {}
+        for session_id, name in SessionCoach.objects.filter(
+            session_id__in=[row[0] for row in chunk]
+        ).order_by('coach__name').values_list('session_id', 'coach__name'):
+            coaches.setdefault(session_id, []).append(name)
+        for session_id, day, start_time, duration, group_name, venue_name, is_cancelled in chunk:
+            yield [
+                day, f"{day:%A}", _time_slot(start_time, duration), group_name or "N/A",
+                ", ".join(coaches.get(session_id, [])) or "N/A", venue_name or "N/A",
+                "Cancelled" if is_cancelled else "Scheduled",
+            ]
+
+
+def attendance_rows(filters):
+    yield ['Date', 'Time', 'Group', 'Session ID', 'Player ID', 'First Name', 'Last Name']
+    rows = SessionAttendee.objects.filter(session__in=filtered_sessions(filters).values('pk')).order_by(
+        'session__session_date', 'session__session_start_time', 'session_id', 'player__last_name', 'player__first_name'
+    ).values_list(
+        'session__session_date', 'session__session_start_time', 'session__school_group__name',
+        'session_id', 'player_id', 'player__first_name', 'player__last_name',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for day, start_time, group_name, session_id, player_id, first_name, last_name in rows:
+        yield [day, f"{start_time:%H:%M}", group_name or "N/A", session_id, player_id, first_name, last_name]
+
+
+def assessment_rows(filters, include_hidden=False):
+    yield [
+        'Date', 'Group', 'Session ID', 'Player ID', 'Player', 'Coach',
+        'Effort', 'Focus', 'Resilience', 'Composure', 'Decision Making', 'Notes',
+    ]
+    assessments = SessionAssessment.objects.filter(session__in=filtered_sessions(filters).values('pk'))
+    if not include_hidden:
+        assessments = assessments.filter(is_hidden=False)
+    rows = assessments.order_by(
+        'session__session_date', 'session__session_start_time', 'session_id', 'player__last_name', 'pk'
+    ).values_list(
+        'session__session_date', 'session__school_group__name', 'session_id', 'player_id',
+        'player__first_name', 'player__last_name', 'submitted_by__username',
+        'effort_rating', 'focus_rating', 'resilience_rating', 'composure_rating', 'decision_making_rating',
+        'coach_notes',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for day, group_name, session_id, player_id, first_name, last_name, coach, *ratings, notes in rows:
+        yield [day, group_name or "N/A", session_id, player_id, f"{first_name} {last_name}", coach or "", *ratings, notes]
+
+
+def export_rows(filters, include_hidden=False):
+    if filters['kind'] == 'attendance':
+        return attendance_rows(filters)
+    if filters['kind'] == 'assessments':
+        return assessment_rows(filters, include_hidden)
+    return session_rows(filters)
+
+
+def stream_csv(rows):
+    """The rows as CSV lines, one string per row, for a StreamingHttpResponse."""
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
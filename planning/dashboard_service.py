@@ -0,0 +1,330 @@
+# planning/dashboard_service.py
+
+import hashlib
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.db.models import F, Q, Prefetch, Exists, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from .models import (
+    Session, Coach, CoachAvailability, SessionAssessment, GroupAssessment
+)
+from .assessment_ledger import pending_ledger_entries
+
+# How many rows each dashboard panel shows.
+UPCOMING_SESSIONS_LIMIT = 5
+FEEDBACK_REMINDERS_LIMIT = 5
+ASSESSMENT_REVIEW_LIMIT = 20
+GROUP_ASSESSMENT_REVIEW_LIMIT = 10
+SOLO_LOGS_LIMIT = 10
+FEEDBACK_LOOKBACK_WEEKS = 4
+UNSTAFFED_LOOKAHEAD_WEEKS = 2
+STAFFING_ALERT_WINDOW_HOURS = 48
+
+# Rendered panels are cached per user and role. Entries are invalidated by the
+# signals in planning/signals.py bumping these scopes; the timeout only bounds
+# how stale the time-dependent panels (e.g. "upcoming") can get.
+DASHBOARD_CACHE_TIMEOUT = 300
+DASHBOARD_PANEL_SCOPES = {
+    'superuser': {
+        'staffing_alerts': ('sessions', 'availability'),
+        'upcoming_sessions': ('sessions',),
+        'assessment_review': ('assessments',),
+        'group_assessment_review': ('group_assessments',),
+        'solo_logs': ('solo',),
+    },
+    'coach': {
+        'upcoming_sessions': ('user',),
+        'direct_confirmation': ('user',),
+        'feedback_reminders': ('user',),
+    },
+}
+
+
+DASHBOARD_PANEL_TEMPLATE = 'planning/dashboard/_{panel}.html'
+DASHBOARD_PAGE_TITLES = {'superuser': "Admin Dashboard", 'coach': "Coach Dashboard"}
+
+
+def get_dashboard_role(user):
+    """Returns 'superuser', 'coach' or None for the dashboard variant a user sees."""
+    if user.is_superuser:
+        return 'superuser'
+    if user.is_staff:
+        return 'coach'
+    return None
+
+
+def get_coach_profile(user):
+    """Returns the Coach linked to a user, or None. Costs at most one query."""
+    try:
+        return user.coach_profile
+    except Coach.DoesNotExist:
+        return None
+
+
+def _upcoming_sessions_qs(now):
+    today = now.date()
+    return Session.objects.filter(
+        Q(session_date__gt=today) | Q(session_date=today, session_start_time__gte=now.time()),
+        is_cancelled=False
+    ).select_related('school_group', 'venue').order_by('session_date', 'session_start_time')
+
+
+def get_upcoming_sessions(now, coach_profile=None):
+    """Next few sessions, optionally limited to those a coach is assigned to. One query."""
+    sessions_qs = _upcoming_sessions_qs(now)
+    if coach_profile is not None:
+        sessions_qs = sessions_qs.filter(coaches_attending=coach_profile)
+    return list(sessions_qs[:UPCOMING_SESSIONS_LIMIT])
+
+
+def get_sessions_for_direct_confirmation(user, coach_profile, now):
+    """
+    Tomorrow's sessions for a coach that they have not yet confirmed.
+    The coach's own availability row is pulled in with subquery annotations,
+    so this is a single query regardless of how many sessions there are.
+    """
+    tomorrow = now.date() + timedelta(days=1)
+    my_availability = CoachAvailability.objects.filter(session=OuterRef('pk'), coach=user)
+    sessions_qs = Session.objects.filter(
+        session_date=tomorrow,
+        coaches_attending=coach_profile,
+        is_cancelled=False
+    ).annotate(
+        my_is_available=Subquery(my_availability.values('is_available')[:1]),
+        my_availability_notes=Subquery(my_availability.values('notes')[:1]),
+    ).select_related('school_group', 'venue').order_by('session_start_time')
+
+    sessions_for_confirmation = []
+    for session in sessions_qs:
+        if session.my_is_available is True:
+            continue
+        sessions_for_confirmation.append({
+            'session': session,
+            'current_status_is_declined': session.my_is_available is False,
+            'current_notes': session.my_availability_notes or ""
+        })
+    return sessions_for_confirmation
+
+
+def get_recent_sessions_for_feedback(user, coach_profile, now):
+    """
+    Recently ended sessions where the coach still owes player and/or group assessments.
+    Player assessments are pending when the coach has not marked them complete and at
+    least one attendee has no assessment from this coach. Read from the assessment ledger.
+    """
+    entries = pending_ledger_entries(coach_profile, FEEDBACK_LOOKBACK_WEEKS, now=now).filter(
+        Q(assessments_submitted=False, assessed_player_count__lt=F('expected_player_count'))
+        | Q(group_assessment_done=False)
+    )
+    return [entry.session for entry in entries[:FEEDBACK_REMINDERS_LIMIT]]
+
+
+def get_unstaffed_session_count(now):
+    """Sessions in the next two weeks with nobody assigned. One query."""
+    today = now.date()
+    return Session.objects.filter(
+        session_date__gte=today,
+        session_date__lte=today + timedelta(weeks=UNSTAFFED_LOOKAHEAD_WEEKS),
+        coaches_attending__isnull=True,
+        is_cancelled=False
+    ).count()
+
+
+def get_unconfirmed_staffing_alerts(now):
+    """
+    Staffed sessions in the next 48 hours with assigned coaches who are pending or
+    have declined. Three queries: sessions, assigned coaches (with users) and availabilities.
+    """
+    today = now.date()
+    window_end = now + timedelta(hours=STAFFING_ALERT_WINDOW_HOURS)
+    sessions_qs = Session.objects.filter(
+        Q(session_date__lt=window_end.date()) |
+        Q(session_date=window_end.date(), session_start_time__lte=window_end.time()),
+        Exists(Session.coaches_attending.through.objects.filter(session_id=OuterRef('pk'))),
+        session_date__gte=today,
+        is_cancelled=False
+    ).select_related('school_group').prefetch_related(
+        Prefetch('coaches_attending', queryset=Coach.objects.select_related('user')),
+        Prefetch('coach_availabilities', to_attr='all_coach_availabilities_for_session')
+    ).order_by('session_date', 'session_start_time')
+
+    alerts = []
+    for session in sessions_qs:
+        availability_map = {avail.coach_id: avail for avail in session.all_coach_availabilities_for_session}
+        unconfirmed_coaches = []
+        for coach_profile in session.coaches_attending.all():
+            coach_user = coach_profile.user
+            if not coach_user:
+                continue
+            availability_record = availability_map.get(coach_user.id)
+            if not availability_record or availability_record.is_available is None:
+                status = "Pending Response"
+                notes = availability_record.notes if availability_record else ""
+            elif availability_record.is_available is False:
+                status = "Declined"
+                notes = availability_record.notes
+            else:
+                continue
+            unconfirmed_coaches.append({
+                'name': coach_user.get_full_name() or coach_user.username,
+                'status': status,
+                'notes': notes
+            })
+        if unconfirmed_coaches:
+            alerts.append({'session': session, 'unconfirmed_coaches': unconfirmed_coaches})
+    return alerts
+
+
+def get_assessments_to_review():
+    """Player assessments a superuser has not yet reviewed. One query."""
+    return list(SessionAssessment.objects.filter(
+        superuser_reviewed=False
+    ).select_related(
+        'player', 'session', 'session__school_group', 'submitted_by', 'session__venue'
+    ).order_by('-date_recorded', '-session__session_date')[:ASSESSMENT_REVIEW_LIMIT])
+
+
+def get_group_assessments_to_review():
+    """Group assessments a superuser has not yet reviewed. One query."""
+    return list(GroupAssessment.objects.filter(
+        superuser_reviewed=False
+    ).select_related(
+        'session', 'session__school_group', 'assessing_coach', 'session__venue'
+    ).order_by('-assessment_datetime')[:GROUP_ASSESSMENT_REVIEW_LIMIT])
+
+
+def solosync_enabled():
+    return 'solosync_api' in settings.INSTALLED_APPS
+
+
+def get_recent_solo_logs():
+    """Latest SoloSync logs, or an empty list if SoloSync is unavailable. One query."""
+    if not solosync_enabled():
+        return []
+    from solosync_api.models import SoloSessionLog
+    return list(SoloSessionLog.objects.select_related(
+        'player', 'routine'
+    ).order_by('-completed_at')[:SOLO_LOGS_LIMIT])
+
+
+def dashboard_cache_scope(name, user_id=None):
+    """Cache-version scope for a dashboard dependency; 'user' scopes are per coach user."""
+    if name == 'user':
+        return f"dashboard:user:{user_id}"
+    return f"dashboard:{name}"
+
+
+def get_dashboard_cache_keys(user, now=None, csrf_secret=''):
+    """
+    Returns {panel: cache key} for the user's role, for use as the vary_on of the
+    {% cache %} fragments in planning/homepage.html. Costs one cache round trip and
+    no queries. Panels containing forms embed a CSRF token, so the CSRF secret is
+    folded into the key to avoid serving a token from a previous login.
+    """
+    from .cache_versions import get_versions
+
+    role = get_dashboard_role(user)
+    if role is None:
+        return {}
+    now = timezone.localtime(now or timezone.now())
+    panels = DASHBOARD_PANEL_SCOPES[role]
+    scope_names = {name for names in panels.values() for name in names}
+    versions = get_versions([dashboard_cache_scope(name, user.pk) for name in scope_names])
+    csrf_fingerprint = hashlib.sha256(csrf_secret.encode()).hexdigest()[:12]
+
+    cache_keys = {}
+    for panel, names in panels.items():
+        stamp = '.'.join(str(versions[dashboard_cache_scope(name, user.pk)]) for name in names)
+        cache_keys[panel] = f"{role}:{user.pk}:{now.date().isoformat()}:{csrf_fingerprint}:{stamp}"
+    return cache_keys
+
+
+def _panel(lazy, getter, *args):
+    # Lazy panels are only evaluated if the template renders them, i.e. on a cache miss.
+    if lazy:
+        return SimpleLazyObject(partial(getter, *args))
+    return getter(*args)
+
+
+def get_dashboard_panels(user):
+    """Names of the panels the user's dashboard shell fetches, in display order."""
+    panels = list(DASHBOARD_PANEL_SCOPES.get(get_dashboard_role(user), {}))
+    if not solosync_enabled() and 'solo_logs' in panels:
+        panels.remove('solo_logs')
+    return panels
+
+
+def build_dashboard_context(user, now=None, lazy=False):
+    """
+    Assembles every dashboard panel for a user with a bounded number of queries:
+    the count depends only on the user's role, never on how many sessions,
+    attendees or availabilities exist.
+
+    Returns the template context for planning/homepage.html. 'coach_profile' is None
+    for staff users without a linked Coach so the caller can warn about it.
+    With lazy=True each panel is deferred until the template first touches it,
+    so cached fragments cost no queries at all.
+    """
+    now = timezone.localtime(now or timezone.now())
+    role = get_dashboard_role(user)
+
+    context = {
+        'upcoming_sessions': [],
+        'recent_sessions_for_feedback': [],
+        'recent_solo_logs': [],
+        'unstaffed_session_count': 0,
+        'all_coach_assessments': None,
+        'recent_group_assessments': None,
+        'unconfirmed_staffing_alerts': [],
+        'sessions_for_direct_confirmation': [],
+        'page_title': "Dashboard",
+        'solosync_imported': solosync_enabled(),
+        'dashboard_role': role,
+        'coach_profile': None,
+    }
+
+    if role == 'superuser':
+        context.update({
+            'page_title': DASHBOARD_PAGE_TITLES[role],
+            'upcoming_sessions': _panel(lazy, get_upcoming_sessions, now),
+            'all_coach_assessments': _panel(lazy, get_assessments_to_review),
+            'recent_group_assessments': _panel(lazy, get_group_assessments_to_review),
+            'unstaffed_session_count': _panel(lazy, get_unstaffed_session_count, now),
+            'unconfirmed_staffing_alerts': _panel(lazy, get_unconfirmed_staffing_alerts, now),
+        })
+    elif role == 'coach':
+        context['page_title'] = DASHBOARD_PAGE_TITLES[role]
+        coach_profile = get_coach_profile(user)
+        context['coach_profile'] = coach_profile
+        if coach_profile:
+            context.update({
+                'upcoming_sessions': _panel(lazy, get_upcoming_sessions, now, coach_profile),
+                'sessions_for_direct_confirmation': _panel(
+                    lazy, get_sessions_for_direct_confirmation, user, coach_profile, now
+                ),
+                'recent_sessions_for_feedback': _panel(
+                    lazy, get_recent_sessions_for_feedback, user, coach_profile, now
+                ),
+            })
+
+    if context['solosync_imported']:
+        context['recent_solo_logs'] = _panel(lazy, get_recent_solo_logs)
+
+    return context
+
+
+def render_dashboard_panel(request, panel, cache_key, now=None):
+    """
+    Renders a single dashboard panel to HTML for the panel endpoint.
+    The context is built lazily, so only the panel's own queries run, and only on a
+    fragment-cache miss; a warm cache costs at most the coach-profile lookup.
+    """
+    context = build_dashboard_context(request.user, now=now, lazy=True)
+    context['dashboard_cache_key'] = cache_key
+    context['dashboard_cache_timeout'] = DASHBOARD_CACHE_TIMEOUT
+    return render_to_string(DASHBOARD_PANEL_TEMPLATE.format(panel=panel), context, request=request)
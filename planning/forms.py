@@ -94,6 +94,24 @@ class SessionAssessmentForm(forms.ModelForm):
             if field_name != 'coach_notes':
                 self.fields[field_name].required = False
 
+# --- Bulk Session Assessment (one row per attendee) ---
+class BulkAssessmentRowForm(SessionAssessmentForm):
+    player_id = forms.IntegerField(widget=forms.HiddenInput)
+
+    class Meta(SessionAssessmentForm.Meta):
+        widgets = {
+            'effort_rating': forms.Select, 'focus_rating': forms.Select,
+            'resilience_rating': forms.Select, 'composure_rating': forms.Select,
+            'decision_making_rating': forms.Select, 'coach_notes': forms.Textarea(attrs={'rows': 1})
+        }
+
+    def validate_unique(self):
+        # Rows are saved together by assessment_service.save_bulk_assessments, which
+        # updates an existing assessment instead of creating a duplicate.
+        pass
+
+BulkAssessmentFormSet = forms.formset_factory(BulkAssessmentRowForm, extra=0)
+
 # --- Court Sprint Form ---
 class CourtSprintRecordForm(forms.ModelForm):
     date_recorded = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}), initial=timezone.now().date())
@@ -0,0 +1,592 @@
+# planning/import_pipeline.py
+
+"""
+Streaming CSV import pipeline for backfilling spreadsheets.
+
+Each file is read row by row and handled by a row mapper chosen by kind (MAPPERS):
+groups, players, schedules, attendance or tests. Rows are mapped in chunks and each
+chunk is written in its own transaction with bulk queries, so memory stays flat
+however long the file is. A row that cannot be used is reported and skipped without
+failing its chunk.
+
+After every committed chunk the number of rows done is saved to a checkpoint file
+(JSON, replaced atomically). Running the same import again resumes each file after its
+last committed chunk and skips finished files. The mappers look up existing rows
+before writing, so a chunk that committed just before an interruption, without its
+checkpoint, is not written twice when it is read again.
+
+Several files can be imported concurrently (workers > 1), each in its own thread
+with its own database connection. The threads read and map rows in parallel but take
+turns writing: each chunk is written and committed under one lock for the run, and
+looks up the rows it depends on inside it, so files naming the same player, group or
+session do not create it twice. SQLite allows one writer at a time, so imports there
+always run one file at a time.
+
+New mappers subclass RowMapper and are added with @register_mapper. Bulk writes
+bypass the model signals, so each mapper updates the caches and derived data its
+writes affect in the same chunk transaction; a resumed import then has nothing left
+to refresh for the chunks committed before the interruption.
+"""
+
+import csv
+import json
+import os
+import threading
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date, datetime, time
+from itertools import islice
+
+from django.db import connection, connections, transaction
+
+from .assessment_ledger import refresh_assessment_ledger
+from .attendance_service import start_memberships
+from .models import Player, SchoolGroup, ScheduledClass, Session
+from .player_analytics import METRICS, mark_attendance_stale, refresh_player_metric
+from .player_search import index_players
+from .schedule_import import DAY_FILES, ImportRow, apply_import_plan, build_import_plan, name_key, parse_schedule_row
+from .utils import parse_grade_from_string
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 50
+
+PlayerGroups = Player.school_groups.through
+SessionAttendee = Session.attendees.through
+
+FileResult = namedtuple('FileResult', 'path kind rows_read rows_written rows_skipped resumed_from errors')
+
+
+class ImportPipelineError(ValueError):
+    """Raised when a file cannot be imported at all, e.g. an unknown kind or missing columns."""
+
+
+# --- Checkpoints ---
+
+class Checkpoint:
+    """
+    Rows committed per (kind, file), kept in a JSON file. Entries remember the file's
+    size and modification time; a file that changed since is imported from the start.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self._entries = json.load(f)
+
+    @staticmethod
+    def _key(kind, file_path):
+        return f"{kind}:{os.path.abspath(file_path)}"
+
+    @staticmethod
+    def _signature(file_path):
+        stat = os.stat(file_path)
+        return [stat.st_size, int(stat.st_mtime)]
+
+    def get(self, kind, file_path):
+        """(rows_done, finished) for the file, (0, False) when it has not been started or has changed."""
+        entry = self._entries.get(self._key(kind, file_path))
+        if not entry or entry['signature'] != self._signature(file_path):
+            return 0, False
+        return entry['rows_done'], entry['finished']
+
+    def record(self, kind, file_path, rows_done, finished=False):
+        with self._lock:
+            self._entries[self._key(kind, file_path)] = {
+                'rows_done': rows_done, 'finished': finished, 'signature': self._signature(file_path),
+            }
+            if self.path:
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._entries, f, indent=1)
+                os.replace(temp_path, self.path)
+
+    def forget(self, kind, file_path):
+        with self._lock:
+            self._entries.pop(self._key(kind, file_path), None)
+
+
+# --- Row mappers ---
+
+MAPPERS = {}
+
+
+def register_mapper(mapper_class):
+    MAPPERS[mapper_class.kind] = mapper_class
+    return mapper_class
+
+
+class RowMapper:
+    """
+    Turns the rows of one file into database writes. map_row returns the row's value
+    for write_chunk or raises ValueError to skip the row; write_chunk runs inside the
+    chunk's transaction, under the run's write lock, and returns the number of rows
+    written, calling skip() for rows it finds unusable only then. It also refreshes
+    whatever derived data its writes affect. prepare runs once before the first chunk
+    and finish once after the last.
+    """
+    kind = None
+    required_columns = ()
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.skipped = []
+
+    def skip(self, row_num, reason):
+        self.skipped.append((row_num, reason))
+
+    def prepare(self):
+        pass
+
+    def map_row(self, row, row_num):
+        raise NotImplementedError
+
+    def write_chunk(self, items):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+
+def _value(row, column):
+    return (row.get(column) or '').strip()
+
+
+def _player_name(row):
+    """(first_name, last_name) from first_name/last_name columns or one 'player' column."""
+    if 'player' in row:
+        first_name, _, last_name = _value(row, 'player').partition(' ')
+        last_name = last_name.strip()
+    else:
+        first_name, last_name = _value(row, 'first_name'), _value(row, 'last_name')
+    if not first_name:
+        raise ValueError("missing player name")
+    return first_name, last_name
+
+
+def _parse_date(text):
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        return datetime.strptime(text, '%d/%m/%Y').date()
+
+
+def _parse_time(text):
+    hour, _, minute = text.partition(':')
+    return time(int(hour), int(minute[:2] or 0))
+
+
+def _create_with_ids(model, objs):
+    """
+    bulk_create, where the database returns the new ids; elsewhere each object is saved
+    (and its signals run). Returns True when the rows were bulk-created.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        model.objects.bulk_create(objs)
+        return True
+    for obj in objs:
+        obj.save()
+    return False
+
+
+class PlayerIndex:
+    """
+    Existing players by case-folded name, loaded once per file and extended as players
+    are created. refresh() adds the players created since by other imports.
+    """
+
+    def __init__(self):
+        self.by_name = defaultdict(list)
+        self.known = set()
+        self.last_pk = 0
+        self.refresh()
+
+    def refresh(self):
+        for pk, first_name, last_name in Player.objects.filter(pk__gt=self.last_pk).values_list(
+            'pk', 'first_name', 'last_name'
+        ):
+            self.last_pk = max(self.last_pk, pk)
+            if pk not in self.known:
+                self.known.add(pk)
+                self.by_name[name_key(first_name, last_name)].append(pk)
+
+    def find_current(self, first_name, last_name):
+        """find, refreshing the index first when the player is not in it."""
+        player_id = self.find(first_name, last_name)
+        if player_id is None:
+            self.refresh()
+            player_id = self.find(first_name, last_name)
+        return player_id
+
+    def find(self, first_name, last_name):
+        """The id of the one player with that name, None when there is none. ValueError for duplicates."""
+        matches = self.by_name.get(name_key(first_name, last_name), [])
+        if len(matches) > 1:
+            raise ValueError(f"{len(matches)} players named '{first_name} {last_name}'; resolve them manually")
+        return matches[0] if matches else None
+
+    def add(self, player):
+        self.known.add(player.pk)
+        self.by_name[name_key(player.first_name, player.last_name)].append(player.pk)
+
+
+@register_mapper
+class GroupMapper(RowMapper):
+    """name[, description]"""
+    kind = 'groups'
+    required_columns = ('name',)
+
+    def map_row(self, row, row_num):
+        name = _value(row, 'name')
+        if not name:
+            raise ValueError("missing group name")
+        return name, _value(row, 'description') or None
+
+    def write_chunk(self, items):
+        wanted = dict(items)
+        existing = {group.name: group for group in SchoolGroup.objects.filter(name__in=wanted)}
+        SchoolGroup.objects.bulk_create(
+            SchoolGroup(name=name, description=description)
+            for name, description in wanted.items() if name not in existing
+        )
+        changed = []
+        for name, group in existing.items():
+            if wanted[name] is not None and group.description != wanted[name]:
+                group.description = wanted[name]
+                changed.append(group)
+        SchoolGroup.objects.bulk_update(changed, ['description'])
+        return len(wanted) - len(existing) + len(changed)
+
+
+@register_mapper
+class PlayerMapper(RowMapper):
+    """first_name, last_name (or player)[, grade, school_group, contact_number, parent_contact_number, is_active]"""
+    kind = 'players'
+    UPDATE_FIELDS = ('grade', 'contact_number', 'parent_contact_number', 'is_active')
+
+    def prepare(self):
+        self.players = PlayerIndex()
+        self.groups = dict(SchoolGroup.objects.values_list('name', 'pk'))
+
+    def map_row(self, row, row_num):
+        first_name, last_name = _player_name(row)
+        self.players.find(first_name, last_name)  # Duplicates are skipped.
+        fields = {}
+        if _value(row, 'grade'):
+            fields['grade'] = parse_grade_from_string(_value(row, 'grade'))
+        for name in ('contact_number', 'parent_contact_number'):
+            if _value(row, name):
+                fields[name] = _value(row, name)
+        if _value(row, 'is_active'):
+            fields['is_active'] = _value(row, 'is_active').lower() in ('1', 'true', 'yes', 'y')
+        group_name = _value(row, 'school_group')
+        if group_name and group_name not in self.groups:
+            raise ValueError(f"unknown school group '{group_name}'")
+        return first_name, last_name, fields, self.groups.get(group_name)
+
+    def write_chunk(self, items):
+        self.players.refresh()  # Players created by files imported alongside this one.
+        new_players, updates, pairs = {}, {}, set()
+        for first_name, last_name, fields, group_id in items:
+            player_id = self.players.find(first_name, last_name)
+            if player_id is None:
+                key = name_key(first_name, last_name)
+                player = new_players.setdefault(key, Player(first_name=first_name, last_name=last_name))
+                for name, value in fields.items():
+                    setattr(player, name, value)
+                pairs.add((key, group_id))
+            else:
+                updates.setdefault(player_id, {}).update(fields)
+                pairs.add((player_id, group_id))
+
+        created = list(new_players.values())
+        if _create_with_ids(Player, created):
+            index_players(created)
+        for player in created:
+            self.players.add(player)
+
+        changed = []
+        for player in Player.objects.filter(pk__in=[pk for pk, fields in updates.items() if fields]):
+            if any(getattr(player, name) != value for name, value in updates[player.pk].items()):
+                for name, value in updates[player.pk].items():
+                    setattr(player, name, value)
+                changed.append(player)
+        Player.objects.bulk_update(changed, self.UPDATE_FIELDS)
+
+        pairs = {
+            (new_players[ref].pk if isinstance(ref, tuple) else ref, group_id)
+            for ref, group_id in pairs if group_id
+        }
+        existing = set(PlayerGroups.objects.filter(
+            player_id__in={player_id for player_id, _ in pairs}
+        ).values_list('player_id', 'schoolgroup_id'))
+        added = pairs - existing
+        PlayerGroups.objects.bulk_create(
+            [PlayerGroups(player_id=player_id, schoolgroup_id=group_id) for player_id, group_id in added],
+            ignore_conflicts=True,
+        )
+        start_memberships(added)
+        mark_attendance_stale(player_ids={player_id for player_id, _ in added})
+        return len(created) + len(changed) + len(added)
+
+
+@register_mapper
+class ScheduleMapper(RowMapper):
+    """
+    The weekly schedule layout (school_group_name, session_start_time,
+    player_first_name, player_grade), with the day from a day_of_week column (0-6 or a
+    day name) or, for Mondays.csv ... Fridays.csv, from the file name.
+    """
+    kind = 'schedules'
+    required_columns = ('school_group_name', 'session_start_time', 'player_first_name')
+    DAYS = {name.lower(): number for number, name in ScheduledClass.DAY_OF_WEEK_CHOICES}
+
+    def prepare(self):
+        self.file_day = DAY_FILES.get(os.path.basename(self.file_path))
+
+    def map_row(self, row, row_num):
+        day = _value(row, 'day_of_week').lower()
+        day_of_week = int(day) if day.isdigit() else self.DAYS.get(day.rstrip('s'), self.file_day)
+        if day_of_week is None:
+            raise ValueError("missing day_of_week")
+        parsed = parse_schedule_row(row, os.path.basename(self.file_path), row_num, day_of_week)
+        if not isinstance(parsed, ImportRow):
+            raise ValueError("missing group, time or player name")
+        return parsed
+
+    def write_chunk(self, items):
+        plan = build_import_plan(items)
+        apply_import_plan(plan)
+        for level, message in plan.messages:
+            if level == 'error':
+                self.skip(None, message)
+        return sum(value for name, value in plan.stats().items() if name != 'rows_skipped')
+
+
+@register_mapper
+class AttendanceMapper(RowMapper):
+    """
+    date, school_group, first_name, last_name (or player)[, start_time]. A session
+    that does not exist yet is created from the group's rule for that weekday, or
+    from start_time.
+    """
+    kind = 'attendance'
+    required_columns = ('date', 'school_group')
+
+    def prepare(self):
+        self.players = PlayerIndex()
+        self.groups = dict(SchoolGroup.objects.values_list('name', 'pk'))
+        self.rules = {}
+        for rule in ScheduledClass.objects.filter(is_active=True).order_by('start_time'):
+            self.rules.setdefault((rule.school_group_id, rule.day_of_week), rule)
+
+    def map_row(self, row, row_num):
+        group_id = self.groups.get(_value(row, 'school_group'))
+        if group_id is None:
+            raise ValueError(f"unknown school group '{_value(row, 'school_group')}'")
+        player_id = self.players.find_current(*_player_name(row))
+        if player_id is None:
+            raise ValueError(f"unknown player '{' '.join(_player_name(row))}'")
+        start_time = _parse_time(_value(row, 'start_time')) if _value(row, 'start_time') else None
+        return row_num, player_id, group_id, _parse_date(_value(row, 'date')), start_time
+
+    @staticmethod
+    def _matching(sessions, group_id, day, start_time):
+        candidates = sessions.get((group_id, day), [])
+        if start_time is not None:
+            candidates = [session for session in candidates if session[1] == start_time]
+        return [session_id for session_id, _ in candidates]
+
+    def write_chunk(self, items):
+        sessions = defaultdict(list)
+        for pk, group_id, day, start_time in Session.objects.filter(
+            school_group_id__in={item[2] for item in items}, session_date__in={item[3] for item in items}
+        ).values_list('pk', 'school_group_id', 'session_date', 'session_start_time'):
+            sessions[(group_id, day)].append((pk, start_time))
+
+        missing = {}
+        for _, _, group_id, day, start_time in items:
+            rule = self.rules.get((group_id, day.weekday()))
+            if not self._matching(sessions, group_id, day, start_time) and (start_time or rule):
+                missing.setdefault((group_id, day, start_time or rule.start_time), rule)
+        new_sessions = [
+            Session(
+                school_group_id=group_id, session_date=day, session_start_time=start_time,
+                planned_duration_minutes=rule.default_duration_minutes if rule else 60,
+                venue_id=rule.default_venue_id if rule else None, generated_from_rule=rule,
+            )
+            for (group_id, day, start_time), rule in missing.items()
+        ]
+        _create_with_ids(Session, new_sessions)
+        for session in new_sessions:
+            sessions[(session.school_group_id, session.session_date)].append((session.pk, session.session_start_time))
+
+        rows = set()
+        for row_num, player_id, group_id, day, start_time in items:
+            matching = self._matching(sessions, group_id, day, start_time)
+            if len(matching) == 1:
+                rows.add((matching[0], player_id))
+            elif matching:
+                self.skip(row_num, f"{len(matching)} sessions of the group on {day}; give start_time")
+            else:
+                self.skip(row_num, f"no session of the group on {day} and no rule to create it from")
+        existing = set(SessionAttendee.objects.filter(
+            session_id__in={session_id for session_id, _ in rows}
+        ).values_list('session_id', 'player_id'))
+        added = rows - existing
+        SessionAttendee.objects.bulk_create(
+            [SessionAttendee(session_id=session_id, player_id=player_id) for session_id, player_id in added],
+            ignore_conflicts=True,
+        )
+        refresh_assessment_ledger({session_id for session_id, _ in added})
+        self._refresh_derived(new_sessions, {player_id for _, player_id in added})
+        return len(added)
+
+    @staticmethod
+    def _refresh_derived(new_sessions, player_ids):
+        from .calendar_service import invalidate_calendar
+        from .signals import invalidate_dashboard
+
+        mark_attendance_stale(player_ids=player_ids)
+        if new_sessions:
+            invalidate_calendar(user_ids=())
+            invalidate_dashboard('sessions')
+        elif player_ids:
+            invalidate_calendar(attendance_only=True)
+
+
+@register_mapper
+class TestRecordMapper(RowMapper):
+    """
+    date, test (sprint/volley/drive), type (3m/5m/10m or FH/BH), value, first_name,
+    last_name (or player). A record identical to an existing one is not added again.
+    """
+    kind = 'tests'
+    required_columns = ('date', 'test', 'type', 'value')
+
+    def prepare(self):
+        self.players = PlayerIndex()
+
+    def map_row(self, row, row_num):
+        test = _value(row, 'test').lower()
+        if test not in METRICS:
+            raise ValueError(f"test must be one of {', '.join(METRICS)}")
+        model, type_field, value_field = METRICS[test]
+        kind = _value(row, 'type')
+        choices = {value.lower(): value for value, _ in model._meta.get_field(type_field).choices}
+        if kind.lower() not in choices:
+            raise ValueError(f"type must be one of {', '.join(choices.values())}")
+        player_id = self.players.find_current(*_player_name(row))
+        if player_id is None:
+            raise ValueError(f"unknown player '{' '.join(_player_name(row))}'")
+        return test, player_id, _parse_date(_value(row, 'date')), choices[kind.lower()], int(_value(row, 'value'))
+
+    def write_chunk(self, items):
+        written, touched = 0, set()
+        by_test = defaultdict(set)
+        for test, *record in items:
+            by_test[test].add(tuple(record))
+        for test, records in by_test.items():
+            model, type_field, value_field = METRICS[test]
+            existing = set(model.objects.filter(
+                player_id__in={record[0] for record in records},
+                date_recorded__in={record[1] for record in records},
+            ).values_list('player_id', 'date_recorded', type_field, value_field))
+            new = records - existing
+            model.objects.bulk_create(
+                model(player_id=player_id, date_recorded=day, **{type_field: kind, value_field: value})
+                for player_id, day, kind, value in new
+            )
+            touched.update((player_id, test) for player_id, *_ in new)
+            written += len(new)
+        for player_id, metric in touched:
+            refresh_player_metric(player_id, metric)
+        return written
+
+
+# --- Running imports ---
+
+def _detect_delimiter(header_line):
+    return ';' if header_line.count(';') > header_line.count(',') else ','
+
+
+def import_file(kind, file_path, checkpoint=None, chunk_size=DEFAULT_CHUNK_SIZE, delimiter=None, write_lock=None):
+    """
+    Imports one file with the mapper for `kind`, resuming from the checkpoint. Chunks
+    are written under write_lock when given. Returns a FileResult.
+    """
+    if kind not in MAPPERS:
+        raise ImportPipelineError(f"Unknown import kind '{kind}'. Choose from: {', '.join(MAPPERS)}.")
+    checkpoint = checkpoint or Checkpoint(None)
+    write_lock = write_lock or nullcontext()
+    rows_done, finished = checkpoint.get(kind, file_path)
+    if finished:
+        return FileResult(file_path, kind, 0, 0, 0, rows_done, [])
+
+    mapper = MAPPERS[kind](file_path)
+    rows_read = rows_written = rows_skipped = 0
+    errors = []
+    with open(file_path, mode='r', encoding='utf-8-sig', newline='') as csvfile:
+        header = csvfile.readline()
+        csvfile.seek(0)
+        reader = csv.DictReader(csvfile, delimiter=delimiter or _detect_delimiter(header))
+        reader.fieldnames = [name.strip() for name in reader.fieldnames or []]
+        missing = [column for column in mapper.required_columns if column not in reader.fieldnames]
+        if missing:
+            raise ImportPipelineError(f"{os.path.basename(file_path)} is missing columns: {', '.join(missing)}.")
+
+        mapper.prepare()
+        for _ in islice(reader, rows_done):
+            pass  # Committed by an earlier run.
+        row_num = rows_done + 1  # The header is row 1.
+        while chunk := list(islice(reader, chunk_size)):
+            items = []
+            for row in chunk:
+                row_num += 1
+                try:
+                    items.append(mapper.map_row(row, row_num))
+                except (ValueError, TypeError) as e:
+                    mapper.skip(row_num, e)
+            with write_lock, transaction.atomic():
+                rows_written += mapper.write_chunk(items) if items else 0
+            rows_read += len(chunk)
+            checkpoint.record(kind, file_path, rows_done + rows_read)
+            rows_skipped += len(mapper.skipped)
+            errors.extend(
+                f"{os.path.basename(file_path)} row {skipped_row}: {reason}" if skipped_row else str(reason)
+                for skipped_row, reason in mapper.skipped[:MAX_REPORTED_ERRORS - len(errors)]
+            )
+            mapper.skipped = []
+        mapper.finish()
+    checkpoint.record(kind, file_path, rows_done + rows_read, finished=True)
+    return FileResult(file_path, kind, rows_read, rows_written, rows_skipped, rows_done, errors)
+
+
+def _import_in_worker(kind, file_path, checkpoint, chunk_size, delimiter, write_lock):
+    try:
+        return import_file(kind, file_path, checkpoint, chunk_size, delimiter, write_lock)
+    finally:
+        connections.close_all()  # This thread's connections only.
+
+
+def run_import(jobs, checkpoint_path=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=1, delimiter=None, restart=False):
+    """
+    Imports the (kind, file_path) jobs, `workers` files at a time, and returns their
+    FileResults in job order. restart ignores earlier progress in the checkpoint.
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    if restart:
+        for kind, file_path in jobs:
+            checkpoint.forget(kind, file_path)
+    if workers <= 1 or connection.vendor == 'sqlite':
+        return [import_file(kind, file_path, checkpoint, chunk_size, delimiter) for kind, file_path in jobs]
+    write_lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_import_in_worker, kind, file_path, checkpoint, chunk_size, delimiter, write_lock)
+            for kind, file_path in jobs
+        ]
+        return [future.result() for future in futures]
@@ -0,0 +1,47 @@
+# planning/management/commands/export_attendance_analytics.py
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from planning.attendance_analytics import AttendanceAnalytics, DEFAULT_RECENT_SESSIONS
+
+
+class Command(BaseCommand):
+    help = 'Exports the players x sessions attendance and rating matrices for a date range as .npz or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="File to write.")
+        parser.add_argument('--start', help="First session date (YYYY-MM-DD). Defaults to a year before --end.")
+        parser.add_argument('--end', help="Last session date (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument('--group', type=int, action='append', dest='groups', help="School group id; repeat for several. Defaults to all groups.")
+        parser.add_argument(
+            '--format', choices=['npz', 'csv', 'summary'], default='npz',
+            help="npz: all arrays; csv: the attendance matrix; summary: per-player figures as CSV."
+        )
+        parser.add_argument('--recent-sessions', type=int, default=DEFAULT_RECENT_SESSIONS, help="Sessions the dropout risk looks back over.")
+
+    def handle(self, *args, **options):
+        try:
+            end = datetime.date.fromisoformat(options['end']) if options['end'] else timezone.localdate()
+            start = datetime.date.fromisoformat(options['start']) if options['start'] else end - datetime.timedelta(days=365)
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+        if end < start:
+            raise CommandError("--end must not be before --start.")
+
+        analytics = AttendanceAnalytics(start, end, school_group_ids=options['groups'])
+        if options['format'] == 'npz':
+            analytics.save_npz(options['output'])
+        else:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                if options['format'] == 'csv':
+                    analytics.write_attendance_csv(output)
+                else:
+                    analytics.write_summary_csv(output, recent_sessions=options['recent_sessions'])
+
+        players, sessions = analytics.attended.shape
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {players} players x {sessions} sessions ({start} to {end}) to {options['output']}."
+        ))
@@ -0,0 +1,60 @@
+# planning/management/commands/import_data.py
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from planning.import_pipeline import MAPPERS, DEFAULT_CHUNK_SIZE, ImportPipelineError, run_import
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams CSV files of groups, players, schedules, attendance or test records into the database '
+        'in chunked transactions, resuming interrupted imports from a checkpoint file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(MAPPERS), help="What the files contain.")
+        parser.add_argument('files', nargs='+', help="CSV files (comma or semicolon separated, with a header row).")
+        parser.add_argument(
+            '--checkpoint', default='.import_checkpoint.json',
+            help="Progress file; running the same import again resumes from it. Default: .import_checkpoint.json"
+        )
+        parser.add_argument('--restart', action='store_true', help="Ignore earlier progress for these files.")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per transaction.")
+        parser.add_argument('--workers', type=int, default=1, help="Files imported concurrently (always 1 on SQLite).")
+        parser.add_argument('--delimiter', help="Field separator. Detected from the header row by default.")
+
+    def handle(self, *args, **options):
+        missing = [path for path in options['files'] if not os.path.isfile(path)]
+        if missing:
+            raise CommandError(f"File(s) not found: {', '.join(missing)}")
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError("--chunk-size and --workers must be at least 1.")
+
+        if options['workers'] > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING("SQLite allows one writer at a time; importing one file at a time."))
+
+        jobs = [(options['kind'], path) for path in options['files']]
+        try:
+            results = run_import(
+                jobs, checkpoint_path=options['checkpoint'], chunk_size=options['chunk_size'],
+                workers=options['workers'], delimiter=options['delimiter'], restart=options['restart'],
+            )
+        except ImportPipelineError as e:
+            raise CommandError(str(e))
+
+        for result in results:
+            name = os.path.basename(result.path)
+            if not result.rows_read and result.resumed_from:
+                self.stdout.write(f"{name}: already imported ({result.resumed_from} rows).")
+                continue
+            resumed = f", resumed after row {result.resumed_from + 1}" if result.resumed_from else ""
+            self.stdout.write(
+                f"{name}: {result.rows_read} rows read, {result.rows_written} written, "
+                f"{result.rows_skipped} skipped{resumed}."
+            )
+            for error in result.errors:
+                self.stdout.write(self.style.WARNING(f"  {error}"))
+        self.stdout.write(self.style.SUCCESS(f"Imported {len(results)} {options['kind']} file(s)."))
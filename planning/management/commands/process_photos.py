@@ -0,0 +1,41 @@
+# planning/management/commands/process_photos.py
+
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from planning.models import Coach, PhotoStatus, Player
+from planning.photo_service import PHOTO_FIELDS, pending_photos, process_photo
+
+MODELS = {'player': Player, 'coach': Coach}
+
+
+class Command(BaseCommand):
+    help = (
+        "Makes the renditions of player and coach photos the background worker has not "
+        "finished: pending, interrupted and failed ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(MODELS), help="Only process players' or coaches' photos.")
+        parser.add_argument('--all', action='store_true', help="Remake the renditions of every photo, e.g. after the sizes change.")
+
+    def handle(self, *args, **options):
+        # PROCESSING rows are left to their worker unless abandoned (see photo_service).
+        statuses = [PhotoStatus.PENDING, PhotoStatus.FAILED]
+        if options['all']:
+            statuses += [PhotoStatus.READY, PhotoStatus.NONE]
+        models = [MODELS[options['model']]] if options['model'] else list(PHOTO_FIELDS)
+
+        results = Counter()
+        for model in models:
+            for pk in pending_photos(model, statuses):
+                status = process_photo(model, pk, statuses=statuses)
+                results[status] += 1
+                if status == PhotoStatus.FAILED:
+                    self.stdout.write(self.style.WARNING(f"Could not read the photo of {model._meta.verbose_name} {pk}."))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Photos processed: {results[PhotoStatus.READY]} ready, {results[PhotoStatus.FAILED]} failed, "
+            f"{results[None]} skipped."
+        ))
@@ -0,0 +1,53 @@
+# planning/management/commands/propose_staffing.py
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from planning.staffing_service import apply_staffing_changes
+from planning.staffing_solver import propose_staffing
+
+
+class Command(BaseCommand):
+    help = 'Proposes coaches for unstaffed sessions in a date range, and optionally applies the proposal.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First date to staff (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument('--end', help="Last date to staff (YYYY-MM-DD). Defaults to 30 days after --start.")
+        parser.add_argument('--coaches-per-session', type=int, default=1, help="Coaches each session should have.")
+        parser.add_argument('--apply', action='store_true', help="Save the proposed assignments.")
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.date.fromisoformat(options['start']) if options['start'] else timezone.localdate()
+            end = datetime.date.fromisoformat(options['end']) if options['end'] else start + datetime.timedelta(days=30)
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+        if end < start:
+            raise CommandError("--end must not be before --start.")
+
+        result = propose_staffing(start, end, coaches_per_session=options['coaches_per_session'])
+
+        self.stdout.write(self.style.SUCCESS(f"--- Staffing proposal {start} to {end} ---"))
+        for item in result['proposals']:
+            session = item['session']
+            flag = " (emergency only)" if item['is_emergency_only'] else ""
+            self.stdout.write(
+                f"{session.session_date} {session.session_start_time:%H:%M}  {session}  ->  {item['coach'].name}{flag}"
+            )
+        for item in result['unfilled']:
+            session = item['session']
+            self.stdout.write(self.style.WARNING(
+                f"{session.session_date} {session.session_start_time:%H:%M}  {session}  still needs {item['missing']} coach(es)"
+            ))
+
+        self.stdout.write(self.style.NOTICE("\n--- Hours in period ---"))
+        for coach, hours in sorted(result['hours'].items(), key=lambda pair: -pair[1]):
+            self.stdout.write(f"{coach.name}: {hours:.1f}h")
+
+        if options['apply'] and result['changes']:
+            applied = apply_staffing_changes(result['changes'])
+            self.stdout.write(self.style.SUCCESS(f"\nApplied {applied['added']} assignments."))
+        elif result['changes']:
+            self.stdout.write(self.style.NOTICE("\nDry run; re-run with --apply to save these assignments."))
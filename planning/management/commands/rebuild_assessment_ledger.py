@@ -0,0 +1,28 @@
+# planning/management/commands/rebuild_assessment_ledger.py
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planning.assessment_ledger import rebuild_assessment_ledger
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the coach assessment ledger from sessions, attendance and assessments, repairing any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Only rebuild rows for sessions on or after this date (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.date.fromisoformat(options['since'])
+            except ValueError as e:
+                raise CommandError(f"Invalid date: {e}")
+
+        self.stdout.write("Rebuilding coach assessment ledger...")
+        created, updated, deleted = rebuild_assessment_ledger(since=since)
+        self.stdout.write(self.style.SUCCESS(
+            f"Ledger rebuilt: {created} rows added, {updated} corrected, {deleted} removed."
+        ))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-19 12:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0038_coach_receive_weekly_schedule_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoachAssessmentLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_date', models.DateField(help_text='Copied from the session so ledger reads need no join.')),
+                ('session_ends_at', models.DateTimeField(help_text='Planned end of the session (start time + duration).')),
+                ('is_cancelled', models.BooleanField(default=False)),
+                ('expected_player_count', models.PositiveIntegerField(default=0, help_text='Players who attended the session.')),
+                ('assessed_player_count', models.PositiveIntegerField(default=0, help_text='Attendees this coach has assessed.')),
+                ('group_assessment_done', models.BooleanField(default=False)),
+                ('assessments_submitted', models.BooleanField(default=False, help_text='Coach marked player assessments complete.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('coach', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assessment_ledger', to='planning.coach')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assessment_ledger', to='planning.session')),
+            ],
+            options={
+                'verbose_name': 'Coach Assessment Ledger Entry',
+                'verbose_name_plural': 'Coach Assessment Ledger',
+                'ordering': ['-session_date', 'coach'],
+                'indexes': [models.Index(fields=['coach', 'session_date'], name='ledger_coach_date_idx'), models.Index(fields=['session_date'], name='ledger_date_idx')],
+                'unique_together': {('coach', 'session')},
+            },
+        ),
+    ]
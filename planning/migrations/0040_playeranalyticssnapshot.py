@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-19 12:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0039_coachassessmentledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerAnalyticsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attended_sessions_count', models.PositiveIntegerField(default=0)),
+                ('relevant_sessions_count', models.PositiveIntegerField(default=0)),
+                ('attendance_percentage', models.PositiveIntegerField(blank=True, null=True)),
+                ('attendance_computed_on', models.DateField(blank=True, help_text='Day the attendance figures were computed for; empty when they need recomputing.', null=True)),
+                ('metric_summary', models.JSONField(blank=True, default=dict, help_text='Latest and best value per metric and type.')),
+                ('match_count', models.PositiveIntegerField(default=0)),
+                ('competitive_match_count', models.PositiveIntegerField(default=0)),
+                ('latest_match_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='analytics_snapshot', to='planning.player')),
+            ],
+            options={
+                'verbose_name': 'Player Analytics Snapshot',
+                'verbose_name_plural': 'Player Analytics Snapshots',
+            },
+        ),
+    ]
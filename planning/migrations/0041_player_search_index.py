@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 12:11
+
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    from planning.player_search import create_search_index
+    create_search_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    from planning.player_search import drop_search_index
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0040_playeranalyticssnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['last_name', 'first_name'], name='player_last_first_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['first_name'], name='player_first_name_idx'),
+        ),
+        # FTS5 table on SQLite, pg_trgm index on PostgreSQL; nothing elsewhere.
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
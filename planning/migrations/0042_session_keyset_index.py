@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-19 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0041_player_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['session_date', 'session_start_time', 'id'], name='session_date_time_id_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2 on 2026-10-19 12:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Min
+from django.utils import timezone
+
+
+def backfill_memberships(apps, schema_editor):
+    """
+    Opens a membership for every current group member. When they joined is not known, so
+    it starts at the group's first session: existing members stay expected at every past
+    session of their groups, as the attendance figures have assumed so far.
+    """
+    Player = apps.get_model('planning', 'Player')
+    Session = apps.get_model('planning', 'Session')
+    PlayerGroupMembership = apps.get_model('planning', 'PlayerGroupMembership')
+    first_session = dict(
+        Session.objects.filter(school_group__isnull=False).values('school_group_id')
+        .annotate(first=Min('session_date')).values_list('school_group_id', 'first')
+    )
+    today = timezone.localdate()
+    PlayerGroupMembership.objects.bulk_create([
+        PlayerGroupMembership(
+            player_id=player_id, school_group_id=group_id,
+            start_date=min(first_session.get(group_id, today), today),
+        )
+        for player_id, group_id in Player.school_groups.through.objects.values_list('player_id', 'schoolgroup_id')
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0042_session_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerGroupMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField(help_text='First day in the group.')),
+                ('end_date', models.DateField(blank=True, help_text='Last day in the group; empty while the player is still a member.', null=True)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_memberships', to='planning.player')),
+                ('school_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='planning.schoolgroup')),
+            ],
+            options={
+                'verbose_name': 'Player Group Membership',
+                'verbose_name_plural': 'Player Group Memberships',
+                'ordering': ['player', 'start_date'],
+                'indexes': [models.Index(fields=['school_group', 'start_date', 'end_date'], name='membership_group_dates_idx'), models.Index(fields=['player', 'start_date', 'end_date'], name='membership_player_dates_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_memberships, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-19 12:41
+
+from django.db import migrations, models
+
+
+def mark_existing_photos_pending(apps, schema_editor):
+    """Photos uploaded before renditions existed are left for `manage.py process_photos`."""
+    for model_name, field in (('Player', 'photo'), ('Coach', 'profile_photo')):
+        model = apps.get_model('planning', model_name)
+        model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).update(
+            **{f'{field}_status': 'PENDING'}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0043_playergroupmembership'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coach',
+            name='profile_photo_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='coach',
+            name='profile_photo_status',
+            field=models.CharField(blank=True, choices=[('', 'No photo'), ('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('READY', 'Ready'), ('FAILED', 'Failed')], default='', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='coach',
+            name='profile_photo_status_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='photo_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='photo_status',
+            field=models.CharField(blank=True, choices=[('', 'No photo'), ('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('READY', 'Ready'), ('FAILED', 'Failed')], default='', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='photo_status_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(mark_existing_photos_pending, migrations.RunPython.noop),
+    ]
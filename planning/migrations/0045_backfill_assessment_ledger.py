@@ -0,0 +1,86 @@
+# Generated by Django 5.2 on 2026-10-19 12:54
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+
+
+def _session_ends_at(session_date, start_time, duration_minutes):
+    """Session.end_datetime, which historical models don't have."""
+    if session_date is None or start_time is None or duration_minutes is None:
+        return None
+    end = datetime.datetime.combine(session_date, start_time) + datetime.timedelta(minutes=duration_minutes)
+    return timezone.make_aware(end) if settings.USE_TZ else end
+
+
+def backfill_assessment_ledger(apps, schema_editor):
+    """
+    Fills the ledger created empty by 0039 from the existing sessions, attendance and
+    assessments, with the same numbers as planning.assessment_ledger. Rows already
+    written by signals since 0039 are replaced, so running it again changes nothing.
+    """
+    Session = apps.get_model('planning', 'Session')
+    SessionAssessment = apps.get_model('planning', 'SessionAssessment')
+    GroupAssessment = apps.get_model('planning', 'GroupAssessment')
+    CoachSessionCompletion = apps.get_model('planning', 'CoachSessionCompletion')
+    CoachAssessmentLedger = apps.get_model('planning', 'CoachAssessmentLedger')
+    attendee_link = Session.attendees.through
+
+    sessions = {
+        pk: (session_date, is_cancelled, _session_ends_at(session_date, start_time, duration))
+        for pk, session_date, start_time, duration, is_cancelled in Session.objects.values_list(
+            'pk', 'session_date', 'session_start_time', 'planned_duration_minutes', 'is_cancelled'
+        )
+    }
+    expected = dict(
+        attendee_link.objects.order_by().values('session_id').annotate(total=Count('*'))
+        .values_list('session_id', 'total')
+    )
+    # Only assessments of players who attended count, as in assessment_ledger._ledger_values.
+    assessed = {
+        (session_id, user_id): total
+        for session_id, user_id, total in SessionAssessment.objects.filter(submitted_by__isnull=False).filter(
+            Exists(attendee_link.objects.filter(session_id=OuterRef('session_id'), player_id=OuterRef('player_id')))
+        ).order_by().values('session_id', 'submitted_by_id').annotate(
+            total=Count('player_id', distinct=True)
+        ).values_list('session_id', 'submitted_by_id', 'total')
+    }
+    group_done = set(
+        GroupAssessment.objects.filter(assessing_coach__isnull=False).values_list('session_id', 'assessing_coach_id')
+    )
+    submitted = set(
+        CoachSessionCompletion.objects.filter(assessments_submitted=True).values_list('session_id', 'coach_id')
+    )
+
+    rows = []
+    for session_id, coach_id, user_id in Session.coaches_attending.through.objects.values_list(
+        'session_id', 'coach_id', 'coach__user_id'
+    ):
+        session_date, is_cancelled, ends_at = sessions[session_id]
+        rows.append(CoachAssessmentLedger(
+            coach_id=coach_id,
+            session_id=session_id,
+            session_date=session_date,
+            session_ends_at=ends_at,
+            is_cancelled=is_cancelled,
+            expected_player_count=expected.get(session_id, 0),
+            assessed_player_count=assessed.get((session_id, user_id), 0),
+            group_assessment_done=(session_id, user_id) in group_done,
+            assessments_submitted=(session_id, coach_id) in submitted,
+        ))
+    CoachAssessmentLedger.objects.all().delete()
+    CoachAssessmentLedger.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0044_photo_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_assessment_ledger, migrations.RunPython.noop),
+    ]
@@ -1,18 +1,25 @@
 # planning/models.py
 import datetime # Keep this as it's used in Session model properties
-import io
 import re
 import os
 
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
-from django.core.files.base import ContentFile
-from PIL import Image, ImageOps
 from datetime import timedelta
 from django.conf import settings
 User = settings.AUTH_USER_MODEL
 
+# --- Photo rendition state (Player and Coach) ---
+class PhotoStatus(models.TextChoices):
+    """Where a player's or coach's photo is in making its renditions (see photo_service)."""
+    NONE = '', 'No photo'
+    PENDING = 'PENDING', 'Pending'
+    PROCESSING = 'PROCESSING', 'Processing'
+    READY = 'READY', 'Ready'
+    FAILED = 'FAILED', 'Failed'
+
+
 # --- MODEL: Venue ---
 class Venue(models.Model):
     """Represents a physical venue where sessions can take place."""
@@ -76,6 +83,11 @@ class Coach(models.Model):
         blank=True,
         verbose_name="Profile Photo"
     )
+    profile_photo_status = models.CharField(
+        max_length=10, choices=PhotoStatus.choices, default=PhotoStatus.NONE, blank=True, editable=False
+    )
+    profile_photo_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    profile_photo_status_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
     experience_notes = models.TextField(
         blank=True, 
         null=True, 
@@ -114,67 +126,20 @@ class Coach(models.Model):
             return self.user.get_full_name() or self.user.username
         return self.name 
     
-    def save(self, *args, **kwargs):
-        # --- Photo optimization logic (similar to Player model) ---
-        original_filename = None
-        process_image = False
-
-        if self.pk: 
-            try:
-                old_instance = Coach.objects.get(pk=self.pk)
-                if self.profile_photo and old_instance.profile_photo != self.profile_photo: 
-                    process_image = True
-                    if hasattr(self.profile_photo, 'name') and self.profile_photo.name:
-                        original_filename = self.profile_photo.name
-                elif not self.profile_photo and old_instance.profile_photo: 
-                    pass # Photo removed
-            except Coach.DoesNotExist:
-                if self.profile_photo: 
-                    process_image = True
-                    if hasattr(self.profile_photo, 'name') and self.profile_photo.name:
-                        original_filename = self.profile_photo.name
-        elif self.profile_photo: 
-            process_image = True
-            if hasattr(self.profile_photo, 'name') and self.profile_photo.name:
-                original_filename = self.profile_photo.name
-        
-        super().save(*args, **kwargs) # Save first
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored photo name, so save() can tell a changed photo without a query.
+        if 'profile_photo' in instance.__dict__:  # Not deferred.
+            instance._loaded_photo_name = instance.__dict__['profile_photo'] or ''
+        return instance
 
-        if process_image and self.profile_photo and hasattr(self.profile_photo, 'path') and self.profile_photo.path:
-            try:
-                filename_to_save = os.path.basename(original_filename if original_filename else self.profile_photo.name)
-                img = Image.open(self.profile_photo.path)
-                img = ImageOps.exif_transpose(img)
-
-                max_size = (300, 300) # Consistent with player photo size
-                img.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-                img_format = img.format if img.format else 'JPEG'
-                buffer = io.BytesIO()
-                save_kwargs = {'format': img_format, 'optimize': True}
-
-                if img.mode in ("RGBA", "P") and img_format.upper() != 'PNG':
-                    img = img.convert("RGB")
-                    img_format = 'JPEG'
-                    filename_to_save = os.path.splitext(filename_to_save)[0] + '.jpg'
-                    save_kwargs['format'] = 'JPEG'
-                
-                if img_format.upper() == 'JPEG':
-                    save_kwargs['quality'] = 85
-
-                img.save(buffer, **save_kwargs)
-                resized_image = ContentFile(buffer.getvalue())
-                
-                current_photo_name = self.profile_photo.name
-                self.profile_photo.save(filename_to_save, resized_image, save=False) 
-                
-                if current_photo_name != self.profile_photo.name or kwargs.get('force_insert', False):
-                    super().save(update_fields=['profile_photo'])
-            except FileNotFoundError:
-                print(f"File not found for coach photo {self.name}: {getattr(self.profile_photo, 'path', 'No path')}")
-            except Exception as e:
-                print(f"Error processing coach photo for {self.name}: {e}")
-        # --- End photo optimization ---
+    def save(self, *args, **kwargs):
+        # Renditions are made off the request; see photo_service.
+        from .photo_service import mark_photo_change, photo_saved
+        change = mark_photo_change(self, kwargs)
+        super().save(*args, **kwargs)
+        photo_saved(self, change)
 
     class Meta:
         ordering = ['name'] 
@@ -235,6 +200,11 @@ class Player(models.Model):
     notes = models.TextField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
     photo = models.ImageField(upload_to='player_photos/', null=True, blank=True)
+    photo_status = models.CharField(
+        max_length=10, choices=PhotoStatus.choices, default=PhotoStatus.NONE, blank=True, editable=False
+    )
+    photo_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    photo_status_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     @property
     def full_name(self):
@@ -261,79 +231,30 @@ class Player(models.Model):
     def __str__(self):
         return self.full_name
 
-    def save(self, *args, **kwargs):
-        original_filename = None
-        process_image = False
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored photo name, so save() can tell a changed photo without a query.
+        if 'photo' in instance.__dict__:  # Not deferred.
+            instance._loaded_photo_name = instance.__dict__['photo'] or ''
+        # Likewise the name, so the search index is only rewritten when it changes.
+        if 'first_name' in instance.__dict__ and 'last_name' in instance.__dict__:
+            instance._loaded_name = (instance.first_name, instance.last_name)
+        return instance
 
-        if self.pk: # Check if instance already exists
-            try:
-                old_instance = Player.objects.get(pk=self.pk)
-                if self.photo and old_instance.photo != self.photo: # Photo changed
-                    process_image = True
-                    if hasattr(self.photo, 'name') and self.photo.name:
-                        original_filename = self.photo.name
-                elif not self.photo and old_instance.photo: # Photo removed
-                    # Potentially delete old_instance.photo.delete(save=False) if desired
-                    pass
-            except Player.DoesNotExist: # Should not happen if self.pk exists but good for safety
-                if self.photo: # New instance being saved with a photo for the first time (e.g. after form error)
-                    process_image = True
-                    if hasattr(self.photo, 'name') and self.photo.name:
-                        original_filename = self.photo.name
-        elif self.photo: # New instance, photo provided
-            process_image = True
-            if hasattr(self.photo, 'name') and self.photo.name:
-                original_filename = self.photo.name
-        
-        super().save(*args, **kwargs) # Save first to ensure file path if it's a new upload
-
-        if process_image and self.photo and hasattr(self.photo, 'path') and self.photo.path:
-            try:
-                # Use original_filename if available (especially if self.photo.name gets modified by storage)
-                filename_to_save = os.path.basename(original_filename if original_filename else self.photo.name)
-
-                img = Image.open(self.photo.path)
-                img = ImageOps.exif_transpose(img) # Corrects orientation based on EXIF
-
-                max_size = (300, 300) # Define your max thumbnail size
-                img.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-                img_format = img.format if img.format else 'JPEG' # Default to JPEG if format is not detectable
-                buffer = io.BytesIO()
-                save_kwargs = {'format': img_format, 'optimize': True}
-
-                # Ensure RGB for JPEG, handle transparency for PNG
-                if img.mode in ("RGBA", "P") and img_format.upper() != 'PNG':
-                    img = img.convert("RGB")
-                    img_format = 'JPEG' # Output format becomes JPEG
-                    filename_to_save = os.path.splitext(filename_to_save)[0] + '.jpg'
-                    save_kwargs['format'] = 'JPEG'
-                
-                if img_format.upper() == 'JPEG':
-                    save_kwargs['quality'] = 85 # Adjust quality as needed
-
-                img.save(buffer, **save_kwargs)
-                resized_image = ContentFile(buffer.getvalue())
-
-                # Store the current name before saving the new file content
-                current_photo_name = self.photo.name
-                
-                # Save the resized image content to the same field path, with potentially new filename
-                self.photo.save(filename_to_save, resized_image, save=False) 
-                
-                # If the file name changed OR if this was a new instance (force_insert)
-                # we need to call super().save() again to update the photo field in DB.
-                if current_photo_name != self.photo.name or kwargs.get('force_insert', False):
-                    super().save(update_fields=['photo'])
-
-            except FileNotFoundError:
-                # This might happen if self.photo.path is incorrect or file removed externally
-                print(f"File not found for player photo {self.full_name}: {getattr(self.photo, 'path', 'No path')}")
-            except Exception as e:
-                print(f"Error processing player photo for {self.full_name}: {e}")
+    def save(self, *args, **kwargs):
+        # Renditions are made off the request; see photo_service.
+        from .photo_service import mark_photo_change, photo_saved
+        change = mark_photo_change(self, kwargs)
+        super().save(*args, **kwargs)
+        photo_saved(self, change)
 
     class Meta:
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['last_name', 'first_name'], name='player_last_first_idx'),
+            models.Index(fields=['first_name'], name='player_first_name_idx'),
+        ]
 
 # --- MODEL: Drill ---
 class Drill(models.Model):
@@ -390,7 +311,29 @@ class ScheduledClass(models.Model):
 
 
 # --- MODEL: Session ---
+class SessionQuerySet(models.QuerySet):
+    def ended(self, now=None):
+        """
+        Sessions whose planned end (start time + duration) is at or before now, decided in SQL.
+        Dates and start times are stored in local time, so now is converted to local time too.
+        """
+        from django.db.models import F, Q
+        from django.db.models.functions import ExtractHour, ExtractMinute
+
+        local_now = timezone.localtime(now or timezone.now())
+        minutes_now = local_now.hour * 60 + local_now.minute
+        return self.annotate(
+            planned_end_minute=ExtractHour('session_start_time') * 60
+            + ExtractMinute('session_start_time') + F('planned_duration_minutes')
+        ).filter(
+            Q(session_date__lt=local_now.date())
+            | Q(session_date=local_now.date(), planned_end_minute__lte=minutes_now)
+        )
+
+
 class Session(models.Model):
+    objects = SessionQuerySet.as_manager()
+
     session_date = models.DateField(default=timezone.now)
     session_start_time = models.TimeField(default=timezone.now)
     planned_duration_minutes = models.PositiveIntegerField(default=60, validators=[MinValueValidator(1)])
@@ -439,6 +382,10 @@ class Session(models.Model):
         return f"{group_name} Session on {date_str} at {start_time_str}{venue_str}"
     class Meta:
         ordering = ['-session_date', '-session_start_time']
+        indexes = [
+            # Keyset pagination of the session lists seeks on (date, start time, id).
+            models.Index(fields=['session_date', 'session_start_time', 'id'], name='session_date_time_id_idx'),
+        ]
 
 
 # --- MODEL: TimeBlock ---
@@ -730,6 +677,92 @@ class CoachSessionCompletion(models.Model):
         session_date_str = self.session.session_date.strftime('%Y-%m-%d') if self.session and self.session.session_date else "Unknown Date"
         return f"{coach_name} - {status} for session on {session_date_str}"
 
+# --- MODEL: CoachAssessmentLedger ---
+class CoachAssessmentLedger(models.Model):
+    """
+    Denormalized assessment status, one row per (assigned coach, session).
+    Kept up to date by planning/signals.py; rebuild with `manage.py rebuild_assessment_ledger`.
+    """
+    coach = models.ForeignKey('Coach', on_delete=models.CASCADE, related_name='assessment_ledger')
+    session = models.ForeignKey('Session', on_delete=models.CASCADE, related_name='assessment_ledger')
+    session_date = models.DateField(help_text="Copied from the session so ledger reads need no join.")
+    session_ends_at = models.DateTimeField(help_text="Planned end of the session (start time + duration).")
+    is_cancelled = models.BooleanField(default=False)
+    expected_player_count = models.PositiveIntegerField(default=0, help_text="Players who attended the session.")
+    assessed_player_count = models.PositiveIntegerField(default=0, help_text="Attendees this coach has assessed.")
+    group_assessment_done = models.BooleanField(default=False)
+    assessments_submitted = models.BooleanField(default=False, help_text="Coach marked player assessments complete.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('coach', 'session')
+        indexes = [
+            models.Index(fields=['coach', 'session_date'], name='ledger_coach_date_idx'),
+            models.Index(fields=['session_date'], name='ledger_date_idx'),
+        ]
+        ordering = ['-session_date', 'coach']
+        verbose_name = "Coach Assessment Ledger Entry"
+        verbose_name_plural = "Coach Assessment Ledger"
+
+    @property
+    def players_to_assess_count(self):
+        return max(self.expected_player_count - self.assessed_player_count, 0)
+
+    def __str__(self):
+        return f"{self.coach_id} / session {self.session_id}: {self.assessed_player_count}/{self.expected_player_count} assessed"
+
+
+# --- MODEL: PlayerAnalyticsSnapshot ---
+class PlayerAnalyticsSnapshot(models.Model):
+    """
+    Precomputed figures for the player profile page: attendance, match totals and
+    latest/best values per metric. Maintained by planning/player_analytics.py.
+    """
+    player = models.OneToOneField('Player', on_delete=models.CASCADE, related_name='analytics_snapshot')
+    attended_sessions_count = models.PositiveIntegerField(default=0)
+    relevant_sessions_count = models.PositiveIntegerField(default=0)
+    attendance_percentage = models.PositiveIntegerField(null=True, blank=True)
+    attendance_computed_on = models.DateField(null=True, blank=True, help_text="Day the attendance figures were computed for; empty when they need recomputing.")
+    metric_summary = models.JSONField(default=dict, blank=True, help_text="Latest and best value per metric and type.")
+    match_count = models.PositiveIntegerField(default=0)
+    competitive_match_count = models.PositiveIntegerField(default=0)
+    latest_match_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Player Analytics Snapshot"
+        verbose_name_plural = "Player Analytics Snapshots"
+
+    def __str__(self):
+        return f"Analytics for {self.player}"
+
+
+# --- MODEL: PlayerGroupMembership ---
+class PlayerGroupMembership(models.Model):
+    """
+    History of Player.school_groups: one row per stretch of time a player was in a group.
+    Rows are opened and closed by the school_groups signals in planning/signals.py; a
+    session is "expected" of the players whose membership covers its date.
+    """
+    player = models.ForeignKey('Player', on_delete=models.CASCADE, related_name='group_memberships')
+    school_group = models.ForeignKey('SchoolGroup', on_delete=models.CASCADE, related_name='memberships')
+    start_date = models.DateField(help_text="First day in the group.")
+    end_date = models.DateField(null=True, blank=True, help_text="Last day in the group; empty while the player is still a member.")
+
+    class Meta:
+        ordering = ['player', 'start_date']
+        verbose_name = "Player Group Membership"
+        verbose_name_plural = "Player Group Memberships"
+        indexes = [
+            models.Index(fields=['school_group', 'start_date', 'end_date'], name='membership_group_dates_idx'),
+            models.Index(fields=['player', 'start_date', 'end_date'], name='membership_player_dates_idx'),
+        ]
+
+    def __str__(self):
+        until = self.end_date or 'now'
+        return f"{self.player} in {self.school_group} ({self.start_date} - {until})"
+
+
 # --- MODEL: Payslip ---
 class Payslip(models.Model):
     coach = models.ForeignKey('Coach', on_delete=models.PROTECT, related_name='payslips_generated_for')
@@ -0,0 +1,142 @@
+# planning/pagination.py
+
+"""
+Keyset (seek) pagination for the long history lists.
+
+Instead of OFFSET, a page starts where the previous one ended: the cursor holds the
+ordering values of the boundary row and the next page is the first `per_page` rows
+after it in that ordering. With an index on the ordering fields every page costs the
+same, however far back the list goes. The ordering must end in a unique field (the
+primary key) so no two rows share a position.
+
+Cursors are opaque url-safe strings. An invalid or stale cursor gives the first page.
+"""
+
+import base64
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+DEFAULT_PER_PAGE = 25
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder, except that datetimes and times keep their microseconds: rows a
+    fraction of a millisecond apart would otherwise be skipped or repeated at a page edge.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Pages through `queryset` in `ordering`, e.g. ('-session_date', '-session_start_time', '-id').
+    The ordering replaces any ordering the queryset already has.
+    """
+
+    def __init__(self, queryset, ordering, per_page=DEFAULT_PER_PAGE):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = [name.startswith('-') for name in self.ordering]
+
+    # --- Cursors ---
+
+    def _row_values(self, obj):
+        return [getattr(obj, 'pk' if name == 'id' else name) for name in self.fields]
+
+    def encode_cursor(self, obj, direction='next'):
+        payload = json.dumps({'d': direction, 'v': self._row_values(obj)}, cls=_CursorEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """(direction, values) for a cursor, or None if it cannot be used with this ordering."""
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            direction, raw_values = payload['d'], payload['v']
+            if direction not in ('next', 'previous') or len(raw_values) != len(self.fields):
+                return None
+            model = self.queryset.model
+            values = [
+                model._meta.get_field(name).to_python(raw) if name != 'id' else model._meta.pk.to_python(raw)
+                for name, raw in zip(self.fields, raw_values)
+            ]
+        except (ValueError, TypeError, KeyError, AttributeError, ValidationError):
+            return None
+        return direction, values
+
+    # --- Paging ---
+
+    def _seek_condition(self, values, backwards):
+        """Rows strictly after `values` in the ordering (before them when `backwards`)."""
+        condition = Q()
+        for position, (name, descending) in enumerate(zip(self.fields, self.descending)):
+            lookup = 'lt' if descending != backwards else 'gt'
+            step = Q(**{f"{name}__{lookup}": values[position]})
+            for earlier_name, earlier_value in zip(self.fields[:position], values[:position]):
+                step &= Q(**{earlier_name: earlier_value})
+            condition |= step
+        return condition
+
+    def page(self, cursor=None):
+        decoded = self.decode_cursor(cursor)
+        direction, values = decoded if decoded else ('next', None)
+        backwards = direction == 'previous'
+
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(name[1:] if name.startswith('-') else f"-{name}" for name in ordering)
+        rows = self.queryset.order_by(*ordering)
+        if values is not None:
+            rows = rows.filter(self._seek_condition(values, backwards))
+        rows = list(rows[:self.per_page + 1])  # One extra row tells whether there is more.
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        if not rows:
+            return KeysetPage([])
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], 'next') if has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], 'previous') if has_previous else None,
+        )
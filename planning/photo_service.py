@@ -0,0 +1,257 @@
+# planning/photo_service.py
+
+"""
+Player and coach photo renditions, made off the request.
+
+Saving a new photo (an upload, or another stored file) only stores it and marks the
+row PENDING; the name it was loaded with tells a changed photo apart. Once the
+transaction commits, the photo is handed to a single background worker thread.
+The worker writes a WebP and a JPEG of each rendition (thumb, card, full) next to the
+original, which is kept as uploaded, and marks the row READY, or FAILED if the image
+cannot be read. Each step is a conditional update on the photo's name, so a photo
+replaced mid-way is never marked with renditions of the old one, and two workers
+never process the same row: a PROCESSING row is only taken over once it has been
+PROCESSING for longer than PROCESSING_STALE_AFTER, when its worker is presumed gone.
+
+The process_photos command picks up whatever the worker did not finish: rows left
+PENDING by a restart, abandoned PROCESSING rows and failures. Set
+PHOTO_PROCESSING_IN_BACKGROUND = False to leave all processing to that command, for
+example run from cron.
+
+Templates ask for a size ({% photo_picture player 'card' %}). Until the renditions
+are ready they get the original.
+"""
+
+import io
+import posixpath
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Coach, PhotoStatus, Player
+
+# Rendition -> longest side in pixels. Thumbs cover the 50-80px avatars and cards the
+# 150px profile photos, both at 2x.
+RENDITIONS = {'thumb': 160, 'card': 320, 'full': 1200}
+# Format -> (file extension, PIL format, save options).
+RENDITION_FORMATS = {
+    'webp': ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', 'JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+RENDITION_DIR = 'renditions'
+# A row PROCESSING for longer than this was abandoned by its worker (e.g. a restart).
+PROCESSING_STALE_AFTER = timedelta(minutes=10)
+PHOTO_FIELDS = {Player: 'photo', Coach: 'profile_photo'}
+
+PhotoChange = namedtuple('PhotoChange', 'new_photo stale_renditions')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def photo_field_name(model):
+    return PHOTO_FIELDS[model]
+
+
+def _state_fields(field):
+    return f'{field}_status', f'{field}_renditions'
+
+
+def _status_update(field, status, now=None, **extra):
+    """Field values for an update setting the status, with the time it changed."""
+    return {f'{field}_status': status, f'{field}_status_updated_at': now or timezone.now(), **extra}
+
+
+# --- Saving ---
+
+def mark_photo_change(instance, save_kwargs):
+    """
+    Called by save() before writing. A new photo marks the row PENDING, and a cleared
+    photo resets the state; either way the previous renditions are returned for
+    deletion. Extends update_fields when given. No queries: a photo is new when it is
+    an upload not yet in storage, or a name other than the one the row was loaded with.
+    """
+    field = photo_field_name(type(instance))
+    status_field, renditions_field = _state_fields(field)
+    photo = getattr(instance, field)
+    loaded_name = '' if instance._state.adding else getattr(instance, '_loaded_photo_name', None)
+    changed = bool(photo) and (not photo._committed or (loaded_name is not None and photo.name != loaded_name))
+    if not changed and (photo or not getattr(instance, status_field)):
+        return None
+    change = PhotoChange(changed, getattr(instance, renditions_field))
+    for name, value in _status_update(
+        field, PhotoStatus.PENDING if changed else PhotoStatus.NONE, **{renditions_field: {}}
+    ).items():
+        setattr(instance, name, value)
+    if save_kwargs.get('update_fields') is not None:
+        save_kwargs['update_fields'] = {
+            *save_kwargs['update_fields'], status_field, renditions_field, f'{field}_status_updated_at',
+        }
+    return change
+
+
+def photo_saved(instance, change):
+    """Called by save() after writing: deletes replaced renditions and queues the new photo."""
+    model = type(instance)
+    photo = getattr(instance, photo_field_name(model))
+    instance._loaded_photo_name = photo.name if photo else ''
+    if change is None:
+        return
+    if change.stale_renditions:
+        storage = model._meta.get_field(photo_field_name(model)).storage
+        transaction.on_commit(lambda: delete_renditions(storage, change.stale_renditions))
+    if change.new_photo:
+        queue_photo(model, instance.pk)
+
+
+def queue_photo(model, pk):
+    """Hands the photo to the background worker once the transaction commits."""
+    if not getattr(settings, 'PHOTO_PROCESSING_IN_BACKGROUND', True):
+        return
+    transaction.on_commit(lambda: _get_executor().submit(_process_in_background, model, pk))
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='photo-renditions')
+        return _executor
+
+
+def _process_in_background(model, pk):
+    try:
+        process_photo(model, pk)
+    finally:
+        # The worker thread has its own connections; don't leave them open between jobs.
+        connections.close_all()
+
+
+# --- Processing ---
+
+def _claimable(field, statuses, now):
+    """Rows in one of statuses, or abandoned in PROCESSING."""
+    status_field = f'{field}_status'
+    abandoned = Q(**{f'{field}_status_updated_at__lt': now - PROCESSING_STALE_AFTER}) | Q(
+        **{f'{field}_status_updated_at__isnull': True}
+    )
+    return Q(**{f'{status_field}__in': list(statuses)}) | (Q(**{status_field: PhotoStatus.PROCESSING}) & abandoned)
+
+
+def process_photo(model, pk, statuses=(PhotoStatus.PENDING,), now=None):
+    """
+    Makes the renditions of one row's photo if its status is one of statuses (or it
+    was abandoned in PROCESSING). Returns the new status, or None when the row was not
+    claimed or its photo changed meanwhile.
+    """
+    now = now or timezone.now()
+    field = photo_field_name(model)
+    status_field, renditions_field = _state_fields(field)
+    row = model.objects.filter(pk=pk).values_list(field, renditions_field).first()
+    if row is None or not row[0]:
+        return None
+    name, old_renditions = row
+    claimed = model.objects.filter(_claimable(field, statuses, now), pk=pk, **{field: name}).update(
+        **_status_update(field, PhotoStatus.PROCESSING, now)
+    )
+    if not claimed:
+        return None
+
+    storage = model._meta.get_field(field).storage
+    try:
+        renditions = make_renditions(storage, name)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        model.objects.filter(pk=pk, **{field: name}).update(**_status_update(field, PhotoStatus.FAILED))
+        return PhotoStatus.FAILED
+
+    updated = model.objects.filter(pk=pk, **{field: name, status_field: PhotoStatus.PROCESSING}).update(
+        **_status_update(field, PhotoStatus.READY, **{renditions_field: renditions})
+    )
+    if not updated:
+        delete_renditions(storage, renditions)
+        return None
+    delete_renditions(storage, old_renditions)
+    return PhotoStatus.READY
+
+
+def make_renditions(storage, name):
+    """
+    Writes every rendition of the image stored as name, in every format, and returns
+    {rendition: {'width', 'height', format: stored name}}. Nothing is left behind on error.
+    """
+    with storage.open(name, 'rb') as original:
+        image = Image.open(original)
+        image.load()
+    image = _flatten(ImageOps.exif_transpose(image))
+
+    directory = posixpath.join(posixpath.dirname(name), RENDITION_DIR)
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    renditions = {}
+    try:
+        for rendition, longest_side in RENDITIONS.items():
+            resized = image.copy()
+            resized.thumbnail((longest_side, longest_side), Image.Resampling.LANCZOS)
+            renditions[rendition] = entry = {'width': resized.width, 'height': resized.height}
+            for fmt, (extension, pil_format, options) in RENDITION_FORMATS.items():
+                buffer = io.BytesIO()
+                resized.save(buffer, pil_format, **options)
+                entry[fmt] = storage.save(
+                    posixpath.join(directory, f'{stem}-{rendition}.{extension}'), ContentFile(buffer.getvalue())
+                )
+    except Exception:
+        delete_renditions(storage, renditions)
+        raise
+    return renditions
+
+
+def _flatten(image):
+    """RGB, with any transparency laid over white, as JPEG has no alpha channel."""
+    if image.mode in ('RGBA', 'LA', 'P', 'PA'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def delete_renditions(storage, renditions):
+    for entry in renditions.values():
+        for fmt in RENDITION_FORMATS:
+            if entry.get(fmt):
+                storage.delete(entry[fmt])
+
+
+def pending_photos(model, statuses, now=None):
+    """Ids of the rows of model with a photo and one of statuses, or abandoned in PROCESSING."""
+    field = photo_field_name(model)
+    return list(
+        model.objects.filter(_claimable(field, statuses, now or timezone.now()))
+        .exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        .order_by('pk').values_list('pk', flat=True)
+    )
+
+
+# --- Serving ---
+
+def photo_urls(instance, rendition):
+    """
+    (webp_url, jpeg_url) of the rendition once it is ready, otherwise (None, original
+    url); (None, None) without a photo.
+    """
+    field = photo_field_name(type(instance))
+    photo = getattr(instance, field)
+    if not photo:
+        return None, None
+    status_field, renditions_field = _state_fields(field)
+    entry = getattr(instance, renditions_field).get(rendition)
+    if getattr(instance, status_field) == PhotoStatus.READY and entry:
+        return photo.storage.url(entry['webp']), photo.storage.url(entry['jpeg'])
+    return None, photo.url
@@ -0,0 +1,145 @@
+# planning/player_analytics.py
+
+"""
+Maintains PlayerAnalyticsSnapshot, the precomputed figures behind the player profile.
+
+Metric sections (sprints, volleys, drives, matches) are recomputed for one player
+when one of their records changes. Attendance depends on the calendar as well as on
+attendance records, so it is only marked stale (one UPDATE, however many players
+are affected) and recomputed the next time the profile is read, at most once a day.
+"""
+
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .attendance_service import attendance_by_player
+from .models import (
+    Session, CourtSprintRecord, VolleyRecord, BackwallDriveRecord, MatchResult, PlayerAnalyticsSnapshot
+)
+
+# metric -> (model, type field, value field)
+METRICS = {
+    'sprint': (CourtSprintRecord, 'duration_choice', 'score'),
+    'volley': (VolleyRecord, 'shot_type', 'consecutive_count'),
+    'drive': (BackwallDriveRecord, 'shot_type', 'consecutive_count'),
+}
+METRIC_FOR_MODEL = {model: metric for metric, (model, _, _) in METRICS.items()}
+
+
+def _metric_summary(player_id, metric):
+    """{type: {'latest', 'best'}} for one metric of one player. One query."""
+    model, type_field, value_field = METRICS[metric]
+    summary = {}
+    for kind, recorded_on, value in model.objects.filter(player_id=player_id).order_by(
+        'date_recorded', 'pk'
+    ).values_list(type_field, 'date_recorded', value_field):
+        point = {'date': recorded_on.isoformat(), 'value': value}
+        entry = summary.setdefault(kind, {'latest': point, 'best': point})
+        entry['latest'] = point
+        if value > entry['best']['value']:
+            entry['best'] = point
+    return summary
+
+
+def _match_values(player_id):
+    totals = MatchResult.objects.filter(player_id=player_id).aggregate(
+        match_count=Count('pk'),
+        competitive_match_count=Count('pk', filter=Q(is_competitive=True)),
+        latest_match_date=Max('date'),
+    )
+    return totals
+
+
+def _attendance_values(player, today):
+    """
+    Sessions attended to date out of the sessions held by the player's groups while they
+    were a member. Sessions outside their memberships count towards neither.
+    """
+    relevant, attended = attendance_by_player(
+        Session.objects.filter(session_date__lte=today), [player.pk]
+    ).get(player.pk, (0, 0))
+    percentage = round(attended / relevant * 100) if relevant else None
+    return {
+        'attended_sessions_count': attended,
+        'relevant_sessions_count': relevant,
+        'attendance_percentage': percentage,
+        'attendance_computed_on': today,
+    }
+
+
+def build_player_snapshot(player, today=None):
+    """Computes and saves the player's whole snapshot."""
+    today = today or timezone.localdate()
+    values = _attendance_values(player, today)
+    values.update(_match_values(player.pk))
+    values['metric_summary'] = {metric: _metric_summary(player.pk, metric) for metric in METRICS}
+    snapshot, _ = PlayerAnalyticsSnapshot.objects.update_or_create(player=player, defaults=values)
+    return snapshot
+
+
+def get_player_snapshot(player, today=None):
+    """
+    The player's snapshot, built on first use. Stale attendance figures are refreshed
+    here; everything else is kept current by refresh_player_metric.
+    """
+    today = today or timezone.localdate()
+    snapshot = PlayerAnalyticsSnapshot.objects.filter(player=player).first()
+    if snapshot is None:
+        return build_player_snapshot(player, today)
+    if snapshot.attendance_computed_on != today:
+        for name, value in _attendance_values(player, today).items():
+            setattr(snapshot, name, value)
+        snapshot.save(update_fields=[
+            'attended_sessions_count', 'relevant_sessions_count', 'attendance_percentage',
+            'attendance_computed_on', 'updated_at',
+        ])
+    return snapshot
+
+
+def refresh_player_metric(player_id, metric):
+    """Recomputes one metric ('sprint', 'volley', 'drive' or 'matches') of an existing snapshot."""
+    snapshot = PlayerAnalyticsSnapshot.objects.filter(player_id=player_id).first()
+    if snapshot is None:
+        return  # Built in full the first time the profile is viewed.
+    if metric == 'matches':
+        for name, value in _match_values(player_id).items():
+            setattr(snapshot, name, value)
+        fields = ['match_count', 'competitive_match_count', 'latest_match_date']
+    else:
+        snapshot.metric_summary = {**snapshot.metric_summary, metric: _metric_summary(player_id, metric)}
+        fields = ['metric_summary']
+    snapshot.save(update_fields=fields + ['updated_at'])
+
+
+def mark_attendance_stale(player_ids=None, school_group_ids=None):
+    """Flags the attendance figures of the given players and/or group members for recomputation."""
+    condition = Q()
+    if player_ids:
+        condition |= Q(player_id__in=list(player_ids))
+    if school_group_ids:
+        condition |= Q(player__group_memberships__school_group__in=list(school_group_ids))
+    if condition:
+        PlayerAnalyticsSnapshot.objects.filter(condition).update(attendance_computed_on=None)
+
+
+def metric_rows(player_id, metric, labels, limit):
+    """
+    The player's latest `limit` records of one metric, newest first, as dicts of date,
+    label, value, session_id; with whether older records exist. One query.
+    """
+    model, type_field, value_field = METRICS[metric]
+    rows = [
+        {'date': recorded_on, 'kind': kind, 'label': labels.get(kind, kind), 'value': value, 'session_id': session_id}
+        for recorded_on, kind, value, session_id in model.objects.filter(player_id=player_id).order_by(
+            '-date_recorded', type_field, '-pk'
+        ).values_list('date_recorded', type_field, value_field, 'session_id')[:limit + 1]
+    ]
+    return rows[:limit], len(rows) > limit
+
+
+def metric_summary_rows(snapshot, metric, labels):
+    """[{'label', 'latest', 'best'}] per type of a metric, for the profile's summary line."""
+    return [
+        {'label': labels.get(kind, kind), 'latest': values['latest'], 'best': values['best']}
+        for kind, values in sorted(snapshot.metric_summary.get(metric, {}).items())
+    ]
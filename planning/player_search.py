@@ -0,0 +1,219 @@
+# planning/player_search.py
+
+"""
+Player name search backed by a database index.
+
+  SQLite      An FTS5 table with the trigram tokenizer (planning_player_search, rowid =
+              player id), kept in sync by the Player signals in planning/signals.py.
+  PostgreSQL  A pg_trgm GIN index on the lower-cased full name; the database keeps it
+              current itself.
+  Others      Prefix matching on the indexed first_name / last_name columns.
+
+Substring matches rank first; when a query has typos, names sharing enough trigrams
+with it (trigram similarity, as pg_trgm defines it) are returned as fuzzy matches.
+Queries shorter than three characters use prefix matching everywhere.
+"""
+
+import re
+import sqlite3
+
+from django.db import connection
+from django.db.models import BooleanField, CharField, FloatField, Func, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Player
+
+SEARCH_TABLE = 'planning_player_search'
+PG_TRIGRAM_INDEX = 'planning_player_name_trgm'
+MIN_TRIGRAM_QUERY_LENGTH = 3
+FUZZY_SIMILARITY_THRESHOLD = 0.3
+FUZZY_CANDIDATES_FACTOR = 5
+MAX_QUERY_LENGTH = 100
+
+
+def search_backend(conn=None):
+    """'fts5', 'trigram' or 'prefix', depending on the database in use."""
+    conn = conn or connection
+    if conn.vendor == 'sqlite' and sqlite3.sqlite_version_info >= (3, 34, 0):
+        return 'fts5'  # The trigram tokenizer needs SQLite 3.34.
+    if conn.vendor == 'postgresql':
+        return 'trigram'
+    return 'prefix'
+
+
+def normalize_query(query):
+    return re.sub(r'\s+', ' ', (query or '')).strip().lower()[:MAX_QUERY_LENGTH]
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: each word padded with two leading spaces and one trailing."""
+    grams = set()
+    for word in re.findall(r'\w+', text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigram_similarity(a, b):
+    first, second = trigrams(a), trigrams(b)
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def name_similarity(query, name):
+    """Similarity of the query to the whole name or to its closest single name, whichever is higher."""
+    return max(
+        [trigram_similarity(query, name)]
+        + [trigram_similarity(query, word) for word in name.split()]
+    )
+
+
+# --- Index maintenance ---
+
+def create_search_index(schema_editor):
+    """Creates the search index for the database in use. Called from migration 0041."""
+    backend = search_backend(schema_editor.connection)
+    if backend == 'fts5':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(name, tokenize='trigram')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, name) "
+            f"SELECT id, lower(first_name || ' ' || last_name) FROM planning_player"
+        )
+    elif backend == 'trigram':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_TRIGRAM_INDEX} ON planning_player "
+            f"USING gin ((lower(first_name || ' ' || last_name)) gin_trgm_ops)"
+        )
+
+
+def drop_search_index(schema_editor):
+    backend = search_backend(schema_editor.connection)
+    if backend == 'fts5':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+    elif backend == 'trigram':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {PG_TRIGRAM_INDEX}")
+
+
+def index_player(player):
+    if search_backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [player.pk])
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, name) VALUES (%s, %s)",
+            [player.pk, f"{player.first_name} {player.last_name}".lower()]
+        )
+
+
+def index_players(players):
+    """index_player for many new players at once, e.g. after a bulk_create."""
+    if search_backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, name) VALUES (%s, %s)",
+            [(player.pk, f"{player.first_name} {player.last_name}".lower()) for player in players]
+        )
+
+
+def unindex_player(player_id):
+    if search_backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [player_id])
+
+
+def rebuild_search_index():
+    """Re-creates every index row, e.g. after players were bulk-created. Returns the row count."""
+    if search_backend() != 'fts5':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, name) "
+            f"SELECT id, lower(first_name || ' ' || last_name) FROM planning_player"
+        )
+        return cursor.rowcount
+
+
+# --- Searching ---
+
+def _prefix_ids(query, players, limit):
+    condition = Q()
+    for word in query.split(' '):
+        condition &= Q(first_name__istartswith=word) | Q(last_name__istartswith=word)
+    return list(players.filter(condition).order_by('last_name', 'first_name').values_list('pk', flat=True)[:limit])
+
+
+def _fts5_candidate_ids(query, players, limit):
+    """
+    Substring matches first, then names sharing trigrams with the query, by FTS5 rank.
+    A filtered `players` is applied inside the MATCH queries, so the limit counts only
+    players it allows.
+    """
+    phrase = '"' + query.replace('"', '""') + '"'
+    grams = sorted(gram for gram in trigrams(query) if gram.strip() and len(gram.strip()) == 3)
+    restriction, restriction_params = '', []
+    if players.query.has_filters():
+        subquery, restriction_params = players.order_by().values('pk').query.sql_with_params()
+        restriction = f" AND rowid IN ({subquery})"
+    sql = f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s{restriction} ORDER BY rank LIMIT %s"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [phrase, *restriction_params, limit])
+        ids = [row[0] for row in cursor.fetchall()]
+        if len(ids) < limit and grams:
+            fuzzy_query = ' OR '.join('"' + gram.replace('"', '""') + '"' for gram in grams)
+            cursor.execute(sql, [fuzzy_query, *restriction_params, limit * FUZZY_CANDIDATES_FACTOR])
+            seen = set(ids)
+            ids.extend(row[0] for row in cursor.fetchall() if row[0] not in seen)
+    return ids
+
+
+def _trigram_candidate_ids(query, players, limit):
+    # Spelled exactly as the pg_trgm index expression so PostgreSQL can use the index.
+    name = RawSQL("lower(planning_player.first_name || ' ' || planning_player.last_name)", [], output_field=CharField())
+    similar = Func(name, Value(query), template='%(expressions)s', arg_joiner=' %% ', output_field=BooleanField())
+    return list(
+        players.annotate(
+            search_name=name,
+            similarity=Func(name, Value(query), function='similarity', output_field=FloatField()),
+        ).filter(Q(search_name__contains=query) | Q(similar)).order_by(
+            '-similarity', 'last_name', 'first_name'
+        ).values_list('pk', flat=True)[:limit]
+    )
+
+
+def search_players(query, limit=20, players=None):
+    """
+    Players whose name matches `query`, best first: substring matches, then (for queries
+    of three or more characters) fuzzy matches. `players` narrows the search (e.g. active
+    players of one group) and defaults to all players.
+    """
+    query = normalize_query(query)
+    players = players if players is not None else Player.objects.all()
+    if not query:
+        return []
+
+    backend = search_backend()
+    if len(query) < MIN_TRIGRAM_QUERY_LENGTH or backend == 'prefix':
+        ids = _prefix_ids(query, players, limit)
+    elif backend == 'trigram':
+        ids = _trigram_candidate_ids(query, players, limit)
+    else:
+        ids = _fts5_candidate_ids(query, players, limit)
+
+    found = {player.pk: player for player in players.filter(pk__in=ids)}
+    ranked = [found[pk] for pk in ids if pk in found]
+    if backend == 'fts5' and len(query) >= MIN_TRIGRAM_QUERY_LENGTH:
+        # FTS5 ranks by shared trigrams but returns any overlap; keep substring matches
+        # and fuzzy matches that are similar enough.
+        ranked = [
+            player for player in ranked
+            if query in player.full_name.lower()
+            or name_similarity(query, player.full_name) >= FUZZY_SIMILARITY_THRESHOLD
+        ]
+    return ranked[:limit]
@@ -0,0 +1,255 @@
+# planning/schedule_import.py
+
+"""
+Importer for the weekly schedule spreadsheets (data_imports/Mondays.csv ... Fridays.csv).
+
+The import runs in three steps:
+
+  read_day_files     parses all five files into ImportRow tuples, without queries.
+  build_import_plan  loads indexes of the existing groups, rules, players (by
+                     case-folded name) and memberships in four queries, and works out
+                     what would change. A dry run stops here and prints the plan.
+  apply_import_plan  writes the plan with bulk creates and updates in one transaction.
+
+The bulk writes bypass the Player and Player.school_groups signals, so the search
+index, the membership history and the attendance figures are updated here.
+"""
+
+import csv
+import os
+import re
+from collections import defaultdict, namedtuple
+from datetime import time
+
+from django.db import connection, transaction
+
+from .attendance_service import start_memberships
+from .models import Player, SchoolGroup, ScheduledClass
+from .player_analytics import mark_attendance_stale
+from .player_search import index_players
+from .utils import parse_grade_from_string
+
+DAY_FILES = {
+    'Mondays.csv': 0,
+    'Tuesdays.csv': 1,
+    'Wednesdays.csv': 2,
+    'Thursdays.csv': 3,
+    'Fridays.csv': 4,
+}
+DAY_NAMES = dict(ScheduledClass.DAY_OF_WEEK_CHOICES)
+DEFAULT_DURATION_MINUTES = 60
+TIME_PATTERN = re.compile(r'(\d{1,2}):(\d{2})')
+
+PlayerGroups = Player.school_groups.through
+
+ImportRow = namedtuple(
+    'ImportRow', 'file_name row_num day_of_week group_name start_time first_name last_name grade'
+)
+
+
+def name_key(first_name, last_name):
+    return (first_name.casefold(), last_name.casefold())
+
+
+def parse_schedule_row(row, file_name, row_num, day_of_week):
+    """
+    An ImportRow from one CSV row, or (level, message) when the row cannot be used.
+    All text after the first space of the player name column is the last name.
+    """
+    group_name = (row.get('school_group_name') or '').strip()
+    time_str = (row.get('session_start_time') or '').strip()
+    full_name = (row.get('player_first_name') or '').strip()
+    if not (group_name and time_str and full_name):
+        return 'warning', f"{file_name} row {row_num}: missing Group, Time or Player Name; skipped."
+    match = TIME_PATTERN.match(time_str)
+    start_time = time(*map(int, match.groups())) if match else None
+    first_name, _, last_name = full_name.partition(' ')
+    return ImportRow(
+        file_name, row_num, day_of_week, group_name, start_time, first_name, last_name.strip(),
+        parse_grade_from_string((row.get('player_grade') or '').strip()),
+    )
+
+
+def read_day_files(import_dir):
+    """
+    (rows, messages, rows_skipped) from the day files in import_dir; messages are
+    (level, text) pairs.
+    """
+    rows, messages, rows_skipped = [], [], 0
+    for file_name, day_of_week in DAY_FILES.items():
+        file_path = os.path.join(import_dir, file_name)
+        if not os.path.exists(file_path):
+            messages.append(('warning', f"File not found: {file_name}. Skipping."))
+            continue
+        with open(file_path, mode='r', encoding='utf-8-sig') as csvfile:
+            for row_num, row in enumerate(csv.DictReader(csvfile, delimiter=';'), start=2):
+                parsed = parse_schedule_row(row, file_name, row_num, day_of_week)
+                if isinstance(parsed, ImportRow):
+                    rows.append(parsed)
+                else:
+                    messages.append(parsed)
+                    rows_skipped += 1
+    return rows, messages, rows_skipped
+
+
+class ImportPlan:
+    """What an import would change. Players are referred to by id, or by name key when new."""
+
+    def __init__(self):
+        self.groups_to_create = []
+        self.rules_to_create = []          # (group_name, day_of_week, start_time)
+        self.rules_to_update = []          # ScheduledClass with the default duration restored
+        self.players_to_create = {}        # name key -> Player (unsaved)
+        self.grade_updates = {}            # player id -> (player, old grade, new grade)
+        self.memberships_to_add = []       # (player id or name key, group_name, player name)
+        self.rows_skipped = 0
+        self.messages = []
+
+    def stats(self):
+        return {
+            'groups_created': len(self.groups_to_create),
+            'players_created': len(self.players_to_create),
+            'players_updated': len(self.grade_updates),
+            'schedules_created': len(self.rules_to_create),
+            'schedules_updated': len(self.rules_to_update),
+            'players_added_to_groups': len(self.memberships_to_add),
+            'rows_skipped': self.rows_skipped,
+        }
+
+    def diff_lines(self):
+        """The changes, one line each: '+' to create, '~' to update."""
+        lines = [f"+ group {name}" for name in self.groups_to_create]
+        lines += [
+            f"+ rule {group_name}, {DAY_NAMES[day]}s {start_time:%H:%M}"
+            for group_name, day, start_time in self.rules_to_create
+        ]
+        lines += [
+            f"~ rule {rule.school_group.name}, {DAY_NAMES[rule.day_of_week]}s {rule.start_time:%H:%M}: "
+            f"duration -> {DEFAULT_DURATION_MINUTES} min"
+            for rule in self.rules_to_update
+        ]
+        lines += [
+            f"+ player {player.first_name} {player.last_name} (grade {player.grade if player.grade is not None else '-'})"
+            for player in self.players_to_create.values()
+        ]
+        lines += [
+            f"~ player {player.first_name} {player.last_name}: grade {old if old is not None else '-'} -> {new}"
+            for player, old, new in self.grade_updates.values()
+        ]
+        lines += [f"+ {player_name} -> {group_name}" for _, group_name, player_name in self.memberships_to_add]
+        return lines
+
+
+def build_import_plan(rows):
+    """Compares the rows against the database (four queries) and returns the ImportPlan."""
+    plan = ImportPlan()
+    groups = dict(SchoolGroup.objects.values_list('name', 'pk'))
+    rules = {
+        (rule.school_group_id, rule.day_of_week, rule.start_time): rule
+        for rule in ScheduledClass.objects.filter(day_of_week__in=DAY_FILES.values()).select_related('school_group')
+    }
+    players = defaultdict(list)
+    for player in Player.objects.only('pk', 'first_name', 'last_name', 'grade'):
+        players[name_key(player.first_name, player.last_name)].append(player)
+    memberships = set(PlayerGroups.objects.values_list('player_id', 'schoolgroup_id'))
+
+    planned_rules, updated_rules, planned_memberships = set(), set(), set()
+    for row in rows:
+        group_id = groups.get(row.group_name)
+        if row.group_name not in groups:
+            plan.groups_to_create.append(row.group_name)
+            groups[row.group_name] = None
+
+        if row.start_time is None:
+            plan.messages.append((
+                'warning', f"{row.file_name} row {row.row_num}: invalid time format; no schedule created."
+            ))
+        else:
+            rule = rules.get((group_id, row.day_of_week, row.start_time)) if group_id else None
+            if rule is None:
+                rule_key = (row.group_name, row.day_of_week, row.start_time)
+                if rule_key not in planned_rules:
+                    planned_rules.add(rule_key)
+                    plan.rules_to_create.append(rule_key)
+            elif rule.default_duration_minutes != DEFAULT_DURATION_MINUTES and rule.pk not in updated_rules:
+                updated_rules.add(rule.pk)
+                rule.default_duration_minutes = DEFAULT_DURATION_MINUTES
+                plan.rules_to_update.append(rule)
+
+        key = name_key(row.first_name, row.last_name)
+        matches = players.get(key, [])
+        if len(matches) > 1:
+            plan.messages.append((
+                'error', f"{row.file_name} row {row.row_num}: {len(matches)} players named "
+                f"'{row.first_name} {row.last_name}' already exist; resolve them manually. Skipped."
+            ))
+            plan.rows_skipped += 1
+            continue
+        if matches:
+            player = matches[0]
+            player_ref = player.pk
+            if row.grade is not None:
+                # The last grade given wins, as when the rows were saved one by one.
+                original = plan.grade_updates[player.pk][1] if player.pk in plan.grade_updates else player.grade
+                if row.grade != original:
+                    plan.grade_updates[player.pk] = (player, original, row.grade)
+                else:
+                    plan.grade_updates.pop(player.pk, None)
+        else:
+            player_ref = key
+            player = plan.players_to_create.get(key)
+            if player is None:
+                player = plan.players_to_create[key] = Player(
+                    first_name=row.first_name, last_name=row.last_name, grade=row.grade
+                )
+            elif row.grade is not None:
+                player.grade = row.grade
+
+        if (player_ref, row.group_name) not in planned_memberships and (player_ref, group_id) not in memberships:
+            planned_memberships.add((player_ref, row.group_name))
+            plan.memberships_to_add.append((player_ref, row.group_name, f"{player.first_name} {player.last_name}"))
+    return plan
+
+
+def apply_import_plan(plan):
+    """Writes the plan in one transaction with bulk queries."""
+    with transaction.atomic():
+        SchoolGroup.objects.bulk_create(SchoolGroup(name=name) for name in plan.groups_to_create)
+        groups = dict(SchoolGroup.objects.filter(
+            name__in={group_name for _, group_name, _ in plan.memberships_to_add}
+            | {group_name for group_name, _, _ in plan.rules_to_create}
+        ).values_list('name', 'pk'))
+
+        ScheduledClass.objects.bulk_create(
+            ScheduledClass(
+                school_group_id=groups[group_name], day_of_week=day, start_time=start_time,
+                default_duration_minutes=DEFAULT_DURATION_MINUTES,
+            )
+            for group_name, day, start_time in plan.rules_to_create
+        )
+        ScheduledClass.objects.bulk_update(plan.rules_to_update, ['default_duration_minutes'])
+
+        new_players = list(plan.players_to_create.values())
+        if connection.features.can_return_rows_from_bulk_insert:
+            Player.objects.bulk_create(new_players)
+            index_players(new_players)
+        else:
+            for player in new_players:
+                player.save()  # The ids are needed for the memberships below.
+
+        updated = []
+        for player, _, grade in plan.grade_updates.values():
+            player.grade = grade
+            updated.append(player)
+        Player.objects.bulk_update(updated, ['grade'])
+
+        pairs = {
+            (plan.players_to_create[player_ref].pk if isinstance(player_ref, tuple) else player_ref, groups[group_name])
+            for player_ref, group_name, _ in plan.memberships_to_add
+        }
+        PlayerGroups.objects.bulk_create(
+            [PlayerGroups(player_id=player_id, schoolgroup_id=group_id) for player_id, group_id in pairs],
+            ignore_conflicts=True,
+        )
+        start_memberships(pairs)
+        mark_attendance_stale(player_ids={player_id for player_id, _ in pairs})
@@ -6,6 +6,7 @@ from django.db import transaction
 
 # Import your models (ensure all necessary models are imported)
 from .models import ScheduledClass, Session, Player, Coach 
+from .conflicts import build_conflict_index, describe_conflicts
 
 def generate_sessions_for_rules(
     scheduled_classes_qs, 
@@ -27,7 +28,8 @@ def generate_sessions_for_rules(
                                           If False, such clashes will be skipped.
 
     Returns:
-        A dictionary with counts: {'created': count, 'skipped_exists': count, 'skipped_inactive_rule': count, 'errors': count, 'details': list_of_messages}
+        A dictionary with counts: {'created': count, 'skipped_exists': count, 'skipped_inactive_rule': count, 'errors': count, 'details': list_of_messages,
+        'conflicts': list of double-booking warnings (coach or venue) for the sessions created or updated}
     """
     from .models import Session # Import locally if there's any chance of circularity with models.py
 
@@ -36,6 +38,7 @@ def generate_sessions_for_rules(
     sessions_skipped_inactive_rule_count = 0
     errors_count = 0
     action_details = []
+    touched_session_ids = []
 
     if period_start_date > period_end_date:
         action_details.append(f"Error: Start date ({period_start_date}) cannot be after end date ({period_end_date}).")
@@ -90,6 +93,7 @@ def generate_sessions_for_rules(
                             # For now, let's keep existing coaches/attendees on the manual session if it's updated.
                             # Or, set coaches from rule: clashing_manual_session.coaches_attending.set(rule.default_coaches.all())
                             clashing_manual_session.save()
+                            touched_session_ids.append(clashing_manual_session.pk)
                             sessions_created_count += 1 # Count as "created" in the sense of "processed by rule"
                             action_details.append(f"Updated: Manually created session for '{rule.school_group}' on {current_date} at {rule.start_time} was linked to rule '{rule}'.")
                         else:
@@ -124,6 +128,7 @@ def generate_sessions_for_rules(
                                 new_session.attendees.set(active_players_in_group)
                         
                         sessions_created_count += 1
+                        touched_session_ids.append(new_session.pk)
                         action_details.append(f"Created: Session for '{rule}' on {current_date}.")
                     except Exception as e:
                         errors_count += 1
@@ -133,11 +138,34 @@ def generate_sessions_for_rules(
 
             current_date += timedelta(days=1)
 
+    conflict_warnings = find_conflicts_for_sessions(touched_session_ids, period_start_date, period_end_date)
+
     return {
         'created': sessions_created_count,
         'skipped_exists': sessions_skipped_exists_count,
         'skipped_inactive_rule': sessions_skipped_inactive_rule_count, # You'd increment this if you track it
         'errors': errors_count,
-        'details': action_details
+        'details': action_details,
+        'conflicts': conflict_warnings,
     }
 
+
+def find_conflicts_for_sessions(session_ids, period_start_date: date, period_end_date: date):
+    """
+    Double-booking warnings (coach or venue) for the given sessions, checked against
+    every session and event in the period through one interval index.
+    """
+    if not session_ids:
+        return []
+    index = build_conflict_index(period_start_date, period_end_date)
+    sessions = Session.objects.filter(pk__in=session_ids, is_cancelled=False).select_related(
+        'school_group'
+    ).prefetch_related('coaches_attending').order_by('session_date', 'session_start_time')
+    warnings = []
+    for session in sessions:
+        coaches = list(session.coaches_attending.all())
+        conflicts = index.session_conflicts(session, [coach.pk for coach in coaches])
+        for warning in describe_conflicts(conflicts, {coach.pk: coach.name for coach in coaches}):
+            warnings.append(f"{session}: {warning}")
+    return warnings
+
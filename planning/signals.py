@@ -0,0 +1,258 @@
+# planning/signals.py
+
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .assessment_ledger import refresh_assessment_ledger
+from .attendance_service import start_memberships, end_memberships
+from .cache_versions import bump_versions_on_commit
+from .calendar_service import invalidate_calendar
+from .dashboard_service import dashboard_cache_scope
+from .models import (
+    Session, Coach, Player, CoachAvailability, SessionAssessment,
+    GroupAssessment, CoachSessionCompletion, CourtSprintRecord,
+    VolleyRecord, BackwallDriveRecord, MatchResult, SchoolGroup, Venue
+)
+from .player_analytics import METRIC_FOR_MODEL, refresh_player_metric, mark_attendance_stale
+from .player_search import index_player, unindex_player
+
+try:
+    from solosync_api.models import SoloSessionLog
+except ImportError:
+    SoloSessionLog = None
+
+
+# --- Dashboard cache invalidation ---
+
+def invalidate_dashboard(*scope_names, user_ids=()):
+    """Bumps shared dashboard scopes plus the per-user scope of each coach user id given."""
+    scopes = {dashboard_cache_scope(name) for name in scope_names}
+    scopes.update(dashboard_cache_scope('user', user_id) for user_id in user_ids if user_id)
+    bump_versions_on_commit(scopes)
+
+
+def coach_user_ids_for_sessions(session_ids):
+    return list(
+        Coach.objects.filter(coached_sessions__in=session_ids, user__isnull=False)
+        .values_list('user_id', flat=True).distinct()
+    )
+
+
+@receiver(post_save, sender=Session)
+def session_saved(sender, instance, **kwargs):
+    invalidate_dashboard('sessions', user_ids=coach_user_ids_for_sessions([instance.pk]))
+    # Date, time and cancellation are copied into the assessment ledger.
+    refresh_assessment_ledger([instance.pk])
+
+
+@receiver(pre_delete, sender=Session)
+def session_deleted(sender, instance, **kwargs):
+    # Assigned coaches must be read before the cascade removes the through rows.
+    invalidate_dashboard('sessions', user_ids=coach_user_ids_for_sessions([instance.pk]))
+
+
+def _m2m_session_ids(instance, action, reverse, pk_set, related_sessions):
+    """
+    Session ids touched by an m2m change on a Session relation. For a reverse clear the
+    ids are remembered at pre_clear, since the rows are gone by post_clear.
+    """
+    if not reverse:
+        return [instance.pk]
+    if action == 'pre_clear':
+        instance._cleared_session_ids = list(related_sessions.values_list('pk', flat=True))
+        return instance._cleared_session_ids
+    if action == 'post_clear':
+        return getattr(instance, '_cleared_session_ids', [])
+    return list(pk_set)
+
+
+@receiver(m2m_changed, sender=Session.coaches_attending.through)
+def session_coaches_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    session_ids = _m2m_session_ids(
+        instance, action, reverse, pk_set, instance.coached_sessions if reverse else None
+    )
+    if action == 'pre_clear':
+        # Assigned coaches must be read before the clear.
+        user_ids = [instance.user_id] if reverse else coach_user_ids_for_sessions(session_ids)
+        invalidate_dashboard('sessions', user_ids=user_ids)
+        return
+    if action != 'post_clear':
+        if reverse:
+            user_ids = [instance.user_id]
+        else:
+            user_ids = Coach.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+        invalidate_dashboard('sessions', user_ids=user_ids)
+    refresh_assessment_ledger(session_ids)
+
+
+@receiver(m2m_changed, sender=Session.attendees.through)
+def session_attendees_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Attendance drives the coaches' "assessments still to do" reminders.
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    session_ids = _m2m_session_ids(
+        instance, action, reverse, pk_set, instance.attended_sessions if reverse else None
+    )
+    if action == 'pre_clear':
+        return
+    invalidate_dashboard(user_ids=coach_user_ids_for_sessions(session_ids))
+    refresh_assessment_ledger(session_ids)
+
+
+@receiver([post_save, post_delete], sender=CoachAvailability)
+def coach_availability_changed(sender, instance, **kwargs):
+    invalidate_dashboard('availability', user_ids=[instance.coach_id])
+
+
+@receiver([post_save, post_delete], sender=SessionAssessment)
+def session_assessment_changed(sender, instance, **kwargs):
+    invalidate_dashboard('assessments', user_ids=[instance.submitted_by_id])
+    refresh_assessment_ledger([instance.session_id])
+
+
+@receiver([post_save, post_delete], sender=GroupAssessment)
+def group_assessment_changed(sender, instance, **kwargs):
+    invalidate_dashboard('group_assessments', user_ids=[instance.assessing_coach_id])
+    refresh_assessment_ledger([instance.session_id])
+
+
+@receiver([post_save, post_delete], sender=CoachSessionCompletion)
+def coach_session_completion_changed(sender, instance, **kwargs):
+    user_id = Coach.objects.filter(pk=instance.coach_id).values_list('user_id', flat=True).first()
+    invalidate_dashboard(user_ids=[user_id])
+    refresh_assessment_ledger([instance.session_id])
+
+
+# --- Player analytics snapshots ---
+
+@receiver([post_save, post_delete], sender=CourtSprintRecord)
+@receiver([post_save, post_delete], sender=VolleyRecord)
+@receiver([post_save, post_delete], sender=BackwallDriveRecord)
+def player_metric_record_changed(sender, instance, **kwargs):
+    refresh_player_metric(instance.player_id, METRIC_FOR_MODEL[sender])
+
+
+@receiver([post_save, post_delete], sender=MatchResult)
+def match_result_changed(sender, instance, **kwargs):
+    refresh_player_metric(instance.player_id, 'matches')
+
+
+@receiver([post_save, pre_delete], sender=Session)
+def session_changed_for_player_attendance(sender, instance, **kwargs):
+    # The session counts towards its group's "relevant sessions" and its attendees' totals.
+    mark_attendance_stale(
+        player_ids=instance.attendees.values_list('pk', flat=True),
+        school_group_ids=[instance.school_group_id] if instance.school_group_id else None,
+    )
+
+
+@receiver(m2m_changed, sender=Session.attendees.through)
+def attendance_changed_for_player_attendance(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        mark_attendance_stale(player_ids=[instance.pk])
+    elif action == 'pre_clear':
+        mark_attendance_stale(player_ids=instance.attendees.values_list('pk', flat=True))
+    else:
+        mark_attendance_stale(player_ids=pk_set)
+
+
+@receiver(m2m_changed, sender=Player.school_groups.through)
+def player_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        mark_attendance_stale(player_ids=[instance.pk])
+    elif action == 'pre_clear':
+        mark_attendance_stale(player_ids=instance.players.values_list('pk', flat=True))
+    else:
+        mark_attendance_stale(player_ids=pk_set)
+
+
+# --- Session calendar feeds ---
+
+@receiver(post_save, sender=Session)
+@receiver(pre_delete, sender=Session)
+def calendar_session_changed(sender, instance, **kwargs):
+    invalidate_calendar(user_ids=coach_user_ids_for_sessions([instance.pk]))
+
+
+@receiver([post_save, post_delete], sender=SchoolGroup)
+@receiver([post_save, post_delete], sender=Venue)
+@receiver([post_save, post_delete], sender=Coach)
+def calendar_source_changed(sender, instance, **kwargs):
+    # Names and emails appear in every feed.
+    invalidate_calendar()
+
+
+@receiver(m2m_changed, sender=Session.coaches_attending.through)
+def calendar_session_coaches_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Each coach's feed lists the session's other coaches, so all of their feeds change.
+    # On pre_clear the rows are still there to be read.
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        session_ids = list(instance.coached_sessions.values_list('pk', flat=True)) if action == 'pre_clear' else list(pk_set)
+        user_ids = set(coach_user_ids_for_sessions(session_ids)) | {instance.user_id}
+    else:
+        user_ids = set(coach_user_ids_for_sessions([instance.pk]))
+        if pk_set:
+            user_ids.update(Coach.objects.filter(pk__in=pk_set).values_list('user_id', flat=True))
+    invalidate_calendar(user_ids=user_ids)
+
+
+@receiver(m2m_changed, sender=Session.attendees.through)
+def calendar_session_attendees_changed(sender, action, **kwargs):
+    # The JSON feed counts attendees; the .ics feeds do not show them.
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_calendar(attendance_only=True)
+
+
+# --- Group membership history ---
+
+@receiver(m2m_changed, sender=Player.school_groups.through)
+def player_groups_changed_for_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    # instance is the player, pk_set the groups; reversed when changed from the group side.
+    if action == 'post_add':
+        if reverse:
+            start_memberships((player_id, instance.pk) for player_id in pk_set)
+        else:
+            start_memberships((instance.pk, group_id) for group_id in pk_set)
+    elif action == 'post_remove':
+        if reverse:
+            end_memberships(player_ids=pk_set, school_group_ids=[instance.pk])
+        else:
+            end_memberships(player_ids=[instance.pk], school_group_ids=pk_set)
+    elif action == 'post_clear':
+        if reverse:
+            end_memberships(school_group_ids=[instance.pk])
+        else:
+            end_memberships(player_ids=[instance.pk])
+
+
+# --- Player search index ---
+
+@receiver(post_save, sender=Player)
+def player_saved_for_search(sender, instance, created, update_fields, **kwargs):
+    # Photo, contact and status saves leave the indexed name alone.
+    if update_fields is not None and not {'first_name', 'last_name'} & set(update_fields):
+        return
+    name = (instance.first_name, instance.last_name)
+    if not created and getattr(instance, '_loaded_name', None) == name:
+        return
+    index_player(instance)
+    instance._loaded_name = name
+
+
+@receiver(post_delete, sender=Player)
+def player_deleted_for_search(sender, instance, **kwargs):
+    unindex_player(instance.pk)
+
+
+if SoloSessionLog is not None:
+    @receiver([post_save, post_delete], sender=SoloSessionLog)
+    def solo_session_log_changed(sender, instance, **kwargs):
+        invalidate_dashboard('solo')
@@ -0,0 +1,329 @@
+# planning/staffing_service.py
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .conflicts import build_conflict_index, describe_conflicts, session_booking
+from .models import Session, Coach, CoachAvailability
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+STAFFING_DISPLAY_DAYS = 5  # The staffing page shows Monday to Friday.
+
+# Per-coach cell states in the staffing grid.
+CELL_CONFIRMED = 'confirmed'      # Assigned and confirmed.
+CELL_PENDING = 'pending'          # Assigned, no response yet.
+CELL_DECLINED = 'declined'        # Assigned but declined.
+CELL_AVAILABLE = 'available'      # Not assigned, marked available.
+CELL_EMERGENCY = 'emergency'      # Not assigned, available for emergencies only.
+CELL_UNAVAILABLE = 'unavailable'  # Not assigned, marked unavailable.
+
+
+def get_staffing_week(week_offset=0, today=None):
+    """Returns (monday, sunday) of the week week_offset weeks from the current local week."""
+    today = today or timezone.localdate()
+    week_start = today - timedelta(days=today.weekday()) + timedelta(weeks=week_offset)
+    return week_start, week_start + timedelta(days=6)
+
+
+def is_emergency_only(availability):
+    return "emergency" in (availability.notes or "").lower()
+
+
+class StaffingMatrix:
+    """
+    The assigned/available/pending/declined grid for the sessions of one week.
+
+    All rows are loaded up front in six queries: sessions, assigned coaches, their
+    availabilities, the active coaches and the week's events with their coaches.
+    Two indexes are then built once: user id -> Coach and (session id, user id) ->
+    CoachAvailability, plus a ConflictIndex for double-bookings. Every cell is a
+    dictionary lookup, so building the grid is linear in its size.
+    """
+
+    def __init__(self, week_start, week_end):
+        self.week_start = week_start
+        self.week_end = week_end
+
+        self.sessions = list(Session.objects.filter(
+            session_date__gte=week_start,
+            session_date__lte=week_end,
+            is_cancelled=False
+        ).select_related('school_group', 'venue').prefetch_related(
+            Prefetch('coaches_attending', queryset=Coach.objects.select_related('user').order_by('name'))
+        ).order_by('session_date', 'session_start_time'))
+
+        self.coaches = list(Coach.objects.filter(is_active=True).select_related('user').order_by('name'))
+        self.coaches_by_user_id = {coach.user_id: coach for coach in self.coaches if coach.user_id}
+
+        self.conflicts = build_conflict_index(week_start, week_end, sessions=self.sessions)
+
+        self.availability_index = {}
+        self.availabilities_by_session = defaultdict(list)
+        for availability in CoachAvailability.objects.filter(
+            session__in=[session.pk for session in self.sessions]
+        ).order_by():
+            self.availability_index[(availability.session_id, availability.coach_id)] = availability
+            self.availabilities_by_session[availability.session_id].append(availability)
+
+    def get_availability(self, session, coach):
+        if not coach.user_id:
+            return None
+        return self.availability_index.get((session.pk, coach.user_id))
+
+    def assigned_status(self, session, coach):
+        """Returns (cell state, notes) for a coach assigned to the session."""
+        availability = self.get_availability(session, coach)
+        if availability is None or availability.is_available is None:
+            return CELL_PENDING, availability.notes if availability else ""
+        if availability.is_available:
+            return CELL_CONFIRMED, availability.notes
+        return CELL_DECLINED, availability.notes
+
+    def session_row(self, session):
+        """Everything the staffing page shows for one session."""
+        assigned_coaches = list(session.coaches_attending.all())
+        assigned_ids = {coach.pk for coach in assigned_coaches}
+
+        booking = session_booking(session)
+        conflicts = self.conflicts.session_conflicts(session, assigned_ids)
+        coach_names = {coach.pk: coach.name for coach in assigned_coaches}
+
+        assigned_with_status = []
+        cells = {}
+        for coach in assigned_coaches:
+            state, notes = self.assigned_status(session, coach)
+            cells[coach.pk] = state
+            assigned_with_status.append({
+                'coach_profile': coach,
+                'status': {CELL_CONFIRMED: "Confirmed", CELL_DECLINED: "Declined"}.get(state, "Pending Response"),
+                'is_confirmed': state == CELL_CONFIRMED,
+                'is_declined': state == CELL_DECLINED,
+                'notes': notes,
+            })
+
+        # Only this session's availability rows are visited; the coach comes from the index.
+        # Assigned states win over availability states when a coach is both.
+        available_for_assignment = []
+        for availability in self.availabilities_by_session.get(session.pk, ()):
+            coach = self.coaches_by_user_id.get(availability.coach_id)
+            if coach is None or availability.is_available is None:
+                continue
+            if availability.is_available is False:
+                cells.setdefault(coach.pk, CELL_UNAVAILABLE)
+                continue
+            emergency_only = is_emergency_only(availability)
+            cells.setdefault(coach.pk, CELL_EMERGENCY if emergency_only else CELL_AVAILABLE)
+            available_for_assignment.append({
+                'coach_profile': coach,
+                'notes': availability.notes,
+                'is_emergency_only': emergency_only,
+                'has_conflict': bool(self.conflicts.coach_conflicts(
+                    coach.pk, booking.start, booking.end, exclude=('session', session.pk)
+                )),
+            })
+        # Fully available coaches first, then emergency only.
+        available_for_assignment.sort(key=lambda item: (item['is_emergency_only'], item['coach_profile'].name))
+
+        return {
+            'session_obj': session,
+            'assigned_coaches_with_status': assigned_with_status,
+            'assigned_coach_ids': assigned_ids,
+            'available_coaches_for_assignment': available_for_assignment,
+            'has_pending_confirmations': any(
+                item['status'] == "Pending Response" and item['coach_profile'].user_id
+                for item in assigned_with_status
+            ),
+            'has_declined_coaches': any(item['is_declined'] for item in assigned_with_status),
+            'conflict_warnings': describe_conflicts(conflicts, coach_names),
+            'cells': cells,
+        }
+
+    def rows(self):
+        return [self.session_row(session) for session in self.sessions]
+
+    def display_week(self, rows=None):
+        """Rows grouped per weekday for planning/session_staffing.html."""
+        rows = self.rows() if rows is None else rows
+        grouped = {i: [] for i in range(7)}
+        for row in rows:
+            grouped[row['session_obj'].session_date.weekday()].append(row)
+        return [
+            {
+                'day_name': DAY_NAMES[i],
+                'date': self.week_start + timedelta(days=i),
+                'sessions': grouped[i],
+            }
+            for i in range(STAFFING_DISPLAY_DAYS)
+        ]
+
+    def as_json(self):
+        """A JSON-serialisable version of the grid for client-side rendering."""
+        sessions = []
+        for row in self.rows():
+            session = row['session_obj']
+            sessions.append({
+                'id': session.pk,
+                'date': session.session_date.isoformat(),
+                'start_time': session.session_start_time.strftime('%H:%M') if session.session_start_time else None,
+                'duration_minutes': session.planned_duration_minutes,
+                'school_group': session.school_group.name if session.school_group else None,
+                'venue': session.venue.name if session.venue else None,
+                'assigned': [
+                    {
+                        'coach_id': item['coach_profile'].pk,
+                        'status': row['cells'][item['coach_profile'].pk],
+                        'notes': item['notes'],
+                    }
+                    for item in row['assigned_coaches_with_status']
+                ],
+                'available': [
+                    {
+                        'coach_id': item['coach_profile'].pk,
+                        'notes': item['notes'],
+                        'is_emergency_only': item['is_emergency_only'],
+                        'has_conflict': item['has_conflict'],
+                    }
+                    for item in row['available_coaches_for_assignment']
+                ],
+                'has_pending_confirmations': row['has_pending_confirmations'],
+                'has_declined_coaches': row['has_declined_coaches'],
+                'conflict_warnings': row['conflict_warnings'],
+                'cells': {str(coach_id): state for coach_id, state in row['cells'].items()},
+            })
+        return {
+            'week_start': self.week_start.isoformat(),
+            'week_end': self.week_end.isoformat(),
+            'coaches': [
+                {'id': coach.pk, 'name': coach.name, 'user_id': coach.user_id}
+                for coach in self.coaches
+            ],
+            'sessions': sessions,
+        }
+
+
+class StaffingChangeError(ValueError):
+    """Raised when a staffing change refers to unknown sessions or coaches or is malformed."""
+
+
+def _id_set(values, label):
+    try:
+        return {int(value) for value in values or ()}
+    except (TypeError, ValueError):
+        raise StaffingChangeError(f"Invalid {label}: {values!r}")
+
+
+def apply_staffing_changes(changes):
+    """
+    Applies coach assignment changes for any number of sessions in one transaction.
+
+    Each change is a dict with a 'session_id' and either 'coach_ids' (the complete new
+    list of assigned coaches) or 'add' and/or 'remove' lists of coach ids. Assignments
+    are written with one bulk insert and one bulk delete on the through table, and
+    declined availabilities of every coach left assigned to a changed session are
+    cleared with a single delete, so they are asked again.
+
+    Returns {'added', 'removed', 'availability_reset'}; the latter lists
+    (coach user, session) pairs whose availability was reset.
+    """
+    from django.db import transaction
+    from django.db.models import Q
+    from .assessment_ledger import refresh_assessment_ledger
+    from .signals import invalidate_dashboard
+    from .calendar_service import invalidate_calendar
+
+    if not isinstance(changes, (list, tuple)):
+        raise StaffingChangeError("Changes must be a list.")
+
+    parsed = {}
+    for change in changes:
+        if not isinstance(change, dict) or 'session_id' not in change:
+            raise StaffingChangeError("Each change needs a session_id.")
+        session_id = next(iter(_id_set([change['session_id']], 'session_id')))
+        if session_id in parsed:
+            raise StaffingChangeError(f"Session {session_id} appears more than once.")
+        parsed[session_id] = {
+            'coach_ids': _id_set(change['coach_ids'], 'coach_ids') if 'coach_ids' in change else None,
+            'add': _id_set(change.get('add'), 'add'),
+            'remove': _id_set(change.get('remove'), 'remove'),
+        }
+    if not parsed:
+        return {'added': 0, 'removed': 0, 'availability_reset': []}
+
+    through = Session.coaches_attending.through
+    with transaction.atomic():
+        sessions = Session.objects.select_for_update().in_bulk(list(parsed))
+        missing_sessions = set(parsed) - set(sessions)
+        if missing_sessions:
+            raise StaffingChangeError(f"Unknown session ids: {sorted(missing_sessions)}")
+
+        current = defaultdict(set)
+        for session_id, coach_id in through.objects.filter(
+            session_id__in=list(parsed)
+        ).values_list('session_id', 'coach_id'):
+            current[session_id].add(coach_id)
+
+        referenced_coach_ids = set()
+        for change in parsed.values():
+            referenced_coach_ids |= change['add'] | change['remove'] | (change['coach_ids'] or set())
+        coaches = Coach.objects.select_related('user').in_bulk(
+            list(referenced_coach_ids.union(*current.values()))
+        )
+        missing_coaches = referenced_coach_ids - set(coaches)
+        if missing_coaches:
+            raise StaffingChangeError(f"Unknown coach ids: {sorted(missing_coaches)}")
+
+        to_add, to_remove, final = [], Q(), {}
+        removed_count = 0
+        for session_id, change in parsed.items():
+            if change['coach_ids'] is not None:
+                wanted = change['coach_ids']
+            else:
+                wanted = (current[session_id] | change['add']) - change['remove']
+            removed = current[session_id] - wanted
+            to_add.extend(
+                through(session_id=session_id, coach_id=coach_id)
+                for coach_id in wanted - current[session_id]
+            )
+            if removed:
+                to_remove |= Q(session_id=session_id, coach_id__in=removed)
+                removed_count += len(removed)
+            final[session_id] = wanted
+
+        if to_add:
+            through.objects.bulk_create(to_add)
+        if removed_count:
+            through.objects.filter(to_remove).delete()
+
+        # Coaches left assigned to a changed session who had declined are asked again.
+        declined_filter = Q()
+        for session_id, coach_ids in final.items():
+            user_ids = {coaches[coach_id].user_id for coach_id in coach_ids if coaches[coach_id].user_id}
+            if user_ids:
+                declined_filter |= Q(session_id=session_id, coach_id__in=user_ids)
+
+        availability_reset = []
+        if declined_filter:
+            declined_qs = CoachAvailability.objects.filter(declined_filter, is_available=False)
+            availability_reset = [
+                (availability.coach, sessions[availability.session_id])
+                for availability in declined_qs.select_related('coach')
+            ]
+            if availability_reset:
+                declined_qs.delete()
+
+        # The bulk writes above bypass the m2m_changed signals, so refresh the ledger and
+        # invalidate explicitly for every coach who was or is assigned to a changed session.
+        affected_user_ids = {
+            coaches[coach_id].user_id for coach_id in set().union(*current.values(), *final.values())
+        }
+        if to_add or removed_count:
+            refresh_assessment_ledger([
+                session_id for session_id, wanted in final.items() if wanted != current[session_id]
+            ])
+            invalidate_calendar(user_ids=affected_user_ids)
+        invalidate_dashboard('sessions', 'availability', user_ids=affected_user_ids)
+
+    return {'added': len(to_add), 'removed': removed_count, 'availability_reset': availability_reset}
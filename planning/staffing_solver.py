@@ -0,0 +1,205 @@
+# planning/staffing_solver.py
+
+"""
+Proposes coaches for unstaffed sessions.
+
+Every (session, coach) pair where the coach said they are available gets a cost:
+emergency-only availability is expensive, higher qualifications are cheaper, and
+every hour a coach already has in the period makes them more expensive, which
+spreads hours fairly. Sessions are then filled most-constrained first (fewest
+candidates), each taking its cheapest candidate who is not already coaching an
+overlapping session or event. The result is a proposal only; nothing is saved until it is
+applied through planning.staffing_service.apply_staffing_changes.
+"""
+
+import bisect
+from collections import defaultdict
+
+from .conflicts import build_conflict_index, session_booking
+from .models import Session, Coach, CoachAvailability
+from .staffing_service import is_emergency_only
+
+# Cost model. Only the relative sizes matter.
+EMERGENCY_ONLY_PENALTY = 100
+QUALIFICATION_BONUS_PER_LEVEL = 5
+COST_PER_ASSIGNED_HOUR = 10
+
+QUALIFICATION_POINTS = {
+    Coach.QualificationLevel.NONE: 0,
+    Coach.QualificationLevel.LEVEL_1: 1,
+    Coach.QualificationLevel.LEVEL_2: 2,
+    Coach.QualificationLevel.LEVEL_3: 3,
+    Coach.QualificationLevel.OTHER: 1,
+}
+
+
+def qualification_level(coach):
+    """The coach's highest WSF/SSA level as a number (0 when unqualified)."""
+    return max(
+        QUALIFICATION_POINTS.get(coach.qualification_wsf_level, 0),
+        QUALIFICATION_POINTS.get(coach.qualification_ssa_level, 0),
+    )
+
+
+class CoachSchedule:
+    """
+    Intervals proposed for a coach during a solve, kept sorted so overlap checks are a
+    binary search. Existing bookings live in the (static) ConflictIndex instead.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.intervals = []
+
+    def overlaps(self, start, end):
+        index = bisect.bisect_left(self.starts, start)
+        if index < len(self.intervals) and self.intervals[index][0] < end:
+            return True
+        return index > 0 and self.intervals[index - 1][1] > start
+
+    def add(self, start, end):
+        index = bisect.bisect_left(self.starts, start)
+        self.starts.insert(index, start)
+        self.intervals.insert(index, (start, end))
+
+
+def propose_staffing(start_date, end_date, coaches_per_session=1):
+    """
+    Proposes coaches for every non-cancelled session between start_date and end_date
+    (inclusive) that has fewer than coaches_per_session coaches.
+
+    Returns a dict with:
+      'proposals':  [{'session', 'coach', 'cost', 'is_emergency_only'}], in session order
+      'unfilled':   [{'session', 'missing'}] for sessions that could not be fully staffed
+      'changes':    the proposals in the format apply_staffing_changes accepts
+      'hours':      {coach: hours in the period including proposals}
+    Runs a fixed number of queries (at most eight) whatever the size of the period.
+    """
+    sessions = list(Session.objects.filter(
+        session_date__gte=start_date, session_date__lte=end_date, is_cancelled=False
+    ).select_related('school_group').order_by('session_date', 'session_start_time'))
+    session_ids = [session.pk for session in sessions]
+
+    assigned = defaultdict(set)
+    for session_id, coach_id in Session.coaches_attending.through.objects.filter(
+        session_id__in=session_ids
+    ).values_list('session_id', 'coach_id'):
+        assigned[session_id].add(coach_id)
+
+    coaches = {coach.pk: coach for coach in Coach.objects.filter(is_active=True, user__isnull=False)}
+    coach_by_user_id = {coach.user_id: coach for coach in coaches.values()}
+
+    # (coach, emergency only) pairs for each session, from explicit "available" answers.
+    candidates = defaultdict(list)
+    for availability in CoachAvailability.objects.filter(
+        session_id__in=session_ids, is_available=True
+    ).order_by():
+        coach = coach_by_user_id.get(availability.coach_id)
+        if coach is not None and coach.pk not in assigned[availability.session_id]:
+            candidates[availability.session_id].append((coach, is_emergency_only(availability)))
+
+    # Existing sessions and events block overlapping proposals (through the conflict index);
+    # existing session hours count towards fairness.
+    existing_bookings = build_conflict_index(start_date, end_date)
+    schedules = defaultdict(CoachSchedule)
+    hours = defaultdict(float)
+    bookings = {session.pk: session_booking(session) for session in sessions}
+    for session in sessions:
+        for coach_id in assigned[session.pk]:
+            hours[coach_id] += session.planned_duration_minutes / 60
+
+    def is_booked(coach_id, booking):
+        return (
+            schedules[coach_id].overlaps(booking.start, booking.end)
+            or existing_bookings.coach_conflicts(coach_id, booking.start, booking.end, exclude=('session', booking.pk))
+        )
+
+    qualification_bonus = {
+        coach_id: qualification_level(coach) * QUALIFICATION_BONUS_PER_LEVEL
+        for coach_id, coach in coaches.items()
+    }
+
+    def cost(coach, emergency_only):
+        return (
+            COST_PER_ASSIGNED_HOUR * hours[coach.pk]
+            - qualification_bonus[coach.pk]
+            + (EMERGENCY_ONLY_PENALTY if emergency_only else 0)
+        )
+
+    to_fill = [
+        session for session in sessions
+        if len(assigned[session.pk]) < coaches_per_session
+    ]
+    # Most constrained first; ties keep calendar order.
+    to_fill.sort(key=lambda session: len(candidates[session.pk]))
+
+    proposals, unfilled = [], []
+    for session in to_fill:
+        booking = bookings[session.pk]
+        needed = coaches_per_session - len(assigned[session.pk])
+        for _ in range(needed):
+            best = None
+            for coach, emergency_only in candidates[session.pk]:
+                if coach.pk in assigned[session.pk] or is_booked(coach.pk, booking):
+                    continue
+                option = (cost(coach, emergency_only), coach.name, coach, emergency_only)
+                if best is None or option[:2] < best[:2]:
+                    best = option
+            if best is None:
+                break
+            coach_cost, _, coach, emergency_only = best
+            assigned[session.pk].add(coach.pk)
+            schedules[coach.pk].add(booking.start, booking.end)
+            hours[coach.pk] += session.planned_duration_minutes / 60
+            proposals.append({
+                'session': session, 'coach': coach,
+                'cost': coach_cost, 'is_emergency_only': emergency_only,
+            })
+        missing = coaches_per_session - len(assigned[session.pk])
+        if missing > 0:
+            unfilled.append({'session': session, 'missing': missing})
+
+    session_order = {session_id: index for index, session_id in enumerate(session_ids)}
+    proposals.sort(key=lambda item: (session_order[item['session'].pk], item['coach'].name))
+    unfilled.sort(key=lambda item: session_order[item['session'].pk])
+
+    changes = defaultdict(list)
+    for item in proposals:
+        changes[item['session'].pk].append(item['coach'].pk)
+
+    return {
+        'proposals': proposals,
+        'unfilled': unfilled,
+        'changes': [{'session_id': session_id, 'add': coach_ids} for session_id, coach_ids in changes.items()],
+        'hours': {coaches[coach_id]: total for coach_id, total in hours.items() if coach_id in coaches},
+    }
+
+
+def proposal_as_json(result):
+    """A JSON-serialisable version of propose_staffing's result for review in the browser."""
+    def session_json(session):
+        return {
+            'id': session.pk,
+            'date': session.session_date.isoformat(),
+            'start_time': session.session_start_time.strftime('%H:%M'),
+            'duration_minutes': session.planned_duration_minutes,
+        }
+
+    return {
+        'proposals': [
+            {
+                'session': session_json(item['session']),
+                'coach_id': item['coach'].pk,
+                'coach_name': item['coach'].name,
+                'cost': item['cost'],
+                'is_emergency_only': item['is_emergency_only'],
+            }
+            for item in result['proposals']
+        ],
+        'unfilled': [
+            {'session': session_json(item['session']), 'missing': item['missing']}
+            for item in result['unfilled']
+        ],
+        'changes': result['changes'],
+        'hours': {coach.name: round(total, 2) for coach, total in result['hours'].items()},
+    }
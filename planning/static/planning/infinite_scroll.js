@@ -0,0 +1,44 @@
+// Infinite scroll for the keyset-paginated lists.
+//
+// Markup: <a class="load-more" href="?cursor=..." data-rows="ID"> after the list with that ID,
+// or inside it as its last item (for lists that scroll within their own box).
+// The link is the no-JS fallback; here, when it scrolls into view, the same URL is fetched
+// with format=json and the returned rows are appended. The response's next_url becomes the
+// new link target, and the link is removed on the last page.
+(function () {
+    if (!('IntersectionObserver' in window)) { return; }
+    document.querySelectorAll('a.load-more[data-rows]').forEach(function (more) {
+        const rows = document.getElementById(more.dataset.rows);
+        if (!rows) { return; }
+        // When the link is the list's last item, new rows go in above it.
+        const pager = rows.contains(more) ? more.parentElement : null;
+        let loading = false;
+        const observer = new IntersectionObserver(function (entries) {
+            if (!entries[0].isIntersecting || loading) { return; }
+            loading = true;
+            const url = new URL(more.href, window.location.href);
+            url.searchParams.set('format', 'json');
+            fetch(url, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+                .then(function (response) {
+                    if (!response.ok) { throw new Error(`Status ${response.status}`); }
+                    return response.json();
+                })
+                .then(function (data) {
+                    if (pager) {
+                        pager.insertAdjacentHTML('beforebegin', data.html);
+                    } else {
+                        rows.insertAdjacentHTML('beforeend', data.html);
+                    }
+                    if (data.next_url) {
+                        more.href = data.next_url;
+                    } else {
+                        observer.disconnect();
+                        (pager || more).remove();
+                    }
+                })
+                .catch(function (error) { console.error('Could not load more rows:', error); })
+                .finally(function () { loading = false; });
+        });
+        observer.observe(more);
+    });
+})();
@@ -1,5 +1,6 @@
 # planning/templatetags/planning_extras.py
 from django import template
+from django.utils.html import format_html
 
 register = template.Library()
 
@@ -12,3 +13,24 @@ def get_item(dictionary, key):
     if hasattr(dictionary, 'get'): # Check if it's a dictionary-like object
         return dictionary.get(key) # .get() on a dict returns None if key is not found
     return None # Return None if the first argument isn't a dictionary
+
+
+@register.simple_tag
+def photo_picture(instance, rendition='card', css_class=''):
+    """
+    A player's or coach's photo at the given rendition (thumb, card or full): WebP with
+    a JPEG fallback once the renditions are ready, the original until then. Empty
+    without a photo, so templates keep their own placeholders.
+    """
+    from planning.photo_service import photo_urls
+
+    webp_url, url = photo_urls(instance, rendition)
+    if url is None:
+        return ''
+    img = format_html(
+        '<img src="{}" alt="Photo of {}"{} loading="lazy">',
+        url, instance, format_html(' class="{}"', css_class) if css_class else '',
+    )
+    if webp_url is None:
+        return img
+    return format_html('<picture><source srcset="{}" type="image/webp">{}</picture>', webp_url, img)
@@ -1,3 +1,1518 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import numpy as np
+from PIL import Image as PILImage
+
+from .dashboard_service import build_dashboard_context, get_dashboard_cache_keys, get_dashboard_panels
+from .assessment_ledger import rebuild_assessment_ledger
+from .player_analytics import get_player_snapshot
+from .chart_data import lttb, bucket_downsample
+from .player_search import search_players, rebuild_search_index
+from .pagination import KeysetPaginator
+from .attendance_service import group_attendance_summary
+from .availability_service import apply_bulk_availability, rule_availability_states
+from .import_pipeline import AttendanceMapper, Checkpoint, run_import
+from .photo_service import photo_urls, process_photo
+from .calendar_service import make_feed_token, FEED_SCOPE_ALL
+from .attendance_analytics import AttendanceAnalytics
+from .assessment_service import get_pending_assessment_sessions, build_pending_items, get_players_to_assess
+from .conflicts import IntervalTree, Booking, build_conflict_index
+from .session_generation_service import generate_sessions_for_rules
+from .staffing_solver import propose_staffing
+from .staffing_service import StaffingMatrix, apply_staffing_changes, get_staffing_week
+from .views import PLAYER_PROFILE_RECENT_ITEMS
+from .models import (
+    Session, SchoolGroup, Player, Coach, CoachAvailability,
+    SessionAssessment, GroupAssessment, Event, Venue, ScheduledClass,
+    CoachSessionCompletion, CoachAssessmentLedger, CourtSprintRecord, VolleyRecord,
+    PlayerGroupMembership, PhotoStatus
+)
+
+User = get_user_model()
+
+
+def make_session(group, day, start=datetime.time(15, 0), **kwargs):
+    return Session.objects.create(
+        school_group=group, session_date=day, session_start_time=start,
+        planned_duration_minutes=60, **kwargs
+    )
+
+
+class DashboardQueryCountTests(TestCase):
+    """The dashboard must cost the same number of queries however much data exists."""
+
+    # Pinned per role; see planning/dashboard_service.py for the per-panel breakdown.
+    SUPERUSER_QUERIES = 8
+    COACH_QUERIES = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.now = timezone.make_aware(datetime.datetime(2025, 6, 11, 12, 0))
+        cls.today = cls.now.date()
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        cls.coach_user = User.objects.create_user('coach', 'coach@example.com', 'pw', is_staff=True)
+        cls.coach = Coach.objects.create(user=cls.coach_user, name='Coach One')
+        cls.other_user = User.objects.create_user('other', 'other@example.com', 'pw', is_staff=True)
+        cls.other_coach = Coach.objects.create(user=cls.other_user, name='Coach Two')
+        cls.group = SchoolGroup.objects.create(name='U19 A')
+        cls.players = [
+            Player.objects.create(first_name=f'Player{i}', last_name='Test') for i in range(4)
+        ]
+        cls.add_sessions(3)
+
+    @classmethod
+    def add_sessions(cls, count):
+        for offset in range(count):
+            past = make_session(cls.group, cls.today - datetime.timedelta(days=offset + 1))
+            past.coaches_attending.add(cls.coach, cls.other_coach)
+            past.attendees.set(cls.players)
+            SessionAssessment.objects.create(session=past, player=cls.players[0], submitted_by=cls.coach_user)
+
+            tomorrow = make_session(
+                cls.group, cls.today + datetime.timedelta(days=1),
+                start=datetime.time(8 + offset, 0)
+            )
+            tomorrow.coaches_attending.add(cls.coach, cls.other_coach)
+            CoachAvailability.objects.create(coach=cls.other_user, session=tomorrow, is_available=False)
+            make_session(cls.group, cls.today + datetime.timedelta(days=3 + offset))
+
+    def assert_stable_query_count(self, user, expected):
+        with self.assertNumQueries(expected):
+            build_dashboard_context(user, now=self.now)
+        self.add_sessions(10)
+        fresh_user = User.objects.get(pk=user.pk)
+        with self.assertNumQueries(expected):
+            build_dashboard_context(fresh_user, now=self.now)
+
+    def test_superuser_query_count_is_fixed(self):
+        self.assert_stable_query_count(User.objects.get(pk=self.admin.pk), self.SUPERUSER_QUERIES)
+
+    def test_coach_query_count_is_fixed(self):
+        self.assert_stable_query_count(User.objects.get(pk=self.coach_user.pk), self.COACH_QUERIES)
+
+    def test_coach_panels(self):
+        context = build_dashboard_context(User.objects.get(pk=self.coach_user.pk), now=self.now)
+        self.assertEqual(len(context['sessions_for_direct_confirmation']), 3)
+        self.assertEqual(len(context['recent_sessions_for_feedback']), 3)
+        self.assertEqual(len(context['upcoming_sessions']), 3)
+
+    def test_feedback_reminder_clears_once_everything_is_assessed(self):
+        session = Session.objects.filter(session_date=self.today - datetime.timedelta(days=1)).get()
+        for player in self.players[1:]:
+            SessionAssessment.objects.create(session=session, player=player, submitted_by=self.coach_user)
+        GroupAssessment.objects.create(session=session, assessing_coach=self.coach_user)
+        context = build_dashboard_context(User.objects.get(pk=self.coach_user.pk), now=self.now)
+        self.assertNotIn(session, context['recent_sessions_for_feedback'])
+
+    def test_superuser_staffing_alerts(self):
+        context = build_dashboard_context(User.objects.get(pk=self.admin.pk), now=self.now)
+        self.assertEqual(len(context['unconfirmed_staffing_alerts']), 3)
+        statuses = {
+            coach['name']: coach['status']
+            for coach in context['unconfirmed_staffing_alerts'][0]['unconfirmed_coaches']
+        }
+        self.assertEqual(statuses, {'coach': 'Pending Response', 'other': 'Declined'})
+        self.assertEqual(context['unstaffed_session_count'], 3)
+
+    def test_homepage_renders_for_each_role(self):
+        for user in (self.admin, self.coach_user):
+            self.client.force_login(user)
+            response = self.client.get(reverse('planning:homepage'))
+            self.assertEqual(response.status_code, 200)
+
+
+class DashboardCacheInvalidationTests(TestCase):
+    """Cached dashboard panels must change key as soon as their underlying data changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.coach_user = User.objects.create_user('coach', 'coach@example.com', 'pw', is_staff=True)
+        cls.coach = Coach.objects.create(user=cls.coach_user, name='Coach One')
+        cls.other_user = User.objects.create_user('other', 'other@example.com', 'pw', is_staff=True)
+        cls.other_coach = Coach.objects.create(user=cls.other_user, name='Coach Two')
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        cls.group = SchoolGroup.objects.create(name='U19 A')
+
+    def setUp(self):
+        cache.clear()
+
+    def keys(self, user):
+        return get_dashboard_cache_keys(User.objects.get(pk=user.pk))
+
+    def test_coach_keys_change_when_assigned_to_a_session(self):
+        before, other_before = self.keys(self.coach_user), self.keys(self.other_user)
+        session = make_session(self.group, self.today + datetime.timedelta(days=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            session.coaches_attending.add(self.coach)
+        self.assertNotEqual(before['upcoming_sessions'], self.keys(self.coach_user)['upcoming_sessions'])
+        self.assertEqual(other_before, self.keys(self.other_user))
+
+    def test_superuser_keys_only_change_for_affected_panels(self):
+        before = self.keys(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            GroupAssessment.objects.create(
+                session=make_session(self.group, self.today), assessing_coach=self.coach_user
+            )
+        after = self.keys(self.admin)
+        self.assertNotEqual(before['group_assessment_review'], after['group_assessment_review'])
+        self.assertEqual(before['solo_logs'], after['solo_logs'])
+
+    def test_cached_panel_shows_new_session_after_commit(self):
+        self.client.force_login(self.coach_user)
+        url = reverse('planning:dashboard_panel', args=['upcoming_sessions'])
+        self.client.get(url)
+        fresh_group = SchoolGroup.objects.create(name='Fresh Group')
+        session = make_session(fresh_group, self.today + datetime.timedelta(days=2))
+        with self.captureOnCommitCallbacks(execute=True):
+            session.coaches_attending.add(self.coach)
+        response = self.client.get(url)
+        self.assertIn('Fresh Group', response.json()['html'])
+
+
+class DashboardPanelEndpointTests(TestCase):
+    """The dashboard shell renders no panels itself; each one is served by its own endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        cls.coach_user = User.objects.create_user('coach', 'coach@example.com', 'pw', is_staff=True)
+        Coach.objects.create(user=cls.coach_user, name='Coach One')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_shell_lists_only_the_roles_panels(self):
+        self.client.force_login(self.coach_user)
+        response = self.client.get(reverse('planning:homepage'))
+        self.assertContains(response, reverse('planning:dashboard_panel', args=['feedback_reminders']))
+        self.assertNotContains(response, reverse('planning:dashboard_panel', args=['assessment_review']))
+
+    def test_every_panel_renders_with_server_timing(self):
+        for user in (self.admin, self.coach_user):
+            self.client.force_login(user)
+            for panel in get_dashboard_panels(user):
+                response = self.client.get(reverse('planning:dashboard_panel', args=[panel]))
+                self.assertEqual(response.status_code, 200, panel)
+                self.assertEqual(response.json()['panel'], panel)
+                self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_panels_of_another_role_are_not_found(self):
+        self.client.force_login(self.coach_user)
+        response = self.client.get(reverse('planning:dashboard_panel', args=['assessment_review']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_unchanged_panel_is_not_modified(self):
+        self.client.force_login(self.admin)
+        url = reverse('planning:dashboard_panel', args=['group_assessment_review'])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_warm_panel_cache_skips_panel_queries(self):
+        self.client.force_login(self.admin)
+        url = reverse('planning:dashboard_panel', args=['assessment_review'])
+        self.client.get(url)
+        with self.assertNumQueries(2):  # session and user lookups only
+            self.client.get(url)
+
+
+class StaffingMatrixTests(TestCase):
+    """The staffing grid is built from indexes, in a fixed number of queries."""
+
+    STAFFING_QUERIES = 6  # sessions, assigned coaches, active coaches, events, event coaches, availabilities
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.week_start, cls.week_end = get_staffing_week(0, today=datetime.date(2025, 6, 11))
+        cls.group = SchoolGroup.objects.create(name='U19 A')
+        cls.coaches = []
+        for i, name in enumerate(['Alice', 'Bob', 'Cara', 'Dan']):
+            user = User.objects.create_user(name.lower(), f'{name.lower()}@example.com', 'pw', is_staff=True)
+            cls.coaches.append(Coach.objects.create(user=user, name=name))
+        alice, bob, cara, dan = cls.coaches
+        cls.session = make_session(cls.group, cls.week_start)
+        cls.session.coaches_attending.add(alice, bob)
+        CoachAvailability.objects.create(coach=alice.user, session=cls.session, is_available=True)
+        CoachAvailability.objects.create(coach=bob.user, session=cls.session, is_available=False)
+        CoachAvailability.objects.create(coach=cara.user, session=cls.session, is_available=True, notes='Emergency only')
+        CoachAvailability.objects.create(coach=dan.user, session=cls.session, is_available=True)
+        event = Event.objects.create(
+            name='Prize giving', event_date=timezone.make_aware(datetime.datetime.combine(cls.week_start, datetime.time(15, 30)))
+        )
+        event.attending_coaches.add(dan)
+
+    def test_cells_and_available_order(self):
+        row = StaffingMatrix(self.week_start, self.week_end).rows()[0]
+        alice, bob, cara, dan = self.coaches
+        self.assertEqual(row['cells'], {
+            alice.pk: 'confirmed', bob.pk: 'declined', cara.pk: 'emergency', dan.pk: 'available'
+        })
+        self.assertTrue(row['has_declined_coaches'])
+        self.assertFalse(row['has_pending_confirmations'])
+        self.assertEqual(
+            [item['coach_profile'] for item in row['available_coaches_for_assignment']], [alice, dan, cara]
+        )
+        self.assertEqual(
+            [item['has_conflict'] for item in row['available_coaches_for_assignment']], [False, True, False]
+        )
+
+    def test_query_count_is_fixed(self):
+        for day in range(1, 5):
+            session = make_session(self.group, self.week_start + datetime.timedelta(days=day))
+            session.coaches_attending.add(*self.coaches)
+        with self.assertNumQueries(self.STAFFING_QUERIES):
+            StaffingMatrix(self.week_start, self.week_end).display_week()
+
+    def test_json_endpoint(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        response = self.client.get(reverse('planning:session_staffing_matrix_api'), {'week': 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['coaches']), 4)
+        self.assertEqual(self.client.get(reverse('planning:session_staffing')).status_code, 200)
+
+
+class BulkStaffingTests(TestCase):
+    """A whole week of staffing changes is applied in one request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        cls.group = SchoolGroup.objects.create(name='U19 A')
+        cls.coaches = []
+        for name in ['Alice', 'Bob', 'Cara']:
+            user = User.objects.create_user(name.lower(), f'{name.lower()}@example.com', 'pw', is_staff=True)
+            cls.coaches.append(Coach.objects.create(user=user, name=name))
+        week_start, _ = get_staffing_week(0)
+        cls.sessions = [make_session(cls.group, week_start + datetime.timedelta(days=i)) for i in range(5)]
+
+    def post(self, payload):
+        self.client.force_login(self.admin)
+        return self.client.post(
+            reverse('planning:session_staffing_bulk_api'), data=json.dumps(payload), content_type='application/json'
+        )
+
+    def test_week_diff_is_applied_and_matrix_returned(self):
+        alice, bob, cara = self.coaches
+        first, second = self.sessions[:2]
+        first.coaches_attending.add(bob)
+        CoachAvailability.objects.create(coach=alice.user, session=first, is_available=False)
+
+        response = self.post({'week': 0, 'changes': [
+            {'session_id': first.pk, 'add': [alice.pk], 'remove': [bob.pk]},
+            {'session_id': second.pk, 'coach_ids': [bob.pk, cara.pk]},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['added'], data['removed']), (3, 1))
+        self.assertEqual(data['availability_reset'], [{'session_id': first.pk, 'coach_user_id': alice.user_id}])
+        self.assertEqual(set(first.coaches_attending.all()), {alice})
+        self.assertEqual(set(second.coaches_attending.all()), {bob, cara})
+        self.assertFalse(CoachAvailability.objects.filter(session=first, coach=alice.user).exists())
+        self.assertEqual(len(data['matrix']['sessions']), 5)
+
+    def test_query_count_does_not_grow_with_the_week(self):
+        def changes():
+            return [{'session_id': s.pk, 'coach_ids': [c.pk for c in self.coaches]} for s in self.sessions]
+        with CaptureQueriesContext(connection) as small:
+            apply_staffing_changes(changes()[:1])
+        Session.coaches_attending.through.objects.all().delete()
+        with CaptureQueriesContext(connection) as week:
+            apply_staffing_changes(changes())
+        self.assertEqual(len(small), len(week))
+
+    def test_unknown_ids_are_rejected_without_changes(self):
+        response = self.post({'changes': [
+            {'session_id': self.sessions[0].pk, 'add': [self.coaches[0].pk]},
+            {'session_id': 999999, 'add': [self.coaches[0].pk]},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.sessions[0].coaches_attending.exists())
+
+    def test_single_session_form_post(self):
+        self.client.force_login(self.admin)
+        session = self.sessions[0]
+        self.client.post(reverse('planning:session_staffing'), {
+            'session_id': session.pk, f'coaches_for_session_{session.pk}': [self.coaches[0].pk],
+        })
+        self.assertEqual(list(session.coaches_attending.all()), [self.coaches[0]])
+
+
+class StaffingSolverTests(TestCase):
+    """Proposals respect availability, overlaps and fairness, and stay fast for a full month."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = datetime.date(2025, 6, 9)
+        cls.group = SchoolGroup.objects.create(name='U19 A')
+
+    def make_coach(self, name, **kwargs):
+        user = User.objects.create(username=name.lower(), is_staff=True)
+        return Coach.objects.create(user=user, name=name, **kwargs)
+
+    def available(self, coach, session, notes=''):
+        CoachAvailability.objects.create(coach=coach.user, session=session, is_available=True, notes=notes)
+
+    def test_emergency_only_coaches_are_a_last_resort(self):
+        regular, emergency = self.make_coach('Regular'), self.make_coach('Emergency', qualification_wsf_level='L3')
+        session = make_session(self.group, self.day)
+        self.available(regular, session)
+        self.available(emergency, session, notes='Emergency only')
+        result = propose_staffing(self.day, self.day)
+        self.assertEqual([item['coach'] for item in result['proposals']], [regular])
+
+    def test_no_double_booking_and_fair_hours(self):
+        alice, bob = self.make_coach('Alice'), self.make_coach('Bob')
+        overlapping = [
+            make_session(self.group, self.day, start=datetime.time(15, 0)),
+            make_session(self.group, self.day, start=datetime.time(15, 30)),
+        ]
+        later = make_session(self.group, self.day, start=datetime.time(17, 0))
+        for session in overlapping + [later]:
+            self.available(alice, session)
+            self.available(bob, session)
+        result = propose_staffing(self.day, self.day)
+        by_session = {item['session']: item['coach'] for item in result['proposals']}
+        self.assertNotEqual(by_session[overlapping[0]], by_session[overlapping[1]])
+        self.assertIn(later, by_session)
+        self.assertEqual(result['unfilled'], [])
+        self.assertEqual(result['changes'][0], {'session_id': overlapping[0].pk, 'add': [by_session[overlapping[0]].pk]})
+
+    def test_month_of_sessions_solves_within_a_second(self):
+        coaches = [self.make_coach(f'Coach{i:02}') for i in range(25)]
+        sessions = Session.objects.bulk_create(
+            Session(
+                school_group=self.group, session_date=self.day + datetime.timedelta(days=i % 30),
+                session_start_time=datetime.time(7 + (i // 30) % 12, 0), planned_duration_minutes=60
+            )
+            for i in range(400)
+        )
+        CoachAvailability.objects.bulk_create(
+            CoachAvailability(coach=coach.user, session=session, is_available=(session.pk + index) % 3 != 0)
+            for session in sessions for index, coach in enumerate(coaches)
+        )
+        started = time.perf_counter()
+        result = propose_staffing(self.day, self.day + datetime.timedelta(days=30))
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(len(result['proposals']), 400)
+
+
+class ConflictIndexTests(TestCase):
+    """Coach and venue double-bookings are found through per-key interval trees."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = datetime.date(2025, 6, 9)  # A Monday
+        cls.group = SchoolGroup.objects.create(name='U19 A')
+        cls.venue = Venue.objects.create(name='Main Courts')
+        cls.coach = Coach.objects.create(name='Alice')
+
+    def test_interval_tree_matches_brute_force(self):
+        import random
+        rng = random.Random(4)
+        base = datetime.datetime(2025, 6, 9)
+        bookings = []
+        for pk in range(300):
+            start = base + datetime.timedelta(minutes=rng.randrange(0, 60 * 24 * 7, 15))
+            bookings.append(Booking('session', pk, start, start + datetime.timedelta(minutes=rng.choice([30, 60, 90])), ''))
+        tree = IntervalTree(bookings)
+        for _ in range(200):
+            start = base + datetime.timedelta(minutes=rng.randrange(0, 60 * 24 * 7, 5))
+            end = start + datetime.timedelta(minutes=rng.randrange(5, 240, 5))
+            expected = sorted((b for b in bookings if b.start < end and start < b.end), key=lambda b: (b.start, b.pk))
+            self.assertEqual(tree.overlapping(start, end), expected)
+
+    def test_coach_and_venue_conflicts(self):
+        first = make_session(self.group, self.day, venue=self.venue)
+        second = make_session(self.group, self.day, start=datetime.time(15, 45), venue=self.venue)
+        make_session(self.group, self.day, start=datetime.time(16, 0), venue=self.venue)  # Back to back is fine.
+        first.coaches_attending.add(self.coach)
+        second.coaches_attending.add(self.coach)
+        conflicts = build_conflict_index(self.day, self.day).session_conflicts(first, [self.coach.pk])
+        self.assertEqual([b.pk for b in conflicts['coaches'][self.coach.pk]], [second.pk])
+        self.assertEqual([b.pk for b in conflicts['venue']], [second.pk])
+
+    def test_session_generation_warns_about_double_bookings(self):
+        for i in range(2):
+            rule = ScheduledClass.objects.create(
+                school_group=SchoolGroup.objects.create(name=f'Group {i}'), day_of_week=0,
+                start_time=datetime.time(15, 0), default_duration_minutes=60,
+            )
+            rule.default_coaches.add(self.coach)
+        result = generate_sessions_for_rules(ScheduledClass.objects.all(), self.day, self.day)
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(len(result['conflicts']), 2)
+        self.assertIn('Alice is also booked for', result['conflicts'][0])
+
+
+class PendingAssessmentsTests(TestCase):
+    """Pending assessment counts and flags are computed in SQL; player lists load per session."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.now = timezone.make_aware(datetime.datetime(2025, 6, 11, 16, 30))
+        cls.today = cls.now.date()
+        cls.coach_user = User.objects.create_user('coach', 'coach@example.com', 'pw', is_staff=True)
+        cls.coach = Coach.objects.create(user=cls.coach_user, name='Coach One')
+        cls.group = SchoolGroup.objects.create(name='U19 A')
+        cls.players = [Player.objects.create(first_name=f'Player{i}', last_name='Test') for i in range(3)]
+        cls.ended = make_session(cls.group, cls.today, start=datetime.time(15, 0))      # ends 16:00
+        cls.running = make_session(cls.group, cls.today, start=datetime.time(16, 0))    # ends 17:00
+        cls.yesterday = make_session(cls.group, cls.today - datetime.timedelta(days=1), start=datetime.time(23, 30))
+        for session in (cls.ended, cls.running, cls.yesterday):
+            session.coaches_attending.add(cls.coach)
+            session.attendees.set(cls.players)
+        SessionAssessment.objects.create(session=cls.ended, player=cls.players[0], submitted_by=cls.coach_user)
+
+    def test_ended_is_decided_in_sql(self):
+        ended = set(Session.objects.ended(self.now))
+        self.assertEqual(ended, {self.ended, self.yesterday})
+
+    def test_counts_and_flags(self):
+        items = build_pending_items(get_pending_assessment_sessions(self.coach, self.now))
+        by_session = {item['session']: item for item in items}
+        self.assertEqual(set(by_session), {self.ended, self.yesterday})
+        self.assertEqual(by_session[self.ended]['players_to_assess_count'], 2)
+        self.assertTrue(by_session[self.ended]['coach_can_mark_player_assessments_complete'])
+        self.assertFalse(by_session[self.yesterday]['coach_can_mark_player_assessments_complete'])
+        self.assertEqual(
+            get_players_to_assess(self.ended, self.coach_user), self.players[1:]
+        )
+
+    def test_page_query_count_does_not_grow_with_attendees(self):
+        recent = make_session(self.group, timezone.localdate() - datetime.timedelta(days=1))
+        recent.coaches_attending.add(self.coach)
+        recent.attendees.set(self.players)
+        self.client.force_login(self.coach_user)
+        url = reverse('planning:pending_assessments')
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        recent.attendees.add(*[Player.objects.create(first_name=f'Extra{i}', last_name='Test') for i in range(10)])
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url)
+        self.assertEqual(len(before), len(after))
+        self.assertContains(response, reverse('planning:pending_assessment_players', args=[recent.pk]))
+
+    def test_players_endpoint_is_limited_to_own_sessions(self):
+        self.client.force_login(self.coach_user)
+        response = self.client.get(reverse('planning:pending_assessment_players', args=[self.ended.pk]))
+        self.assertEqual(response.json()['count'], 2)
+        other = make_session(self.group, self.today)
+        response = self.client.get(reverse('planning:pending_assessment_players', args=[other.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+class AssessmentLedgerTests(TestCase):
+    """The ledger follows assignments, attendance and assessments, and can be rebuilt."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.coach_user = User.objects.create(username='coach', is_staff=True)
+        cls.coach = Coach.objects.create(user=cls.coach_user, name='Coach One')
+        cls.group = SchoolGroup.objects.create(name='U19 A')
+        cls.players = [Player.objects.create(first_name=f'Player{i}', last_name='Test') for i in range(3)]
+
+    def entry(self, session):
+        return CoachAssessmentLedger.objects.get(coach=self.coach, session=session)
+
+    def test_maintained_by_signals(self):
+        session = make_session(self.group, datetime.date(2025, 6, 11))
+        session.coaches_attending.add(self.coach)
+        session.attendees.set(self.players)
+        entry = self.entry(session)
+        self.assertEqual((entry.expected_player_count, entry.assessed_player_count), (3, 0))
+        self.assertEqual(entry.session_ends_at, session.end_datetime)
+
+        SessionAssessment.objects.create(session=session, player=self.players[0], submitted_by=self.coach_user)
+        GroupAssessment.objects.create(session=session, assessing_coach=self.coach_user)
+        CoachSessionCompletion.objects.create(coach=self.coach, session=session, assessments_submitted=True)
+        entry = self.entry(session)
+        self.assertEqual(entry.players_to_assess_count, 2)
+        self.assertTrue(entry.group_assessment_done)
+        self.assertTrue(entry.assessments_submitted)
+
+        session.is_cancelled = True
+        session.save()
+        self.assertTrue(self.entry(session).is_cancelled)
+
+        self.coach.coached_sessions.clear()
+        self.assertFalse(CoachAssessmentLedger.objects.exists())
+
+    def test_bulk_staffing_updates_ledger(self):
+        session = make_session(self.group, datetime.date(2025, 6, 11))
+        apply_staffing_changes([{'session_id': session.pk, 'add': [self.coach.pk]}])
+        self.assertTrue(CoachAssessmentLedger.objects.filter(session=session).exists())
+        apply_staffing_changes([{'session_id': session.pk, 'coach_ids': []}])
+        self.assertFalse(CoachAssessmentLedger.objects.filter(session=session).exists())
+
+    def test_rebuild_repairs_drift(self):
+        session = make_session(self.group, datetime.date(2025, 6, 11))
+        session.coaches_attending.add(self.coach)
+        session.attendees.set(self.players)
+        CoachAssessmentLedger.objects.update(expected_player_count=0)
+        orphan = make_session(self.group, datetime.date(2025, 6, 12))
+        CoachAssessmentLedger.objects.create(
+            coach=self.coach, session=orphan, session_date=orphan.session_date, session_ends_at=orphan.end_datetime
+        )
+        self.assertEqual(rebuild_assessment_ledger(), (0, 1, 1))
+        self.assertEqual(self.entry(session).expected_player_count, 3)
+        self.assertEqual(rebuild_assessment_ledger(), (0, 0, 0))
+
+    def test_migration_backfill_matches_rebuild(self):
+        backfill = import_module('planning.migrations.0045_backfill_assessment_ledger').backfill_assessment_ledger
+        session = make_session(self.group, datetime.date(2025, 6, 11))
+        session.coaches_attending.add(self.coach)
+        session.attendees.set(self.players)
+        SessionAssessment.objects.create(session=session, player=self.players[0], submitted_by=self.coach_user)
+        GroupAssessment.objects.create(session=session, assessing_coach=self.coach_user)
+        fields = ('coach_id', 'session_id', 'session_date', 'session_ends_at', 'is_cancelled',
+                  'expected_player_count', 'assessed_player_count', 'group_assessment_done', 'assessments_submitted')
+        maintained = list(CoachAssessmentLedger.objects.values_list(*fields))
+
+        CoachAssessmentLedger.objects.all().delete()
+        backfill(django_apps, None)
+        self.assertEqual(list(CoachAssessmentLedger.objects.values_list(*fields)), maintained)
+
+
+class BulkAssessmentTests(TestCase):
+    """A whole session's assessments are validated together and written in bulk."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.coach_user = User.objects.create(username='coach', is_staff=True)
+        cls.coach = Coach.objects.create(user=cls.coach_user, name='Coach One')
+        cls.group = SchoolGroup.objects.create(name='U19 A')
+        cls.players = [Player.objects.create(first_name=f'Player{i}', last_name='Test') for i in range(3)]
+        cls.session = make_session(cls.group, datetime.date(2025, 6, 11))
+        cls.session.coaches_attending.add(cls.coach)
+        cls.session.attendees.set(cls.players[:2])
+
+    def setUp(self):
+        self.client.force_login(self.coach_user)
+        self.url = reverse('planning:session_assessments_bulk_api', args=[self.session.pk])
+
+    def post(self, assessments, **extra):
+        return self.client.post(
+            self.url, json.dumps({'assessments': assessments, **extra}), content_type='application/json'
+        )
+
+    def test_creates_updates_and_marks_complete(self):
+        SessionAssessment.objects.create(session=self.session, player=self.players[0], submitted_by=self.coach_user, effort_rating=1)
+        response = self.post([
+            {'player_id': self.players[0].pk, 'effort_rating': 5},
+            {'player_id': self.players[1].pk, 'focus_rating': 4, 'coach_notes': 'Good'},
+        ], mark_complete=True)
+        self.assertEqual(response.json(), {'status': 'success', 'created': 1, 'updated': 1})
+        self.assertEqual(SessionAssessment.objects.get(player=self.players[0]).effort_rating, 5)
+        entry = CoachAssessmentLedger.objects.get(coach=self.coach, session=self.session)
+        self.assertEqual(entry.assessed_player_count, 2)
+        self.assertTrue(entry.assessments_submitted)
+
+    def test_invalid_rows_write_nothing(self):
+        response = self.post([
+            {'player_id': self.players[0].pk, 'effort_rating': 4},
+            {'player_id': self.players[1].pk, 'effort_rating': 9},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.players[1].pk), response.json()['errors'])
+        response = self.post([{'player_id': self.players[2].pk, 'effort_rating': 4}])  # Did not attend.
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(SessionAssessment.objects.exists())
+
+    def test_page_formset(self):
+        url = reverse('planning:bulk_assess_session', args=[self.session.pk])
+        self.assertContains(self.client.get(url), 'Player1')
+        data = {'assessments-TOTAL_FORMS': '2', 'assessments-INITIAL_FORMS': '2'}
+        for index, player in enumerate(self.players[:2]):
+            data[f'assessments-{index}-player_id'] = player.pk
+            data[f'assessments-{index}-effort_rating'] = 3
+        self.assertRedirects(self.client.post(url, data), reverse('planning:pending_assessments'))
+        self.assertEqual(SessionAssessment.objects.filter(session=self.session).count(), 2)
+
+
+class PlayerAnalyticsSnapshotTests(TestCase):
+    """The player profile reads a precomputed snapshot kept current by signals."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        cls.group = SchoolGroup.objects.create(name='U19 A')
+        cls.player = Player.objects.create(first_name='Sam', last_name='Test')
+        cls.player.school_groups.add(cls.group)
+        PlayerGroupMembership.objects.update(start_date=datetime.date(2025, 1, 1))
+        cls.sessions = [make_session(cls.group, datetime.date(2025, 6, day)) for day in (2, 3, 4, 5)]
+
+    def test_metrics_update_incrementally(self):
+        snapshot = get_player_snapshot(self.player)
+        self.assertEqual(snapshot.metric_summary['sprint'], {})
+        CourtSprintRecord.objects.create(player=self.player, date_recorded=datetime.date(2025, 6, 2), duration_choice='3m', score=10)
+        CourtSprintRecord.objects.create(player=self.player, date_recorded=datetime.date(2025, 6, 9), duration_choice='3m', score=8)
+        snapshot.refresh_from_db()
+        self.assertEqual(snapshot.metric_summary['sprint']['3m']['best']['value'], 10)
+        self.assertEqual(snapshot.metric_summary['sprint']['3m']['latest']['value'], 8)
+
+    def test_attendance_is_refreshed_when_stale(self):
+        snapshot = get_player_snapshot(self.player)
+        self.assertEqual((snapshot.attended_sessions_count, snapshot.relevant_sessions_count), (0, 4))
+        self.sessions[0].attendees.add(self.player)
+        snapshot.refresh_from_db()
+        self.assertIsNone(snapshot.attendance_computed_on)
+        snapshot = get_player_snapshot(self.player)
+        self.assertEqual(snapshot.attendance_percentage, 25)
+
+    def test_attendance_outside_memberships_is_not_counted(self):
+        other_group = SchoolGroup.objects.create(name='U15')
+        self.player.attended_sessions.add(
+            *self.sessions,
+            make_session(other_group, datetime.date(2025, 6, 2)),
+            make_session(self.group, datetime.date(2024, 12, 2)),  # Before they joined.
+        )
+        snapshot = get_player_snapshot(self.player, today=datetime.date(2025, 6, 30))
+        self.assertEqual(
+            (snapshot.attended_sessions_count, snapshot.relevant_sessions_count, snapshot.attendance_percentage),
+            (4, 4, 100)
+        )
+
+    def test_profile_query_count_does_not_grow_with_records(self):
+        self.client.force_login(self.superuser)
+        url = reverse('planning:player_profile', args=[self.player.pk])
+        self.client.get(url)  # Builds the snapshot.
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        for day in range(1, 28):
+            VolleyRecord.objects.create(player=self.player, date_recorded=datetime.date(2025, 5, day), shot_type='FH', consecutive_count=day)
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url)
+        self.assertEqual(len(before), len(after))
+        volleys = response.context['volleys']
+        self.assertEqual(len(volleys), PLAYER_PROFILE_RECENT_ITEMS)
+        self.assertEqual(volleys[0]['date'], datetime.date(2025, 5, 27))
+        self.assertTrue(response.context['more_volleys'])
+        self.assertFalse(response.context['more_sprints'])
+
+
+class ChartDataTests(TestCase):
+    """Chart series are filtered by date in SQL and downsampled before they are sent."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.coach_user = User.objects.create(username='coach', is_staff=True)
+        cls.player = Player.objects.create(first_name='Sam', last_name='Test')
+        start = datetime.date(2020, 1, 1)
+        VolleyRecord.objects.bulk_create([
+            VolleyRecord(player=cls.player, date_recorded=start + datetime.timedelta(days=i), shot_type='FH', consecutive_count=i % 50)
+            for i in range(1000)
+        ])
+
+    def test_lttb_keeps_endpoints_and_peaks(self):
+        points = [(datetime.date(2020, 1, 1) + datetime.timedelta(days=i), 0) for i in range(100)]
+        points[50] = (points[50][0], 99)
+        sampled = lttb(points, 10)
+        self.assertEqual(len(sampled), 10)
+        self.assertEqual((sampled[0], sampled[-1]), (points[0], points[-1]))
+        self.assertIn(points[50], sampled)
+
+    def test_bucket_downsample(self):
+        points = [(i, float(i)) for i in range(10)]
+        self.assertEqual(bucket_downsample(points, 2), [(0, 2.0, 0.0, 4.0), (5, 7.0, 5.0, 9.0)])
+
+    def test_api_filters_and_downsamples(self):
+        self.client.force_login(self.coach_user)
+        url = reverse('planning:player_chart_data', args=[self.player.pk, 'volley'])
+        data = self.client.get(url, {'max_points': 100}).json()
+        self.assertEqual(data['total_points'], 1000)
+        self.assertEqual(len(data['series']['FH']['data']), 100)
+        data = self.client.get(url, {'start': '2020-01-01', 'end': '2020-01-10', 'method': 'bucket'}).json()
+        self.assertEqual(data['total_points'], 10)
+        self.assertEqual(data['series']['FH']['data'], [float(i) for i in range(10)])
+        self.assertEqual(self.client.get(url, {'max_points': 1}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('planning:player_chart_data', args=[self.player.pk, 'nope'])).status_code, 404)
+
+
+class PlayerSearchTests(TestCase):
+    """Player search uses the database index and supports prefix, substring and fuzzy matches."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.coach_user = User.objects.create(username='coach', is_staff=True)
+        cls.john = Player.objects.create(first_name='John', last_name='Smith')
+        cls.joanna = Player.objects.create(first_name='Joanna', last_name='Jones')
+        cls.retired = Player.objects.create(first_name='Johnny', last_name='Smithers', is_active=False)
+
+    def names(self, query, **kwargs):
+        return [player.full_name for player in search_players(query, **kwargs)]
+
+    def test_prefix_substring_and_fuzzy(self):
+        self.assertEqual(self.names('jo'), ['Joanna Jones', 'John Smith', 'Johnny Smithers'])
+        self.assertEqual(self.names('mith', players=Player.objects.filter(is_active=True)), ['John Smith'])
+        self.assertEqual(self.names('smitt', players=Player.objects.filter(is_active=True)), ['John Smith'])
+        self.assertEqual(self.names('smith john')[0], 'John Smith')
+        self.assertEqual(self.names('zzz'), [])
+
+    def test_index_follows_changes(self):
+        self.john.last_name = 'Brown'
+        self.john.save()
+        self.assertEqual(self.names('brown'), ['John Brown'])
+        self.joanna.delete()
+        self.assertEqual(self.names('joanna'), [])
+
+    def test_only_name_changes_reindex(self):
+        player = Player.objects.get(pk=self.john.pk)
+        with mock.patch('planning.signals.index_player') as index_player:
+            player.save(update_fields=['photo_status'])
+            player.is_active = False
+            player.save()
+            index_player.assert_not_called()
+            player.first_name = 'Jon'
+            player.save(update_fields=['first_name'])
+            index_player.assert_called_once_with(player)
+
+    def test_typeahead_endpoint(self):
+        self.client.force_login(self.coach_user)
+        response = self.client.get(reverse('planning:player_search'), {'q': 'smith'})
+        self.assertEqual([result['id'] for result in response.json()['results']], [self.john.pk])
+
+    def test_filter_applies_before_the_limit(self):
+        Player.objects.bulk_create([
+            Player(first_name=f'Ann{i}', last_name='Smith', is_active=False) for i in range(12)
+        ])
+        rebuild_search_index()
+        active = Player.objects.filter(is_active=True)
+        self.assertEqual(self.names('smith', limit=2, players=active), ['John Smith'])
+        maxi = Player.objects.create(first_name='Maximiliana-Christabel', last_name='Smith')
+        self.assertEqual(self.names('smith', limit=2, players=active), ['John Smith', maxi.full_name])
+
+    def test_search_uses_the_index_on_many_players(self):
+        Player.objects.bulk_create([
+            Player(first_name=f'First{i}', last_name=f'Surname{i % 997}') for i in range(10000)
+        ])
+        rebuild_search_index()
+        with CaptureQueriesContext(connection) as queries:
+            results = search_players('surname123', limit=10)
+        # One index lookup and one fetch of the matched players, however many players there are.
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(all('Surname123' in player.last_name for player in results))
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "EXPLAIN QUERY PLAN SELECT rowid FROM planning_player_search "
+                    "WHERE planning_player_search MATCH '\"surname123\"' ORDER BY rank LIMIT 10"
+                )
+                plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+            self.assertIn('VIRTUAL TABLE INDEX', plan)
+
+
+class KeysetPaginationTests(TestCase):
+    """Session and player lists page by keyset: full coverage, stable order, constant cost."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        cls.group = SchoolGroup.objects.create(name='U13')
+        day = datetime.date(2024, 3, 1)
+        # Several sessions share a date and start time, so the id has to break ties.
+        cls.sessions = [
+            make_session(cls.group, day - datetime.timedelta(days=i // 3), start=datetime.time(15, 0))
+            for i in range(60)
+        ]
+
+    def walk(self, paginator):
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen.extend(page)
+            if not page.has_next:
+                return seen
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_row_once_in_order(self):
+        paginator = KeysetPaginator(Session.objects.all(), ('-session_date', '-session_start_time', '-id'), 7)
+        expected = list(Session.objects.order_by('-session_date', '-session_start_time', '-id'))
+        self.assertEqual(self.walk(paginator), expected)
+
+    def test_cursor_keeps_sub_millisecond_datetimes(self):
+        base = timezone.make_aware(datetime.datetime(2024, 3, 1, 16, 0, 0, 500))
+        # Later rows are earlier in time, all within one millisecond, so only the exact
+        # datetime places a row.
+        for i in range(6):
+            GroupAssessment.objects.create(
+                session=self.sessions[0], assessment_datetime=base - datetime.timedelta(microseconds=100 * i)
+            )
+        paginator = KeysetPaginator(GroupAssessment.objects.all(), ('-assessment_datetime', '-id'), 2)
+        self.assertEqual(self.walk(paginator), list(GroupAssessment.objects.order_by('-assessment_datetime', '-id')))
+
+    def test_previous_cursor_returns_the_page_before(self):
+        paginator = KeysetPaginator(Session.objects.all(), ('-session_date', '-session_start_time', '-id'), 7)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        self.assertEqual(list(paginator.page(second.previous_cursor)), list(first))
+        self.assertFalse(first.has_previous)
+        self.assertEqual(list(paginator.page('not-a-cursor')), list(first))
+
+    def test_session_list_json_and_constant_queries(self):
+        self.client.force_login(self.admin)
+        url = reverse('planning:session_list')
+        data = self.client.get(url, {'format': 'json'}).json()
+        self.assertEqual(data['count'], 25)
+        with CaptureQueriesContext(connection) as first_page:
+            self.client.get(url, {'format': 'json'})
+        with CaptureQueriesContext(connection) as last_page:
+            data = self.client.get(url, {'format': 'json', 'cursor': data['next_cursor']}).json()
+            data = self.client.get(url, {'format': 'json', 'cursor': data['next_cursor']}).json()
+        self.assertEqual(data['count'], 10)
+        self.assertIsNone(data['next_url'])
+        self.assertEqual(len(last_page) // 2, len(first_page))
+
+    def test_coach_profile_sections_are_paged(self):
+        coach = Coach.objects.create(user=self.admin, name='Admin Coach')
+        for session in self.sessions:
+            session.coaches_attending.add(coach)
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('planning:my_coach_profile'))
+        self.assertEqual(response.context['section_counts']['sessions'], 60)
+        self.assertEqual(response.context['total_hours_coached'], 60)
+        data = self.client.get(reverse('planning:my_coach_profile'), {
+            'format': 'json', 'section': 'sessions',
+            'sessions_cursor': response.context['sessions_attended'].next_cursor,
+        }).json()
+        self.assertEqual(data['count'], 20)
+        self.assertIn('sessions_cursor=', data['next_url'])
+
+
+class GroupAttendanceTests(TestCase):
+    """Group profile attendance comes from one grouped query over the attendees table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = SchoolGroup.objects.create(name='U15')
+        cls.alice = Player.objects.create(first_name='Alice', last_name='A')
+        cls.bob = Player.objects.create(first_name='Bob', last_name='B')
+        cls.alice.school_groups.add(cls.group)
+        cls.bob.school_groups.add(cls.group)
+        PlayerGroupMembership.objects.update(start_date=datetime.date(2023, 1, 1))
+        cls.now = timezone.make_aware(datetime.datetime(2024, 6, 3, 15, 30))
+        cls.today = cls.now.date()
+        cls.past = [make_session(cls.group, cls.today - datetime.timedelta(days=7 * i)) for i in range(1, 5)]
+        cls.running = make_session(cls.group, cls.today)  # 15:00-16:00, still on at 15:30.
+        make_session(cls.group, cls.today - datetime.timedelta(days=3), is_cancelled=True)
+        for session in cls.past:
+            session.attendees.add(cls.alice)
+        cls.past[0].attendees.add(cls.bob)
+        cls.running.attendees.add(cls.alice, cls.bob)
+
+    def test_counts_only_ended_sessions(self):
+        rows, average = group_attendance_summary(
+            self.group, [self.alice, self.bob], self.today - datetime.timedelta(days=90), self.today, now=self.now
+        )
+        by_name = {row['player'].first_name: row for row in rows}
+        self.assertEqual((by_name['Alice']['attended_sessions'], by_name['Alice']['total_group_sessions']), (4, 4))
+        self.assertEqual(by_name['Bob']['percentage'], 25)
+        self.assertEqual(average, 62.5)  # 5 attendances over 4 sessions of 2 players.
+
+    def test_query_count_does_not_grow_with_sessions(self):
+        start = self.today - datetime.timedelta(days=365)
+        with CaptureQueriesContext(connection) as before:
+            group_attendance_summary(self.group, [self.alice, self.bob], start, self.today, now=self.now)
+        for i in range(60):
+            make_session(self.group, self.today - datetime.timedelta(days=40 + i)).attendees.add(self.alice)
+        with CaptureQueriesContext(connection) as after:
+            rows, _ = group_attendance_summary(self.group, [self.alice, self.bob], start, self.today, now=self.now)
+        self.assertEqual(len(after), len(before))
+        self.assertEqual(rows[0]['attended_sessions'], 64)
+
+    def test_expected_sessions_follow_membership_history(self):
+        # Bob joined for the last two sessions; Alice left after the first three.
+        PlayerGroupMembership.objects.filter(player=self.bob).update(start_date=self.past[1].session_date)
+        PlayerGroupMembership.objects.filter(player=self.alice).update(end_date=self.past[1].session_date)
+        rows, average = group_attendance_summary(
+            self.group, [self.alice, self.bob], self.today - datetime.timedelta(days=90), self.today, now=self.now
+        )
+        by_name = {row['player'].first_name: row for row in rows}
+        self.assertEqual((by_name['Alice']['attended_sessions'], by_name['Alice']['total_group_sessions']), (3, 3))
+        self.assertEqual((by_name['Bob']['attended_sessions'], by_name['Bob']['total_group_sessions']), (1, 2))
+        self.assertEqual(average, 87.5)  # Sessions, oldest first: 1/1, 1/1, 1/2, 1/1 of those expected came.
+
+    def test_group_changes_are_recorded(self):
+        carol = Player.objects.create(first_name='Carol', last_name='C')
+        carol.school_groups.add(self.group)
+        self.group.players.remove(carol)
+        carol.school_groups.add(self.group)  # Rejoining the same day continues the membership.
+        membership = PlayerGroupMembership.objects.get(player=carol)
+        self.assertIsNone(membership.end_date)
+        carol.school_groups.clear()
+        membership.refresh_from_db()
+        self.assertEqual(membership.end_date, timezone.localdate())
+
+
+class AttendanceAnalyticsTests(TestCase):
+    """The players x sessions arrays and the figures derived from them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = SchoolGroup.objects.create(name='U17')
+        cls.alice = Player.objects.create(first_name='Alice', last_name='A')
+        cls.bob = Player.objects.create(first_name='Bob', last_name='B')
+        cls.carol = Player.objects.create(first_name='Carol', last_name='C')
+        for player in (cls.alice, cls.bob, cls.carol):
+            player.school_groups.add(cls.group)
+        PlayerGroupMembership.objects.update(start_date=datetime.date(2024, 1, 1))
+        cls.sessions = [make_session(cls.group, datetime.date(2024, 3, 4) + datetime.timedelta(weeks=i)) for i in range(6)]
+        PlayerGroupMembership.objects.filter(player=cls.carol).update(start_date=cls.sessions[3].session_date)
+        for i in (0, 1, 3, 4, 5):
+            cls.sessions[i].attendees.add(cls.alice)
+        for i in (0, 1):
+            cls.sessions[i].attendees.add(cls.bob)
+        cls.sessions[4].attendees.add(cls.carol)
+        SessionAssessment.objects.create(session=cls.sessions[0], player=cls.alice, effort_rating=4, focus_rating=2)
+        SessionAssessment.objects.create(session=cls.sessions[1], player=cls.alice, effort_rating=2)
+
+    def setUp(self):
+        self.analytics = AttendanceAnalytics(datetime.date(2024, 3, 1), datetime.date(2024, 4, 30))
+
+    def test_streaks_rates_and_dropout_risk(self):
+        analytics = self.analytics
+        self.assertEqual(analytics.attended.shape, (3, 6))
+        self.assertEqual(analytics.expected[2].tolist(), [False] * 3 + [True] * 3)
+        current, longest = analytics.streaks()
+        self.assertEqual(current.tolist(), [3, 0, 0])
+        self.assertEqual(longest.tolist(), [3, 2, 1])
+        self.assertEqual(analytics.trailing_misses().tolist(), [0, 4, 1])
+        self.assertEqual(analytics.dropout_risk(recent_sessions=4).tolist(), [0.25, 1.0, 2 / 3])
+        self.assertAlmostEqual(analytics.attendance_rate()[0], 5 / 6)
+        # Two-week windows: at the third session Alice had come to one of the last two.
+        self.assertEqual(analytics.rolling_attendance(days=14)[0, :3].tolist(), [1.0, 1.0, 0.5])
+        self.assertEqual(analytics.average_ratings()[0, :2].tolist(), [3.0, 2.0])
+        self.assertEqual(analytics.player_summary()[0]['player'], 'Bob B')
+
+    def test_exports(self):
+        archive = io.BytesIO()
+        self.analytics.save_npz(archive)
+        archive.seek(0)
+        loaded = np.load(archive)
+        self.assertEqual(loaded['attended'].tolist(), self.analytics.attended.tolist())
+        self.assertEqual(loaded['player_ids'].tolist(), [self.alice.pk, self.bob.pk, self.carol.pk])
+        output = io.StringIO()
+        self.analytics.write_attendance_csv(output)
+        carol_row = output.getvalue().splitlines()[3].split(',')
+        self.assertEqual(carol_row[2:], ['', '', '', '0', '1', '0'])
+
+
+class CalendarEventsFeedTests(TestCase):
+    """The calendar fetches the range it shows from a cached JSON feed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        cls.coach_user = User.objects.create(username='coach', is_staff=True)
+        cls.coach = Coach.objects.create(user=cls.coach_user, name='Coach One')
+        cls.group = SchoolGroup.objects.create(name='U11')
+        cls.players = [Player.objects.create(first_name=f'P{i}', last_name='X') for i in range(5)]
+        cls.march = [make_session(cls.group, datetime.date(2024, 3, day)) for day in (4, 11, 18)]
+        cls.april = make_session(cls.group, datetime.date(2024, 4, 1))
+        cls.march[0].coaches_attending.add(cls.coach)
+        cls.march[0].attendees.add(*cls.players)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('planning:session_calendar_events')
+        self.week = {'start': '2024-03-04T00:00:00+02:00', 'end': '2024-03-11T00:00:00+02:00'}
+
+    def test_range_and_visibility(self):
+        self.client.force_login(self.admin)
+        events = self.client.get(self.url, {'start': '2024-03-01', 'end': '2024-04-01'}).json()
+        self.assertEqual([event['id'] for event in events], [session.pk for session in self.march])
+        self.assertEqual(events[0]['extendedProps']['attendees_count'], 5)
+        self.assertEqual(events[0]['extendedProps']['coaches_attending'], ['Coach One'])
+        self.client.force_login(self.coach_user)
+        events = self.client.get(self.url, {'start': '2024-03-01', 'end': '2024-04-01'}).json()
+        self.assertEqual([event['id'] for event in events], [self.march[0].pk])
+        self.assertIsNone(events[0]['extendedProps']['admin_url'])
+        self.assertEqual(self.client.get(self.url, {'start': '2024-03-01', 'end': '2025-03-01'}).status_code, 400)
+
+    def test_cached_until_a_session_changes(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url, self.week)
+        with CaptureQueriesContext(connection) as cached:
+            again = self.client.get(self.url, self.week, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual([q for q in cached.captured_queries if 'planning_session' in q['sql']], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.march[0].attendees.remove(self.players[0])
+        events = self.client.get(self.url, self.week, HTTP_IF_NONE_MATCH=response['ETag']).json()
+        self.assertEqual(events[0]['extendedProps']['attendees_count'], 4)
+
+
+class CalendarSubscriptionFeedTests(TestCase):
+    """Token-authenticated .ics feeds are served from cache until the owner's sessions change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        cls.coach_user = User.objects.create(username='coach', is_staff=True)
+        cls.other_user = User.objects.create(username='other', is_staff=True)
+        cls.coach = Coach.objects.create(user=cls.coach_user, name='Coach One', email='one@example.com')
+        cls.other = Coach.objects.create(user=cls.other_user, name='Coach Two')
+        group = SchoolGroup.objects.create(name='U13')
+        today = timezone.localdate()
+        cls.mine = make_session(group, today + datetime.timedelta(days=3))
+        cls.theirs = make_session(group, today + datetime.timedelta(days=4))
+        make_session(group, today - datetime.timedelta(days=60))  # Outside the window.
+        cls.mine.coaches_attending.add(cls.coach)
+        cls.theirs.coaches_attending.add(cls.other)
+
+    def setUp(self):
+        cache.clear()
+
+    def feed_url(self, user, scope='mine'):
+        return reverse('planning:session_calendar_feed', args=[make_feed_token(user, scope)])
+
+    def test_token_scopes(self):
+        body = self.client.get(self.feed_url(self.coach_user)).content.decode()
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn(f'session-{self.mine.pk}@squashsync', body)
+        self.assertIn('mailto:one@example.com', body)
+        all_body = self.client.get(self.feed_url(self.admin, FEED_SCOPE_ALL)).content.decode()
+        self.assertEqual(all_body.count('BEGIN:VEVENT'), 2)
+        with self.assertRaises(ValueError):
+            make_feed_token(self.coach_user, FEED_SCOPE_ALL)
+        self.assertEqual(self.client.get(self.feed_url(self.coach_user)[:-5] + 'x.ics').status_code, 404)
+        url = self.feed_url(self.coach_user)
+        self.coach_user.set_password('changed')
+        self.coach_user.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_conditional_get_and_incremental_rebuild(self):
+        url = self.feed_url(self.coach_user)
+        response = self.client.get(url)
+        with CaptureQueriesContext(connection) as polled:
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            cached = self.client.get(url)
+        self.assertEqual((not_modified.status_code, since.status_code), (304, 304))
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual([q for q in polled.captured_queries if 'planning_session' in q['sql']], [])
+
+        # Another coach's session leaves this feed alone; one of its own rebuilds it.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.theirs.notes = 'Bring balls'
+            self.theirs.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.theirs.coaches_attending.add(self.coach)
+        rebuilt = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(rebuilt.status_code, 200)
+        self.assertEqual(rebuilt.content.decode().count('BEGIN:VEVENT'), 2)
+
+
+class ScheduleCsvExportTests(TestCase):
+    """CSV exports stream any date range with filters, without per-row queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        cls.coach_user = User.objects.create(username='coach', is_staff=True)
+        cls.coach = Coach.objects.create(user=cls.coach_user, name='Coach One')
+        cls.venue = Venue.objects.create(name='Main Courts')
+        cls.group = SchoolGroup.objects.create(name='U11')
+        other_group = SchoolGroup.objects.create(name='U15')
+        cls.player = Player.objects.create(first_name='Ann', last_name='Lee')
+        cls.sessions = [
+            make_session(cls.group, datetime.date(2023, 1, 2) + datetime.timedelta(weeks=week), start=datetime.time(23, 30), venue=cls.venue)
+            for week in range(60)
+        ]
+        make_session(other_group, datetime.date(2023, 6, 5), is_cancelled=True)
+        for session in cls.sessions:
+            session.coaches_attending.add(cls.coach)
+        cls.sessions[0].attendees.add(cls.player)
+        SessionAssessment.objects.create(session=cls.sessions[0], player=cls.player, effort_rating=4, submitted_by=cls.coach_user)
+        SessionAssessment.objects.create(session=cls.sessions[1], player=cls.player, is_hidden=True)
+
+    def export(self, user, **params):
+        self.client.force_login(user)
+        response = self.client.get(reverse('planning:export_schedule_csv'), params)
+        self.assertTrue(response.streaming)
+        return [line.split(',') for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_sessions_with_filters(self):
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.export(self.admin, start='2023-01-01', end='2024-12-31', group=self.group.pk, venue=self.venue.pk)
+        self.assertEqual(len(rows), 61)
+        self.assertEqual(rows[1], ['2023-01-02', 'Monday', '23:30 - 00:30', 'U11', 'Coach One', 'Main Courts', 'Scheduled'])
+        # One query for the sessions and one for their coaches, per chunk.
+        self.assertEqual(len([q for q in queries.captured_queries if 'planning_session' in q['sql']]), 2)
+        cancelled = self.export(self.admin, start='2023-01-01', end='2024-12-31', cancelled='only')
+        self.assertEqual([row[3] for row in cancelled[1:]], ['U15'])
+        self.assertEqual(len(self.export(self.admin, start='2023-01-01', end='2023-01-31', coach=self.coach.pk)), 6)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('planning:export_schedule_csv'), {'start': '2023-02-01', 'end': '2023-01-01'}).status_code, 400)
+
+    def test_attendance_and_assessments(self):
+        attendance = self.export(self.coach_user, kind='attendance', start='2023-01-01', end='2023-12-31')
+        self.assertEqual(attendance[1][3:], [str(self.sessions[0].pk), str(self.player.pk), 'Ann', 'Lee'])
+        self.assertEqual(len(self.export(self.coach_user, kind='assessments', start='2023-01-01', end='2023-12-31')), 2)
+        assessments = self.export(self.admin, kind='assessments', start='2023-01-01', end='2023-12-31')
+        self.assertEqual(len(assessments), 3)
+        self.assertEqual(assessments[1][4:7], ['Ann Lee', 'coach', '4'])
+
+
+class BulkAvailabilityTests(TestCase):
+    """A bulk availability submission is applied as one upsert, whatever the number of sessions."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='coach', is_staff=True)
+        Coach.objects.create(user=cls.user, name='Coach One')
+        cls.rules = []
+        for i in range(2):
+            group = SchoolGroup.objects.create(name=f'Group {i}')
+            cls.rules.append(ScheduledClass.objects.create(
+                school_group=group, day_of_week=i, start_time=datetime.time(15, 0), default_duration_minutes=60,
+            ))
+        cls.sessions = {
+            rule.pk: [
+                make_session(rule.school_group, datetime.date(2024, 3, 4 + rule.day_of_week) + datetime.timedelta(weeks=week), generated_from_rule=rule)
+                for week in range(4)
+            ]
+            for rule in cls.rules
+        }
+        cls.cancelled = make_session(cls.rules[0].school_group, datetime.date(2024, 3, 25), generated_from_rule=cls.rules[0], is_cancelled=True)
+        cls.april = make_session(cls.rules[0].school_group, datetime.date(2024, 4, 1), generated_from_rule=cls.rules[0])
+        cls.confirmed = CoachAvailability.objects.create(
+            coach=cls.user, session=cls.sessions[cls.rules[0].pk][0], is_available=False, last_action='DECLINE'
+        )
+
+    def test_submission_upserts_in_constant_queries(self):
+        self.client.force_login(self.user)
+        data = {
+            'month': 3, 'year': 2024,
+            f'availability_rule_{self.rules[0].pk}': 'EMERGENCY',
+            f'availability_rule_{self.rules[1].pk}': 'NO_CHANGE',
+        }
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('planning:set_bulk_availability'), data)
+        self.assertLessEqual(len([q for q in queries.captured_queries if 'coachavailability' in q['sql']]), 1)
+
+        rows = CoachAvailability.objects.filter(coach=self.user)
+        self.assertEqual(
+            set(rows.values_list('session_id', flat=True)), {session.pk for session in self.sessions[self.rules[0].pk]}
+        )
+        self.assertTrue(all(row.is_available and row.notes == 'Emergency only' for row in rows))
+        self.confirmed.refresh_from_db()
+        self.assertEqual((self.confirmed.is_available, self.confirmed.last_action), (True, 'DECLINE'))
+
+    def test_upsert_without_conflict_target(self):
+        # MySQL upserts on its unique keys and takes no ON CONFLICT target.
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(CoachAvailability.objects, 'bulk_create') as bulk_create:
+            count = apply_bulk_availability(
+                self.user, {self.rules[1].pk: 'AVAILABLE'}, datetime.date(2024, 3, 1), datetime.date(2024, 3, 31)
+            )
+        self.assertEqual(count, 4)
+        bulk_create.assert_called_once()
+        self.assertIsNone(bulk_create.call_args.kwargs['unique_fields'])
+        self.assertTrue(bulk_create.call_args.kwargs['update_conflicts'])
+
+    def test_rule_states_prefill_the_form(self):
+        first, second = self.rules
+        march = (datetime.date(2024, 3, 1), datetime.date(2024, 3, 31))
+        self.assertEqual(rule_availability_states(self.user, [first.pk, second.pk], *march), {first.pk: 'MIXED', second.pk: 'NONE'})
+        CoachAvailability.objects.bulk_create(
+            CoachAvailability(coach=self.user, session=session, is_available=True, notes='Emergency only')
+            for session in self.sessions[second.pk]
+        )
+        CoachAvailability.objects.bulk_create(
+            CoachAvailability(coach=self.user, session=session, is_available=False)
+            for session in self.sessions[first.pk][1:]
+        )
+        with self.assertNumQueries(1):
+            states = rule_availability_states(self.user, [first.pk, second.pk], *march)
+        self.assertEqual(states, {first.pk: 'UNAVAILABLE', second.pk: 'EMERGENCY'})
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('planning:set_bulk_availability'), {'year': 2024, 'month': 3})
+        self.assertContains(response, 'data-initial-status="EMERGENCY"')
+
+
+class ScheduleImportTests(TestCase):
+    """import_schedule plans the whole import from in-memory indexes and applies it in bulk."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = SchoolGroup.objects.create(name='U11')
+        cls.ann = Player.objects.create(first_name='Ann', last_name='Lee', grade=7)
+        for _ in range(2):
+            Player.objects.create(first_name='Bob', last_name='Smith')
+        ScheduledClass.objects.create(
+            school_group=cls.group, day_of_week=0, start_time=datetime.time(15, 0), default_duration_minutes=45
+        )
+
+    def setUp(self):
+        self.import_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.import_dir)
+        self.write('Mondays.csv', [
+            ('U11', '15:00', 'ann lee', 'Gr 8'),
+            ('U11', '15:00', 'Cara de Wit', '6'),
+            ('U13', '16:30', 'Cara de Wit', ''),
+            ('U13', '16:30', 'Bob Smith', '9'),
+            ('', '16:30', 'Dan Roe', '9'),
+        ])
+        self.write('Tuesdays.csv', [('U13', 'late', 'Ann Lee', '')])
+
+    def write(self, name, rows):
+        with open(os.path.join(self.import_dir, name), 'w', encoding='utf-8') as f:
+            f.write('school_group_name;session_start_time;player_first_name;player_grade\n')
+            f.writelines(';'.join(row) + '\n' for row in rows)
+
+    def run_import(self, *args):
+        out = io.StringIO()
+        call_command('import_schedule', '--dir', self.import_dir, *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_reports_without_writing(self):
+        output = self.run_import('--dry-run')
+        self.assertIn('+ player Cara de Wit (grade 6)', output)
+        self.assertIn('~ player Ann Lee: grade 7 -> 8', output)
+        self.assertIn('duration -> 60 min', output)
+        self.assertIn('Rows Skipped: 2', output)
+        self.assertFalse(SchoolGroup.objects.filter(name='U13').exists())
+        self.assertEqual(Player.objects.count(), 3)
+
+    def test_import_applies_in_bulk_and_is_idempotent(self):
+        with CaptureQueriesContext(connection) as queries:
+            output = self.run_import()
+        self.assertIn('Players Added To Groups: 4', output)
+        self.assertLess(len(queries.captured_queries), 25)
+
+        u13 = SchoolGroup.objects.get(name='U13')
+        cara = Player.objects.get(first_name='Cara', last_name='de Wit')
+        self.ann.refresh_from_db()
+        self.assertEqual(self.ann.grade, 8)
+        self.assertEqual(set(cara.school_groups.all()), {self.group, u13})
+        self.assertEqual(set(ScheduledClass.objects.values_list('default_duration_minutes', flat=True)), {60})
+        self.assertTrue(ScheduledClass.objects.filter(school_group=u13, day_of_week=0, start_time=datetime.time(16, 30)).exists())
+        self.assertEqual(PlayerGroupMembership.objects.filter(player=cara, end_date__isnull=True).count(), 2)
+        self.assertEqual([player.pk for player in search_players('cara')], [cara.pk])
+
+        again = self.run_import()
+        for stat in ('Groups Created', 'Players Created', 'Players Updated', 'Schedules Created', 'Players Added To Groups'):
+            self.assertIn(f'{stat}: 0', again)
+
+
+class ImportPipelineTests(TestCase):
+    """import_data streams files through row mappers in chunks and resumes from its checkpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = SchoolGroup.objects.create(name='U11')
+        ScheduledClass.objects.create(school_group=cls.group, day_of_week=0, start_time=datetime.time(15, 0))
+
+    def setUp(self):
+        self.import_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.import_dir)
+        self.checkpoint = os.path.join(self.import_dir, 'checkpoint.json')
+
+    def write(self, name, lines):
+        path = os.path.join(self.import_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        return path
+
+    def run_import(self, kind, *paths):
+        out = io.StringIO()
+        call_command('import_data', kind, *paths, '--checkpoint', self.checkpoint, '--chunk-size', '2', stdout=out)
+        return out.getvalue()
+
+    def test_players_attendance_and_tests(self):
+        players = self.write('players.csv', [
+            'first_name,last_name,grade,school_group',
+            'Ann,Lee,Gr 8,U11', 'Cara,de Wit,6,U11', 'ann,lee,9,', 'Dan,Roe,7,Nowhere',
+        ])
+        output = self.run_import('players', players)
+        self.assertIn('4 rows read, 5 written, 1 skipped', output)
+        self.assertIn("unknown school group 'Nowhere'", output)
+        ann = Player.objects.get(first_name='Ann')
+        self.assertEqual((ann.grade, list(ann.school_groups.all())), (9, [self.group]))
+        self.assertTrue(PlayerGroupMembership.objects.filter(player=ann, school_group=self.group).exists())
+
+        attendance = self.write('attendance.csv', [
+            'date;school_group;player', '2024-03-04;U11;Ann Lee', '04/03/2024;U11;Cara de Wit', '2024-03-05;U11;Ann Lee',
+        ])
+        output = self.run_import('attendance', attendance)
+        self.assertIn('no session of the group on 2024-03-05', output)
+        session = Session.objects.get(school_group=self.group, session_date=datetime.date(2024, 3, 4))
+        self.assertEqual(session.session_start_time, datetime.time(15, 0))
+        self.assertEqual(session.attendees.count(), 2)
+
+        tests = self.write('tests.csv', [
+            'date,player,test,type,value', '2024-03-04,Ann Lee,sprint,3m,14', '2024-03-04,Ann Lee,volley,fh,20',
+            '2024-03-04,Ann Lee,sprint,3m,14', '2024-03-04,Ann Lee,jump,x,1',
+        ])
+        self.assertIn('4 rows read, 2 written, 1 skipped', self.run_import('tests', tests))
+        self.assertEqual(list(ann.volley_records.values_list('shot_type', 'consecutive_count')), [('FH', 20)])
+
+    def test_resumes_from_checkpoint(self):
+        Player.objects.create(first_name='Ann', last_name='Lee')
+        path = self.write('attendance.csv', [
+            'date,school_group,player', '2024-03-04,U11,Ann Lee', '2024-03-11,U11,Ann Lee', '2024-03-18,U11,Ann Lee',
+        ])
+        # A run interrupted after its first chunk of two rows.
+        Checkpoint(self.checkpoint).record('attendance', path, 2)
+        output = self.run_import('attendance', path)
+        self.assertIn('1 rows read, 1 written, 0 skipped, resumed after row 3', output)
+        self.assertEqual(
+            list(Session.objects.filter(attendees__first_name='Ann').values_list('session_date', flat=True)),
+            [datetime.date(2024, 3, 18)]
+        )
+        self.assertIn('already imported', self.run_import('attendance', path))
+
+    def test_interrupted_chunks_refresh_derived_data(self):
+        ann = Player.objects.create(first_name='Ann', last_name='Lee')
+        snapshot = get_player_snapshot(ann)
+        path = self.write('attendance.csv', [
+            'date,school_group,player', '2024-03-04,U11,Ann Lee', '2024-03-11,U11,Ann Lee', '2024-03-18,U11,Ann Lee',
+        ])
+        write_chunk = AttendanceMapper.write_chunk
+        calls = []
+
+        def fail_second_chunk(mapper, items):
+            calls.append(items)
+            if len(calls) == 2:
+                raise RuntimeError("interrupted")
+            return write_chunk(mapper, items)
+
+        with mock.patch.object(AttendanceMapper, 'write_chunk', fail_second_chunk):
+            with self.assertRaises(RuntimeError):
+                run_import([('attendance', path)], self.checkpoint, chunk_size=2)
+        # The committed chunk already marked the attendance figures stale.
+        snapshot.refresh_from_db()
+        self.assertIsNone(snapshot.attendance_computed_on)
+        self.assertEqual(Checkpoint(self.checkpoint).get('attendance', path), (2, False))
+
+        get_player_snapshot(ann)
+        self.assertIn('resumed after row 3', self.run_import('attendance', path))
+        snapshot.refresh_from_db()
+        self.assertIsNone(snapshot.attendance_computed_on)
+        self.assertEqual(ann.attended_sessions.count(), 3)
+
+
+class PhotoRenditionTests(TestCase):
+    """Uploads only mark photos pending; the worker makes WebP and JPEG renditions and keeps the original."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, PHOTO_PROCESSING_IN_BACKGROUND=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.storage = Player._meta.get_field('photo').storage
+
+    def upload(self, name='ann.png', size=(800, 400), mode='RGBA'):
+        buffer = io.BytesIO()
+        PILImage.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_upload_is_processed_into_renditions(self):
+        upload = self.upload()
+        original = upload.read()
+        upload.seek(0)
+        player = Player.objects.create(first_name='Ann', last_name='Lee', photo=upload)
+        self.assertEqual(player.photo_status, PhotoStatus.PENDING)
+        self.assertEqual(photo_urls(player, 'card'), (None, player.photo.url))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(process_photo(Player, player.pk), PhotoStatus.READY)
+        self.assertEqual(len(queries), 3)
+        player.refresh_from_db()
+        self.assertEqual(player.photo_status, PhotoStatus.READY)
+        self.assertEqual(
+            {name: (entry['width'], entry['height']) for name, entry in player.photo_renditions.items()},
+            {'thumb': (160, 80), 'card': (320, 160), 'full': (800, 400)},
+        )
+        with self.storage.open(player.photo_renditions['thumb']['webp']) as f:
+            self.assertEqual(PILImage.open(f).format, 'WEBP')
+        with self.storage.open(player.photo.name) as f:
+            self.assertEqual(f.read(), original)
+
+        html = Template("{% load planning_extras %}{% photo_picture player 'thumb' 'player-photo' %}").render(
+            Context({'player': player})
+        )
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('ann-thumb.jpg" alt="Photo of Ann Lee" class="player-photo"', html)
+        # Already processed: nothing to claim.
+        self.assertIsNone(process_photo(Player, player.pk))
+
+    def test_replacing_or_clearing_photo_drops_old_renditions(self):
+        coach = Coach.objects.create(name='Cara', profile_photo=self.upload('cara.png'))
+        process_photo(Coach, coach.pk)
+        coach.refresh_from_db()
+        old_files = [entry['jpeg'] for entry in coach.profile_photo_renditions.values()]
+
+        coach.profile_photo = self.upload('cara2.jpg', mode='RGB')
+        with self.captureOnCommitCallbacks(execute=True):
+            coach.save()
+        self.assertEqual((coach.profile_photo_status, coach.profile_photo_renditions), (PhotoStatus.PENDING, {}))
+        self.assertFalse(any(self.storage.exists(name) for name in old_files))
+
+        process_photo(Coach, coach.pk)
+        coach.refresh_from_db()
+        coach.profile_photo = None
+        with self.captureOnCommitCallbacks(execute=True):
+            coach.save(update_fields=['profile_photo'])
+        coach.refresh_from_db()
+        self.assertEqual((coach.profile_photo_status, coach.profile_photo_renditions), (PhotoStatus.NONE, {}))
+
+    def test_reassigned_file_is_reprocessed(self):
+        ann = Player.objects.create(first_name='Ann', last_name='Lee', photo=self.upload())
+        bob = Player.objects.create(first_name='Bob', last_name='Roe', photo=self.upload('bob.png', size=(100, 100)))
+        for player in (ann, bob):
+            process_photo(Player, player.pk)
+        ann = Player.objects.get(pk=ann.pk)
+        ann.photo = bob.photo.name
+        ann.save()
+        self.assertEqual((ann.photo_status, ann.photo_renditions), (PhotoStatus.PENDING, {}))
+        process_photo(Player, ann.pk)
+        ann.refresh_from_db()
+        self.assertEqual(ann.photo_renditions['full']['width'], 100)
+
+    def test_processing_rows_are_only_taken_over_when_abandoned(self):
+        player = Player.objects.create(first_name='Ann', last_name='Lee', photo=self.upload())
+        started = timezone.now()
+        Player.objects.filter(pk=player.pk).update(photo_status=PhotoStatus.PROCESSING, photo_status_updated_at=started)
+        out = io.StringIO()
+        call_command('process_photos', stdout=out)
+        self.assertIn('0 ready, 0 failed, 0 skipped', out.getvalue())
+        self.assertIsNone(process_photo(Player, player.pk, now=started + datetime.timedelta(minutes=5)))
+        self.assertEqual(
+            process_photo(Player, player.pk, now=started + datetime.timedelta(minutes=11)), PhotoStatus.READY
+        )
+
+    def test_command_processes_pending_and_reports_failures(self):
+        Player.objects.create(first_name='Ann', last_name='Lee', photo=self.upload())
+        broken = Player.objects.create(
+            first_name='Bob', last_name='Roe',
+            photo=SimpleUploadedFile('bob.png', b'not an image', content_type='image/png'),
+        )
+        out = io.StringIO()
+        call_command('process_photos', stdout=out)
+        self.assertIn('1 ready, 1 failed, 0 skipped', out.getvalue())
+        broken.refresh_from_db()
+        self.assertEqual((broken.photo_status, broken.photo_renditions), (PhotoStatus.FAILED, {}))
+        self.assertEqual(len(self.storage.listdir('player_photos/renditions')[1]), 6)
@@ -9,6 +9,7 @@ app_name = 'planning'
 urlpatterns = [
     # --- Homepage/Dashboard URL ---
     path('dashboard/', views.homepage_view, name='homepage'),
+    path('dashboard/panel/<str:panel>/', views.dashboard_panel_view, name='dashboard_panel'),
 
     # --- Existing Session List/Detail/Plan ---
     path('sessions/', views.session_list, name='session_list'),
@@ -28,6 +29,7 @@ urlpatterns = [
 
     # --- Player Profile & Data Entry ---
     path('players/', views.players_list_view, name='players_list'),
+    path('api/players/search/', views.player_search_api, name='player_search'),
     path('player/<int:player_id>/', views.player_profile, name='player_profile'),
     path('player/<int:player_id>/add_sprint/', views.add_sprint_record, name='add_sprint_record'),
     path('player/<int:player_id>/add_volley/', views.add_volley_record, name='add_volley_record'),
@@ -42,7 +44,11 @@ urlpatterns = [
     # +++ END NEW Coach Profile URLs +++
 
     # --- Session Assessment Add/Edit/Delete ---
+    path('api/player/<int:player_id>/chart/<str:metric>/', views.player_chart_data_api, name='player_chart_data'),
+    path('api/solo/<int:user_id>/chart/', views.solo_chart_data_api, name='solo_chart_data'),
     path('session/<int:session_id>/player/<int:player_id>/assess/', views.assess_player_session, name='assess_player_session'),
+    path('session/<int:session_id>/assess/', views.bulk_assess_session, name='bulk_assess_session'),
+    path('api/session/<int:session_id>/assessments/', views.session_assessments_bulk_api, name='session_assessments_bulk_api'),
     path('assessment/<int:assessment_id>/edit/', views.edit_session_assessment, name='edit_session_assessment'),
     path('assessment/<int:assessment_id>/delete/', views.delete_session_assessment, name='delete_session_assessment'),
 
@@ -53,6 +59,7 @@ urlpatterns = [
 
     # --- Pending Assessments Page & Actions ---
     path('assessments/pending/', views.pending_assessments_view, name='pending_assessments'),
+    path('assessments/pending/session/<int:session_id>/players/', views.pending_assessment_players_view, name='pending_assessment_players'),
     path('session/<int:session_id>/mark-assessments-complete/', views.mark_my_assessments_complete_for_session_view, name='mark_my_assessments_complete'),
 
     # +++ NEW: Group Assessment URLs +++
@@ -66,11 +73,16 @@ urlpatterns = [
     # --- Coach Availability Page & Related ---
     path('my-availability/', views.my_availability_view, name='my_availability'),
     path('session-staffing/', views.session_staffing_view, name='session_staffing'),
+    path('api/session-staffing/', views.session_staffing_matrix_api, name='session_staffing_matrix_api'),
+    path('api/session-staffing/bulk/', views.session_staffing_bulk_api, name='session_staffing_bulk_api'),
+    path('api/session-staffing/propose/', views.session_staffing_proposal_api, name='session_staffing_proposal_api'),
     path('coach-completion-report/', views.coach_completion_report_view, name='coach_completion_report'),
     
     # --- Session Calendar & Export ---
     path('sessions/calendar/', views.session_calendar_view, name='session_calendar'),
+    path('api/sessions/calendar/events/', views.session_calendar_events_api, name='session_calendar_events'),
     path('sessions/export-monthly-csv/', views.export_monthly_schedule_csv, name='export_monthly_schedule_csv'),
+    path('sessions/export-csv/', views.export_schedule_csv, name='export_schedule_csv'),
     
     # --- API Endpoints ---
     path('api/session/<int:session_id>/live_update/', live_views.live_session_update_api, name='live_session_update_api'),
@@ -97,4 +109,5 @@ urlpatterns = [
 
     # export calendar for google docs
     path('calendar/export/ics/', views.export_sessions_ics_view, name='export_sessions_ics'),
+    path('calendar/feed/<str:token>.ics', views.session_calendar_feed_view, name='session_calendar_feed'),
 ]
\ No newline at end of file
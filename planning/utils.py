@@ -124,4 +124,46 @@ def parse_grade_from_string(grade_str: str) -> int | None:
     numbers = re.findall(r'\d+', grade_str)
     if numbers:
         return int(numbers[0])
-    return None
\ No newline at end of file
+    return None
+
+class QueryTimer:
+    """
+    Context manager that counts and times every database query run inside it,
+    e.g. to report per-endpoint database cost in a Server-Timing header.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        import time
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+    def __enter__(self):
+        from django.db import connection
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
+
+
+def server_timing_header(**metrics) -> str:
+    """
+    Formats a Server-Timing header from name=(seconds, description) pairs,
+    e.g. server_timing_header(db=(0.012, "3 queries")) -> 'db;dur=12.0;desc="3 queries"'.
+    """
+    parts = []
+    for name, (seconds, description) in metrics.items():
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if description:
+            part += f';desc="{description}"'
+        parts.append(part)
+    return ", ".join(parts)
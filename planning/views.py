@@ -1,29 +1,59 @@
 # planning/views.py
 
 import json
-from datetime import datetime as dt_class, timedelta, date as date_obj, time 
+from datetime import timedelta, date as date_obj, time 
 from collections import defaultdict 
 import calendar 
+import hashlib
+import time as time_module
 
-from django.conf import settings 
 from django.contrib import messages
 from django.contrib.auth import get_user_model 
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.core.exceptions import FieldError, ObjectDoesNotExist 
-from django.db.models import Q, Prefetch, Count, Exists, OuterRef, Avg, F 
-from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, Http404 
+from django.core.exceptions import ObjectDoesNotExist 
+from django.core.paginator import Paginator
+from django.db.models import Prefetch, Count, Avg, F, Sum 
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, HttpResponseNotModified, Http404, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe
 from django.views.decorators.http import require_GET, require_POST 
+from django.middleware.csrf import get_token
 from .utils import get_weekly_session_data 
-import csv 
 from .notifications import verify_confirmation_token 
 from django.forms import inlineformset_factory
 from .live_session_utils import _calculate_skill_priority_groups
-from ics import Calendar, Event
-from .utils import get_month_start_end, get_month_choices, get_year_choices
+from .utils import get_month_start_end, get_month_choices, get_year_choices, QueryTimer, server_timing_header
 from .notifications import send_availability_change_alert_to_admins
+from .staffing_service import StaffingMatrix, StaffingChangeError, apply_staffing_changes, get_staffing_week
+from .staffing_solver import propose_staffing, proposal_as_json
+from .assessment_service import (
+    get_pending_assessment_sessions, build_pending_items, get_players_to_assess,
+    save_bulk_assessments, BulkAssessmentError, ASSESSMENT_FIELDS
+)
+from .assessment_ledger import ledger_for_period
+from .attendance_service import group_attendance_summary
+from .availability_service import (
+    bulk_statuses_from_post, apply_bulk_availability, rule_availability_states, STATE_NONE,
+)
+from .csv_export import parse_export_filters, export_rows, export_filename, stream_csv
+from .calendar_service import (
+    parse_range as parse_calendar_range, calendar_cache_key, get_calendar_events,
+    FEED_SCOPE_MINE, FEED_SCOPE_ALL, make_feed_token, user_for_feed_token, feed_state, get_feed_body, build_ics,
+)
+from .player_analytics import METRICS, get_player_snapshot, metric_rows, metric_summary_rows
+from .player_search import search_players
+from .pagination import KeysetPaginator
+from .chart_data import (
+    DEFAULT_MAX_POINTS, MAX_POINTS_LIMIT, DOWNSAMPLE_METHODS,
+    downsample_series, get_metric_series, get_solo_metric_series
+)
+from .dashboard_service import (
+    get_dashboard_role, get_coach_profile, get_dashboard_panels, get_dashboard_cache_keys,
+    render_dashboard_panel, DASHBOARD_CACHE_TIMEOUT, DASHBOARD_PAGE_TITLES
+)
 
 User = get_user_model()
 
@@ -48,11 +78,20 @@ except ImportError:
 from .forms import (
     AttendanceForm, ActivityAssignmentForm, SessionAssessmentForm,
     CoachFeedbackForm, CourtSprintRecordForm, VolleyRecordForm,
-    BackwallDriveRecordForm, MatchResultForm, GroupAssessmentForm, AttendancePeriodFilterForm, MonthYearFilterForm
+    BackwallDriveRecordForm, MatchResultForm, GroupAssessmentForm, AttendancePeriodFilterForm, MonthYearFilterForm,
+    BulkAssessmentRowForm, BulkAssessmentFormSet
 )
 
 from django import forms
 
+PLAYER_PROFILE_RECENT_ITEMS = 20
+PLAYER_PROFILE_ASSESSMENTS_PER_PAGE = 10
+PLAYER_LIST_SEARCH_LIMIT = 500
+LIST_PAGE_SIZE = 25
+SESSION_LIST_ORDERING = ('-session_date', '-session_start_time', '-id')
+PLAYER_LIST_ORDERING = ('last_name', 'first_name', 'id')
+COACH_PROFILE_PAGE_SIZE = 20
+
 class MonthYearSelectionForm(forms.Form):
     month = forms.ChoiceField()
     year = forms.ChoiceField()
@@ -170,6 +209,10 @@ def coach_completion_report_view(request):
     ).order_by(
         'session__session_date', 'session__session_start_time', 'coach__name'
     )
+    completion_records = list(completion_records)
+    ledger = ledger_for_period(start_date, end_date)
+    for record in completion_records:
+        record.ledger = ledger.get((record.coach_id, record.session_id))
     context = {
         'completion_records': completion_records, 
         'selected_year': target_year, 
@@ -186,142 +229,38 @@ def coach_completion_report_view(request):
 @login_required
 @user_passes_test(is_superuser, login_url='login') 
 def session_staffing_view(request):
-    # --- POST request handling remains the same ---
     if request.method == 'POST':
-        # ... (Your existing POST logic for updating assignments)
-        # No changes needed here for this feature
         session_id = request.POST.get('session_id')
-        assigned_coach_ids_str = request.POST.getlist(f'coaches_for_session_{session_id}')
         if not session_id: 
             messages.error(request, "Invalid request: Missing session ID.")
             return redirect('planning:session_staffing')
+        assigned_coach_ids = [cid for cid in request.POST.getlist(f'coaches_for_session_{session_id}') if cid.isdigit()]
         try:
-            session_to_update = get_object_or_404(Session, pk=int(session_id))
-            previously_assigned_coach_users = {coach.user for coach in session_to_update.coaches_attending.all() if coach.user}
-            selected_coaches_qs = Coach.objects.none() 
-            if assigned_coach_ids_str:
-                valid_coach_ids = [int(cid) for cid in assigned_coach_ids_str if cid.isdigit()]
-                if valid_coach_ids: 
-                    selected_coaches_qs = Coach.objects.filter(pk__in=valid_coach_ids)
-            session_to_update.coaches_attending.set(selected_coaches_qs) 
+            result = apply_staffing_changes([{'session_id': session_id, 'coach_ids': assigned_coach_ids}])
+            session_to_update = Session.objects.get(pk=int(session_id))
             messages.success(request, f"Coach assignments updated for session on {session_to_update.session_date.strftime('%d %b %Y')}.")
-            current_assigned_coach_users = {coach.user for coach in selected_coaches_qs if coach.user}
-            for coach_user_assigned in current_assigned_coach_users:
-                is_newly_assigned = coach_user_assigned not in previously_assigned_coach_users
-                existing_availability = CoachAvailability.objects.filter(coach=coach_user_assigned, session=session_to_update).first()
-                should_reset_availability = False
-                if is_newly_assigned and existing_availability: 
-                    if existing_availability.is_available is False: 
-                        should_reset_availability = True
-                elif not is_newly_assigned and existing_availability and existing_availability.is_available is False: 
-                    should_reset_availability = True
-                if should_reset_availability and existing_availability:
-                    existing_availability.delete()
-                    messages.info(request, f"Coach {coach_user_assigned.username}'s previous availability for session on {session_to_update.session_date.strftime('%d %b')} has been reset due to reassignment.")
-        except (ValueError, Session.DoesNotExist): 
+            for coach_user, session in result['availability_reset']:
+                messages.info(request, f"Coach {coach_user.username}'s previous availability for session on {session.session_date.strftime('%d %b')} has been reset due to reassignment.")
+        except (StaffingChangeError, Session.DoesNotExist): 
             messages.error(request, "Invalid session or data.")
         except Exception as e: 
             messages.error(request, f"An error occurred: {e}")
             print(f"Error in session_staffing_view POST: {e}")
         return redirect(f"{reverse('planning:session_staffing')}?week={request.GET.get('week', '0')}")
 
-
-    # --- GET request handling with week navigation and updated logic ---
-    now = timezone.now()
-    today = now.date()
-    
+    # --- GET request handling with week navigation ---
     try:
         week_offset = int(request.GET.get('week', '0'))
     except (ValueError, TypeError):
         week_offset = 0
 
-    start_of_this_week = today - timedelta(days=today.weekday())
-    target_week_start = start_of_this_week + timedelta(weeks=week_offset)
-    target_week_end = target_week_start + timedelta(days=6)
-
-    sessions_in_week_qs = Session.objects.filter(
-        session_date__gte=target_week_start,
-        session_date__lte=target_week_end,
-        is_cancelled=False
-    ).select_related('school_group', 'venue').prefetch_related(
-        'coaches_attending__user',
-        Prefetch(
-            'coach_availabilities',
-            queryset=CoachAvailability.objects.select_related('coach'),
-            to_attr='availability_details_for_session'
-        )
-    ).order_by('session_date', 'session_start_time')
-    
-    all_active_coaches = list(Coach.objects.filter(is_active=True).select_related('user').order_by('name'))
-    
-    # Group sessions by day
-    grouped_sessions = {i: [] for i in range(7)}
-    for session_obj in sessions_in_week_qs:
-        # Assigned Coaches logic (remains the same)
-        assigned_coaches_with_status = []
-        has_pending_confirmations_for_session = False
-        has_declined_coaches_for_session = False
-        for coach_profile_item in session_obj.coaches_attending.all():
-            # ... (your existing logic for assigned coaches)
-            coach_user_item = coach_profile_item.user
-            status = "Pending Response"; availability_notes = ""; is_confirmed = False; is_declined = False
-            if coach_user_item: 
-                for availability_detail in session_obj.availability_details_for_session:
-                    if availability_detail.coach_id == coach_user_item.id:
-                        if availability_detail.is_available is True: status = "Confirmed"; is_confirmed = True
-                        elif availability_detail.is_available is False: status = "Declined"; is_declined = True; has_declined_coaches_for_session = True
-                        availability_notes = availability_detail.notes; break
-                if status == "Pending Response": has_pending_confirmations_for_session = True
-            assigned_coaches_with_status.append({'coach_profile': coach_profile_item, 'status': status, 'is_confirmed': is_confirmed, 'is_declined': is_declined, 'notes': availability_notes})
-
-        # +++ UPDATED: Logic for Available Coaches +++
-        available_coaches_for_assignment_display = []
-        for avail_detail in session_obj.availability_details_for_session:
-            # We only care about coaches who have marked themselves as available
-            if avail_detail.is_available is not True:
-                continue
-
-            # Find the corresponding Coach profile instance
-            coach_instance = next((c for c in all_active_coaches if c.user and c.user.id == avail_detail.coach_id), None)
-            if not coach_instance:
-                continue
-
-            # Check for "Emergency only" note
-            is_emergency_only = "emergency" in avail_detail.notes.lower()
-
-            available_coaches_for_assignment_display.append({
-                'coach_profile': coach_instance,
-                'notes': avail_detail.notes,
-                'is_emergency_only': is_emergency_only
-            })
-        
-        # Sort the list: fully available first, then emergency only
-        available_coaches_for_assignment_display.sort(key=lambda x: x['is_emergency_only'])
-        # +++ END UPDATED Logic +++
-
-        session_data = {
-            'session_obj': session_obj,
-            'assigned_coaches_with_status': assigned_coaches_with_status,
-            'available_coaches_for_assignment': available_coaches_for_assignment_display,
-            'has_pending_confirmations': has_pending_confirmations_for_session,
-            'has_declined_coaches': has_declined_coaches_for_session
-        }
-        grouped_sessions[session_obj.session_date.weekday()].append(session_data)
-
-    day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    display_week = []
-    for i in range(5): # Monday to Friday
-        day_date = target_week_start + timedelta(days=i)
-        display_week.append({
-            'day_name': day_names[i],
-            'date': day_date,
-            'sessions': grouped_sessions.get(i, [])
-        })
+    target_week_start, target_week_end = get_staffing_week(week_offset)
+    matrix = StaffingMatrix(target_week_start, target_week_end)
 
     context = {
         'page_title': "Session Staffing",
-        'all_coaches_for_form': all_active_coaches,
-        'display_week': display_week,
+        'all_coaches_for_form': matrix.coaches,
+        'display_week': matrix.display_week(),
         'week_start': target_week_start,
         'week_end': target_week_end,
         'current_week_offset': week_offset,
@@ -330,6 +269,66 @@ def session_staffing_view(request):
     }
     return render(request, 'planning/session_staffing.html', context)
 
+@login_required
+@user_passes_test(is_superuser, login_url='login')
+@require_GET
+def session_staffing_matrix_api(request):
+    """The session staffing grid for one week as JSON, for client-side rendering."""
+    try:
+        week_offset = int(request.GET.get('week', '0'))
+    except (ValueError, TypeError):
+        return JsonResponse({'status': 'error', 'message': 'Invalid week offset.'}, status=400)
+    matrix = StaffingMatrix(*get_staffing_week(week_offset))
+    return JsonResponse(matrix.as_json())
+
+@login_required
+@user_passes_test(is_superuser, login_url='login')
+@require_POST
+def session_staffing_bulk_api(request):
+    """
+    Applies a whole week's staffing changes in one request and returns the updated grid.
+    Body: {"week": 0, "changes": [{"session_id": 1, "add": [2], "remove": [3]}, ...]};
+    a change may give "coach_ids" instead to replace a session's coaches outright.
+    """
+    try:
+        data = json.loads(request.body)
+        week_offset = int(data.get('week', 0))
+        result = apply_staffing_changes(data.get('changes', []))
+    except (json.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
+        # StaffingChangeError is a ValueError.
+        return JsonResponse({'status': 'error', 'message': f'Invalid data: {e}'}, status=400)
+
+    matrix = StaffingMatrix(*get_staffing_week(week_offset))
+    return JsonResponse({
+        'status': 'success',
+        'added': result['added'],
+        'removed': result['removed'],
+        'availability_reset': [
+            {'session_id': session.pk, 'coach_user_id': coach_user.pk}
+            for coach_user, session in result['availability_reset']
+        ],
+        'matrix': matrix.as_json(),
+    })
+
+@login_required
+@user_passes_test(is_superuser, login_url='login')
+@require_GET
+def session_staffing_proposal_api(request):
+    """
+    Proposes coaches for unstaffed sessions between ?start= and ?end= (YYYY-MM-DD).
+    Nothing is saved; the returned 'changes' can be posted to session_staffing_bulk_api.
+    """
+    try:
+        start = date_obj.fromisoformat(request.GET['start'])
+        end = date_obj.fromisoformat(request.GET['end'])
+        coaches_per_session = int(request.GET.get('coaches_per_session', 1))
+    except (KeyError, ValueError) as e:
+        return JsonResponse({'status': 'error', 'message': f'Invalid data: {e}'}, status=400)
+    if end < start or coaches_per_session < 1:
+        return JsonResponse({'status': 'error', 'message': 'Invalid date range or coach count.'}, status=400)
+
+    return JsonResponse(proposal_as_json(propose_staffing(start, end, coaches_per_session)))
+
 @login_required
 @user_passes_test(is_coach, login_url='login')
 def my_availability_view(request):
@@ -436,198 +435,62 @@ def my_availability_view(request):
 @login_required
 @user_passes_test(is_coach, login_url='login')
 def homepage_view(request):
-    now = timezone.now()
-    today = now.date()
-    user = request.user
-    coach_profile = None
-    
+    # The dashboard is a shell; each panel is fetched in parallel from dashboard_panel_view,
+    # so the page paints without waiting on any panel's queries.
+    role = get_dashboard_role(request.user)
     context = {
-        'upcoming_sessions': Session.objects.none(),
-        'recent_sessions_for_feedback': [], 
-        'recent_solo_logs': [],
-        'unstaffed_session_count': 0,
-        'all_coach_assessments': None, 
-        'recent_group_assessments': None,
-        'unconfirmed_staffing_alerts': [],
-        'sessions_for_direct_confirmation': [],
-        'page_title': "Dashboard",
-        'solosync_imported': 'solosync_api' in settings.INSTALLED_APPS # Pass flag to template
+        'page_title': DASHBOARD_PAGE_TITLES.get(role, "Dashboard"),
+        'dashboard_panels': get_dashboard_panels(request.user),
     }
+    if role == 'coach' and not get_coach_profile(request.user):
+        messages.warning(request, "Your user account is not linked to a Coach profile.")
 
-    upcoming_sessions_base_qs = Session.objects.filter(
-        Q(session_date__gt=today) | Q(session_date=today, session_start_time__gte=now.time()),
-        is_cancelled=False
-    ).select_related('school_group', 'venue').order_by('session_date', 'session_start_time')
-
-    if user.is_superuser:
-        context['page_title'] = "Admin Dashboard"
-        context['upcoming_sessions'] = upcoming_sessions_base_qs[:5]
-        
-        context['all_coach_assessments'] = SessionAssessment.objects.filter(
-            superuser_reviewed=False 
-        ).select_related(
-            'player', 'session', 'session__school_group', 'submitted_by', 'session__venue'
-        ).order_by('-date_recorded', '-session__session_date')[:20]
-
-        context['recent_group_assessments'] = GroupAssessment.objects.filter(
-            superuser_reviewed=False
-        ).select_related(
-            'session', 'session__school_group', 'assessing_coach', 'session__venue'
-        ).order_by('-assessment_datetime')[:10] 
-        
-        two_weeks_from_now = today + timedelta(weeks=2)
-        unstaffed_sessions = Session.objects.filter(
-            session_date__gte=today, 
-            session_date__lte=two_weeks_from_now, 
-            coaches_attending__isnull=True, 
-            is_cancelled=False
-        ).distinct()
-        context['unstaffed_session_count'] = unstaffed_sessions.count()
-        
-        critical_timeframe_end = now + timedelta(hours=48) 
-        sessions_needing_attention = Session.objects.filter(
-            session_date__gte=today, 
-            session_date__lte=critical_timeframe_end.date(), 
-            is_cancelled=False, 
-            coaches_attending__isnull=False 
-        ).prefetch_related(
-            'coaches_attending__user', 
-            Prefetch('coach_availabilities', queryset=CoachAvailability.objects.select_related('coach'), to_attr='all_coach_availabilities_for_session')
-        ).distinct()
-        
-        alerts = []
-        for session in sessions_needing_attention:
-            if session.session_date == critical_timeframe_end.date() and session.session_start_time > critical_timeframe_end.time(): 
-                continue
-            
-            unconfirmed_coaches_for_this_session = []
-            assigned_coaches_on_session = list(session.coaches_attending.all()) 
-            availability_map = {avail.coach.id: avail for avail in session.all_coach_availabilities_for_session}
-
-            for coach_profile_assigned in assigned_coaches_on_session:
-                coach_user_assigned = coach_profile_assigned.user
-                if not coach_user_assigned: 
-                    continue
-
-                availability_record = availability_map.get(coach_user_assigned.id)
-                
-                if not availability_record or availability_record.is_available is None: 
-                    status = "Pending Response"
-                    notes = availability_record.notes if availability_record else ""
-                    unconfirmed_coaches_for_this_session.append({'name': coach_user_assigned.get_full_name() or coach_user_assigned.username, 'status': status, 'notes': notes})
-                elif availability_record.is_available is False: 
-                    status = "Declined"
-                    notes = availability_record.notes
-                    unconfirmed_coaches_for_this_session.append({'name': coach_user_assigned.get_full_name() or coach_user_assigned.username, 'status': status, 'notes': notes})
-            
-            if unconfirmed_coaches_for_this_session: 
-                alerts.append({'session': session, 'unconfirmed_coaches': unconfirmed_coaches_for_this_session})
-        context['unconfirmed_staffing_alerts'] = alerts
-
-    elif user.is_staff: 
-        context['page_title'] = "Coach Dashboard"
-        try:
-            if hasattr(user, 'coach_profile') and user.coach_profile:
-                coach_profile = user.coach_profile
-            else:
-                coach_profile = Coach.objects.get(user=user)
-            
-            if coach_profile:
-                context['upcoming_sessions'] = upcoming_sessions_base_qs.filter(
-                    coaches_attending=coach_profile
-                )[:5]
-                
-                tomorrow = today + timedelta(days=1)
-                sessions_for_confirmation_qs = Session.objects.filter(
-                    session_date=tomorrow,
-                    coaches_attending=coach_profile,
-                    is_cancelled=False
-                ).select_related('school_group', 'venue').distinct().order_by('session_start_time')
-
-                sessions_for_direct_confirmation_list = []
-                for sess_confirm in sessions_for_confirmation_qs:
-                    current_avail = CoachAvailability.objects.filter(session=sess_confirm, coach=user).first()
-                    if not (current_avail and current_avail.is_available is True):
-                        sessions_for_direct_confirmation_list.append({
-                            'session': sess_confirm,
-                            'current_status_is_declined': current_avail.is_available is False if current_avail else False,
-                            'current_notes': current_avail.notes if current_avail else ""
-                        })
-                context['sessions_for_direct_confirmation'] = sessions_for_direct_confirmation_list
-                
-                date_limit_past_reminders = today - timedelta(weeks=4)
-
-                coached_ended_sessions = Session.objects.filter(
-                    coaches_attending=coach_profile,
-                    session_date__gte=date_limit_past_reminders,
-                    session_date__lte=today,
-                    is_cancelled=False
-                ).filter(
-                    Q(session_date__lt=today) | Q(session_date=today, session_start_time__lt=now.time())
-                ).select_related('school_group'
-                ).prefetch_related(
-                    'attendees',
-                    Prefetch(
-                        'session_assessments',
-                        queryset=SessionAssessment.objects.filter(submitted_by=user),
-                        to_attr='my_player_assessments_for_session'
-                    ),
-                    Prefetch(
-                        'group_assessments',
-                        queryset=GroupAssessment.objects.filter(assessing_coach=user),
-                        to_attr='my_group_assessment_for_session' 
-                    ),
-                    Prefetch( 
-                        'coach_completions',
-                        queryset=CoachSessionCompletion.objects.filter(coach=coach_profile, assessments_submitted=True),
-                        to_attr='coach_marked_player_assessments_complete'
-                    )
-                ).distinct().order_by('-session_date', '-session_start_time')
-
-                sessions_needing_any_feedback = []
-                for session in coached_ended_sessions:
-                    player_assessments_pending = False
-                    marked_complete_by_coach = bool(session.coach_marked_player_assessments_complete)
-
-                    if not marked_complete_by_coach:
-                        if session.attendees.exists():
-                            assessed_player_ids_for_this_coach = {
-                                sa.player_id for sa in session.my_player_assessments_for_session
-                            }
-                            for attendee in session.attendees.all():
-                                if attendee.id not in assessed_player_ids_for_this_coach:
-                                    player_assessments_pending = True
-                                    break
-                    
-                    group_assessment_done = bool(session.my_group_assessment_for_session)
-
-                    if player_assessments_pending or not group_assessment_done:
-                        sessions_needing_any_feedback.append(session)
-                        if len(sessions_needing_any_feedback) >= 5:
-                            break
-                
-                context['recent_sessions_for_feedback'] = sessions_needing_any_feedback
+    # Set the CSRF cookie here so the parallel panel requests all share one secret.
+    get_token(request)
+    return render(request, 'planning/homepage.html', context)
 
-        except Coach.DoesNotExist:
-            messages.warning(request, "Your user account is not linked to a Coach profile.")
-        except Exception as e: 
-            messages.error(request, f"Could not load dashboard data: {str(e)}")
-    
-    # --- CONSOLIDATED SoloSync Logic ---
-    # This block now runs for all authenticated users after the main dashboard logic
-    if context['solosync_imported']:
+@login_required
+@user_passes_test(is_coach, login_url='login')
+@require_GET
+def dashboard_panel_view(request, panel):
+    """
+    Returns one rendered dashboard panel as JSON {'panel', 'html'}.
+    The ETag follows the panel's cache key, so an unchanged panel costs the browser a 304,
+    and a Server-Timing header reports the database and total time spent on it.
+    """
+    started = time_module.perf_counter()
+    if panel not in get_dashboard_panels(request.user):
+        raise Http404("Unknown dashboard panel.")
+
+    # Cached panels embed CSRF tokens, so make sure the secret they were rendered for is
+    # the one this response will carry.
+    get_token(request)
+    cache_key = get_dashboard_cache_keys(
+        request.user, csrf_secret=request.META.get('CSRF_COOKIE', '')
+    )[panel]
+    # Time-dependent panels (e.g. "upcoming") may only be reused for one cache timeout.
+    time_bucket = int(time_module.time() // DASHBOARD_CACHE_TIMEOUT)
+    etag = '"%s"' % hashlib.md5(f"{panel}:{cache_key}:{time_bucket}".encode()).hexdigest()
+
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+        db = None
+    else:
         try:
-            from solosync_api.models import SoloSessionLog
-            context['recent_solo_logs'] = SoloSessionLog.objects.select_related(
-                'player', 'routine'
-            ).order_by('-completed_at')[:10]
-        except (ImportError, FieldError, Exception) as e:
-            # If there's any issue fetching logs, we just won't display them
-            print(f"Could not fetch SoloSessionLog for dashboard: {e}")
-            context['recent_solo_logs'] = [] # Ensure it's an empty list on error
-            context['solosync_imported'] = False # Set flag to false so template hides the card
-            
-    return render(request, 'planning/homepage.html', context)
+            with QueryTimer() as db:
+                html = render_dashboard_panel(request, panel, cache_key)
+        except Exception as e:
+            print(f"Error rendering dashboard panel '{panel}': {e}")
+            return JsonResponse({'panel': panel, 'error': "Could not load this panel."}, status=500)
+        response = JsonResponse({'panel': panel, 'html': html})
+
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    timings = {'total': (time_module.perf_counter() - started, panel)}
+    if db is not None:
+        timings['db'] = (db.duration, f"{db.count} queries")
+    response['Server-Timing'] = server_timing_header(**timings)
+    return response
 
 @login_required
 @user_passes_test(is_coach, login_url='login')
@@ -732,68 +595,104 @@ def delete_activity(request, activity_id):
 @user_passes_test(is_coach, login_url='login')
 def player_profile(request, player_id):
     player = get_object_or_404(Player.objects.prefetch_related('school_groups'), pk=player_id)
-    sessions_attended_qs = player.attended_sessions.filter(session_date__lte=timezone.now().date()).order_by('-session_date', '-session_start_time')
-    attended_sessions_count = sessions_attended_qs.count()
-    player_group_ids = player.school_groups.values_list('id', flat=True)
-    total_relevant_sessions_count = 0
-    attendance_percentage = None
-    if player_group_ids:
-        total_relevant_sessions_count = Session.objects.filter(
-            school_group_id__in=player_group_ids, 
-            session_date__lte=timezone.now().date()
-        ).count()
-        if total_relevant_sessions_count > 0:
-            attendance_percentage = round((attended_sessions_count / total_relevant_sessions_count) * 100)
-        elif attended_sessions_count == 0:
-            attendance_percentage = None 
-    
+    # Attendance, match totals and metric summaries come from one precomputed row
+    # (see planning/player_analytics.py); the charts load their series from the chart API.
+    snapshot = get_player_snapshot(player)
+    sessions_attended_qs = player.attended_sessions.filter(
+        session_date__lte=timezone.now().date()
+    ).select_related('school_group').order_by('-session_date', '-session_start_time')[:PLAYER_PROFILE_RECENT_ITEMS]
+
     assessments_base_qs = player.session_assessments_by_player.select_related(
         'session', 'session__school_group', 'submitted_by'
     ).order_by('-date_recorded', '-session__session_start_time')
     
     if request.user.is_superuser: 
-        assessments = assessments_base_qs.all()
+        assessments_qs = assessments_base_qs.all()
     elif request.user.is_staff: 
-        assessments = assessments_base_qs.filter(is_hidden=False)
+        assessments_qs = assessments_base_qs.filter(is_hidden=False)
     else: 
-        assessments = player.session_assessments_by_player.none() 
-    
-    sprints = player.sprint_records.select_related('session').order_by('date_recorded')
-    volleys = player.volley_records.select_related('session').order_by('date_recorded')
-    drives = player.drive_records.select_related('session').order_by('date_recorded')
-    matches = player.match_results.select_related('session').order_by('-date')
-
-    sprint_chart_data = defaultdict(lambda: {'labels': [], 'data': []})
-    for sprint in sprints: 
-        key = sprint.duration_choice
-        sprint_chart_data[key]['labels'].append(sprint.date_recorded.isoformat())
-        sprint_chart_data[key]['data'].append(sprint.score)
-
-    volley_chart_data = defaultdict(lambda: {'labels': [], 'data': []})
-    for volley in volleys: 
-        key = volley.shot_type
-        volley_chart_data[key]['labels'].append(volley.date_recorded.isoformat())
-        volley_chart_data[key]['data'].append(volley.consecutive_count)
-
-    drive_chart_data = defaultdict(lambda: {'labels': [], 'data': []})
-    for drive in drives: 
-        key = drive.shot_type
-        drive_chart_data[key]['labels'].append(drive.date_recorded.isoformat())
-        drive_chart_data[key]['data'].append(drive.consecutive_count)
+        assessments_qs = player.session_assessments_by_player.none() 
+    assessments = Paginator(assessments_qs, PLAYER_PROFILE_ASSESSMENTS_PER_PAGE).get_page(request.GET.get('assessments_page'))
+
+    matches = player.match_results.select_related('session').order_by('-date')[:PLAYER_PROFILE_RECENT_ITEMS]
+    sprint_labels = dict(CourtSprintRecord.DurationChoice.choices)
+    volley_labels = dict(VolleyRecord.ShotType.choices)
+    drive_labels = dict(BackwallDriveRecord.ShotType.choices)
+    sprints, more_sprints = metric_rows(player.pk, 'sprint', sprint_labels, PLAYER_PROFILE_RECENT_ITEMS)
+    volleys, more_volleys = metric_rows(player.pk, 'volley', volley_labels, PLAYER_PROFILE_RECENT_ITEMS)
+    drives, more_drives = metric_rows(player.pk, 'drive', drive_labels, PLAYER_PROFILE_RECENT_ITEMS)
 
     context = {
         'player': player, 'sessions_attended': sessions_attended_qs, 
-        'attended_sessions_count': attended_sessions_count, 
-        'total_relevant_sessions_count': total_relevant_sessions_count, 
-        'attendance_percentage': attendance_percentage, 'assessments': assessments, 
-        'sprints': sprints, 'volleys': volleys, 'drives': drives, 'matches': matches, 
-        'sprint_chart_data': dict(sprint_chart_data), 
-        'volley_chart_data': dict(volley_chart_data), 
-        'drive_chart_data': dict(drive_chart_data)
+        'attended_sessions_count': snapshot.attended_sessions_count, 
+        'total_relevant_sessions_count': snapshot.relevant_sessions_count, 
+        'attendance_percentage': snapshot.attendance_percentage, 'assessments': assessments, 
+        'sprints': sprints, 'more_sprints': more_sprints,
+        'volleys': volleys, 'more_volleys': more_volleys,
+        'drives': drives, 'more_drives': more_drives,
+        'sprint_summary': metric_summary_rows(snapshot, 'sprint', sprint_labels),
+        'volley_summary': metric_summary_rows(snapshot, 'volley', volley_labels),
+        'drive_summary': metric_summary_rows(snapshot, 'drive', drive_labels),
+        'matches': matches, 'match_count': snapshot.match_count,
+        'recent_items_limit': PLAYER_PROFILE_RECENT_ITEMS, 'chart_history_points': MAX_POINTS_LIMIT,
     }
     return render(request, 'planning/player_profile.html', context)
 
 
+def _chart_query_params(request):
+    """start, end, max_points and method from the query string; raises ValueError when invalid."""
+    start = date_obj.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+    end = date_obj.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    if start and end and end < start:
+        raise ValueError("end is before start")
+    max_points = int(request.GET.get('max_points', DEFAULT_MAX_POINTS))
+    if not 3 <= max_points <= MAX_POINTS_LIMIT:
+        raise ValueError(f"max_points must be between 3 and {MAX_POINTS_LIMIT}")
+    method = request.GET.get('method', 'lttb')
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"method must be one of {', '.join(DOWNSAMPLE_METHODS)}")
+    return start, end, max_points, method
+
+
+def _chart_response(series, max_points, method):
+    return JsonResponse({
+        'status': 'success',
+        'total_points': sum(len(points) for points in series.values()),
+        'series': downsample_series(series, max_points, method),
+    })
+
+
+@login_required
+@user_passes_test(is_coach, login_url='login')
+@require_GET
+def player_chart_data_api(request, player_id, metric):
+    """
+    Chart series for one of a player's metrics (sprint, volley or drive), optionally
+    limited to ?start=&end= (YYYY-MM-DD) and reduced to ?max_points= per series.
+    """
+    if metric not in METRICS:
+        raise Http404("Unknown metric.")
+    player = get_object_or_404(Player, pk=player_id)
+    try:
+        start, end, max_points, method = _chart_query_params(request)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': f'Invalid data: {e}'}, status=400)
+    return _chart_response(get_metric_series(player.pk, metric, start, end), max_points, method)
+
+
+@login_required
+@require_GET
+def solo_chart_data_api(request, user_id):
+    """Numeric SoloSync metrics of one user, in the same format; for superusers and the user themself."""
+    if not (request.user.is_superuser or request.user.pk == user_id):
+        return JsonResponse({'status': 'error', 'message': 'Permission denied.'}, status=403)
+    try:
+        start, end, max_points, method = _chart_query_params(request)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': f'Invalid data: {e}'}, status=400)
+    return _chart_response(get_solo_metric_series(user_id, start, end), max_points, method)
+
+
 @login_required
 @user_passes_test(is_coach, login_url='login')
 def assess_player_session(request, session_id, player_id):
@@ -846,6 +745,100 @@ def assess_player_session(request, session_id, player_id):
     return render(request, 'planning/assess_player_form.html', context)
 
 
+def _get_session_for_bulk_assessment(request, session_id):
+    """The session and the user's coach profile; 404 unless the user coaches it (superusers may assess any)."""
+    session = get_object_or_404(Session.objects.select_related('school_group'), pk=session_id)
+    coach_profile = getattr(request.user, 'coach_profile', None)
+    if not request.user.is_superuser and (
+        coach_profile is None or not session.coaches_attending.filter(pk=coach_profile.pk).exists()
+    ):
+        raise Http404("You are not assigned to this session.")
+    return session, coach_profile
+
+
+@login_required
+@user_passes_test(is_coach, login_url='login')
+def bulk_assess_session(request, session_id):
+    """Assess every attendee of a session on one page; saved together in one transaction."""
+    session, coach_profile = _get_session_for_bulk_assessment(request, session_id)
+    players = list(session.attendees.order_by('last_name', 'first_name'))
+
+    if request.method == 'POST':
+        formset = BulkAssessmentFormSet(request.POST, prefix='assessments')
+        if formset.is_valid():
+            rows = {form.cleaned_data['player_id']: form.cleaned_data for form in formset if form.cleaned_data}
+            try:
+                result = save_bulk_assessments(
+                    session, request.user, coach_profile, rows,
+                    mark_complete=bool(request.POST.get('mark_complete'))
+                )
+            except BulkAssessmentError as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(request, f"Saved {result['created'] + result['updated']} assessments for the session on {session.session_date.strftime('%d %b')}.")
+                return redirect('planning:pending_assessments')
+        else:
+            messages.error(request, "Please correct the errors below.")
+    else:
+        existing = {
+            assessment.player_id: assessment
+            for assessment in SessionAssessment.objects.filter(session=session, submitted_by=request.user)
+        }
+        initial = []
+        for player in players:
+            row = {'player_id': player.pk}
+            if player.pk in existing:
+                row.update({name: getattr(existing[player.pk], name) for name in ASSESSMENT_FIELDS})
+            initial.append(row)
+        formset = BulkAssessmentFormSet(initial=initial, prefix='assessments')
+
+    players_by_id = {str(player.pk): player for player in players}
+    context = {
+        'session': session,
+        'formset': formset,
+        'rows': [(players_by_id.get(str(form['player_id'].value())), form) for form in formset],
+        'page_title': f"Assess Players ({session.session_date.strftime('%d %b')})",
+    }
+    return render(request, 'planning/bulk_assess_session.html', context)
+
+
+@login_required
+@user_passes_test(is_coach, login_url='login')
+@require_POST
+def session_assessments_bulk_api(request, session_id):
+    """
+    Saves assessments for many attendees at once.
+    Body: {"assessments": [{"player_id": 1, "effort_rating": 4, ...}, ...], "mark_complete": false}.
+    Every row is validated before anything is written.
+    """
+    session, coach_profile = _get_session_for_bulk_assessment(request, session_id)
+    try:
+        data = json.loads(request.body)
+        submitted = data.get('assessments', [])
+        if not isinstance(submitted, list):
+            raise TypeError("assessments must be a list")
+    except (json.JSONDecodeError, AttributeError, TypeError) as e:
+        return JsonResponse({'status': 'error', 'message': f'Invalid data: {e}'}, status=400)
+
+    rows, errors = {}, {}
+    for index, row in enumerate(submitted):
+        form = BulkAssessmentRowForm(data=row if isinstance(row, dict) else {})
+        if form.is_valid():
+            rows[form.cleaned_data['player_id']] = form.cleaned_data
+        else:
+            errors[str(row.get('player_id', index) if isinstance(row, dict) else index)] = form.errors
+    if errors:
+        return JsonResponse({'status': 'error', 'message': 'Some assessments are invalid.', 'errors': errors}, status=400)
+
+    try:
+        result = save_bulk_assessments(
+            session, request.user, coach_profile, rows, mark_complete=bool(data.get('mark_complete'))
+        )
+    except BulkAssessmentError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'success', **result})
+
+
 @login_required
 @user_passes_test(is_coach, login_url='login')
 def edit_session_assessment(request, assessment_id):
@@ -1006,79 +999,9 @@ def pending_assessments_view(request):
         messages.error(request, "Coach profile not loaded or user is not a coach.")
         return render(request, 'planning/pending_assessments.html', {'pending_items': [], 'page_title': "My Pending Assessments"})
 
-    date_limit_past = timezone.now().date() - timedelta(weeks=4) # Look back 4 weeks
-    today = timezone.now().date()
-
-    # Subquery to check if at least one player assessment was submitted by this coach for a session
-    has_submitted_one_player_assessment_subquery = SessionAssessment.objects.filter(
-        session=OuterRef('pk'),
-        submitted_by=request.user
-    )
-    
-    # Subquery to check if a group assessment was submitted by this coach for a session
-    has_submitted_group_assessment_subquery = GroupAssessment.objects.filter(
-        session=OuterRef('pk'),
-        assessing_coach=request.user
-    )
-
-    # Get sessions attended by the coach within the date range that are not yet fully marked as complete for player assessments
-    # AND do not have a group assessment by this coach yet.
-    sessions_attended_by_coach = Session.objects.filter(
-        coaches_attending=coach_profile,
-        session_date__gte=date_limit_past,
-        session_date__lte=today,
-        is_cancelled=False # Exclude cancelled sessions
-    ).annotate(
-        # Check if player assessments are considered done by the coach for this session
-        player_assessments_done_by_coach=Exists(
-            CoachSessionCompletion.objects.filter(
-                session=OuterRef('pk'),
-                coach=coach_profile,
-                assessments_submitted=True
-            )
-        ),
-        # Check if a group assessment exists for this session by this coach
-        group_assessment_submitted_by_coach=Exists(has_submitted_group_assessment_subquery),
-        # Keep your existing logic for checking if at least one player assessment was made
-        coach_has_submitted_one_player_assessment=Exists(has_submitted_one_player_assessment_subquery)
-    ).select_related('school_group', 'venue').prefetch_related(
-        'attendees',
-        Prefetch('session_assessments', queryset=SessionAssessment.objects.filter(submitted_by=request.user), to_attr='assessments_by_this_coach')
-    ).distinct().order_by('-session_date', '-session_start_time')
-
-    pending_items_for_template = []
-    for session in sessions_attended_by_coach:
-        # Only consider sessions that have actually ended
-        if session.end_datetime and session.end_datetime > timezone.now():
-            continue
-
-        # Player assessment logic (largely as before)
-        players_in_session = list(session.attendees.all())
-        assessed_player_ids_by_this_coach = {
-            assessment.player_id for assessment in session.assessments_by_this_coach
-        }
-        players_to_assess_for_this_session = [
-            player for player in players_in_session if player.id not in assessed_player_ids_by_this_coach
-        ]
-        
-        # Determine if the "Mark Player Assessments Complete" button should show
-        # This button should appear if there are players in the session AND
-        # (either all players assigned to the coach are assessed OR at least one assessment has been made if list is long)
-        # AND the coach hasn't already marked player assessments as complete for this session.
-        coach_can_mark_player_assessments_complete = False
-        if not session.player_assessments_done_by_coach and players_in_session:
-            if not players_to_assess_for_this_session or session.coach_has_submitted_one_player_assessment:
-                coach_can_mark_player_assessments_complete = True
-        
-        # If player assessments are not done OR group assessment is not done, then this session is "pending"
-        if not session.player_assessments_done_by_coach or not session.group_assessment_submitted_by_coach:
-            pending_items_for_template.append({
-                'session': session,
-                'players_to_assess': players_to_assess_for_this_session,
-                'all_players_assessed_by_coach': not players_to_assess_for_this_session and players_in_session, # True if no players left to assess
-                'coach_can_mark_player_assessments_complete': coach_can_mark_player_assessments_complete,
-                'group_assessment_submitted': session.group_assessment_submitted_by_coach, # Pass this to the template
-            })
+    # Counts and flags come from the assessment ledger; player lists are fetched per
+    # session only when the coach expands it (pending_assessment_players_view).
+    pending_items_for_template = build_pending_items(get_pending_assessment_sessions(coach_profile))
 
     context = {
         'pending_items': pending_items_for_template,
@@ -1087,6 +1010,19 @@ def pending_assessments_view(request):
     return render(request, 'planning/pending_assessments.html', context)
 
 
+@login_required
+@user_passes_test(is_coach, login_url='login')
+@require_GET
+def pending_assessment_players_view(request, session_id):
+    """The players the coach still has to assess for one session, as rendered list items in JSON."""
+    session = get_object_or_404(Session, pk=session_id, coaches_attending__user=request.user)
+    players = get_players_to_assess(session, request.user)
+    html = render_to_string(
+        'planning/pending_assessments/_players.html', {'session': session, 'players': players}, request=request
+    )
+    return JsonResponse({'session_id': session.pk, 'count': len(players), 'html': html})
+
+
 @login_required
 @user_passes_test(is_coach, login_url='login')
 def add_coach_feedback(request, player_id):
@@ -1286,9 +1222,8 @@ def add_match_result(request, player_id):
 @user_passes_test(is_coach, login_url='login') 
 def session_list(request):
     user = request.user
-    sessions_queryset = Session.objects.select_related('school_group').prefetch_related('coaches_attending')
+    sessions_queryset = Session.objects.select_related('school_group', 'venue')
     if user.is_superuser: 
-        sessions_list = sessions_queryset.order_by('-session_date', '-session_start_time')
         page_title = 'All Sessions'
     else:
         try:
@@ -1296,19 +1231,39 @@ def session_list(request):
                 coach_profile = user.coach_profile
             else: 
                 coach_profile = Coach.objects.get(user=user)
-            sessions_list = sessions_queryset.filter(coaches_attending=coach_profile).order_by('-session_date', '-session_start_time')
+            sessions_queryset = sessions_queryset.filter(coaches_attending=coach_profile)
             page_title = 'My Assigned Sessions'
         except (ObjectDoesNotExist, AttributeError): 
             messages.warning(request, "Your user account is not linked to a Coach profile.")
-            sessions_list = Session.objects.none()
+            sessions_queryset = Session.objects.none()
             page_title = 'My Assigned Sessions'
+    page = KeysetPaginator(sessions_queryset, SESSION_LIST_ORDERING, LIST_PAGE_SIZE).page(request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return _keyset_page_json(request, 'planning/session_list/_rows.html', {'sessions_list': page}, page)
     context = {
-        'sessions_list': sessions_list, 
+        'sessions_list': page, 
         'page_title': page_title
     }
     return render(request, 'planning/session_list.html', context)
 
 
+def _keyset_page_json(request, template_name, context, page, cursor_param='cursor'):
+    """One keyset page as rendered rows, with the URL of the page after it, for infinite scroll."""
+    next_url = None
+    if page.has_next:
+        params = request.GET.copy()
+        params.pop('format', None)
+        params[cursor_param] = page.next_cursor
+        next_url = f"{request.path}?{params.urlencode()}"
+    return JsonResponse({
+        'status': 'success',
+        'html': render_to_string(template_name, context, request=request),
+        'count': len(page),
+        'next_cursor': page.next_cursor,
+        'next_url': next_url,
+    })
+
+
 @login_required
 @user_passes_test(is_coach, login_url='login')
 def session_detail(request, session_id):
@@ -1484,6 +1439,7 @@ def players_list_view(request):
     groups = SchoolGroup.objects.all().order_by('name')
     selected_group_id = request.GET.get('group')
     search_query = request.GET.get('search', '')
+    search_capped = False
     players = Player.objects.filter(is_active=True)
     if selected_group_id: 
         players = players.filter(school_groups__id=selected_group_id)
@@ -1491,22 +1447,47 @@ def players_list_view(request):
     else: 
         page_title = "All Active Players"
     if search_query:
-        players = players.filter(
-            Q(first_name__icontains=search_query) | Q(last_name__icontains=search_query)
-        )
+        matches = search_players(search_query, limit=PLAYER_LIST_SEARCH_LIMIT, players=players)
+        # Search ranks rather than filters; say so when the best matches were cut off.
+        search_capped = len(matches) >= PLAYER_LIST_SEARCH_LIMIT
+        players = players.filter(pk__in=[player.pk for player in matches])
         if selected_group_id: 
             page_title += f" matching '{search_query}'"
         else: 
             page_title = f"Active Players matching '{search_query}'"
-    players = players.order_by('last_name', 'first_name').distinct()
+    players = players.prefetch_related('school_groups')
+    page = KeysetPaginator(players, PLAYER_LIST_ORDERING, LIST_PAGE_SIZE).page(request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return _keyset_page_json(request, 'planning/players_list/_rows.html', {'players': page}, page)
     context = {
-        'players': players, 'groups': groups, 
+        'players': page, 'groups': groups, 
         'selected_group_id': selected_group_id, 
-        'search_query': search_query, 'page_title': page_title
+        'search_query': search_query, 'page_title': page_title,
+        'search_capped': search_capped, 'search_limit': PLAYER_LIST_SEARCH_LIMIT,
     }
     return render(request, 'planning/players_list.html', context)
 
 
+@login_required
+@user_passes_test(is_coach, login_url='login')
+@require_GET
+def player_search_api(request):
+    """Typeahead: players matching ?q=, best match first (substring, then fuzzy)."""
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid limit.'}, status=400)
+    players = Player.objects.all() if request.GET.get('include_inactive') else Player.objects.filter(is_active=True)
+    results = search_players(request.GET.get('q', ''), limit=limit, players=players)
+    return JsonResponse({
+        'status': 'success',
+        'results': [
+            {'id': player.pk, 'name': player.full_name, 'url': reverse('planning:player_profile', args=[player.pk])}
+            for player in results
+        ],
+    })
+
+
 @login_required
 @user_passes_test(is_coach, login_url='login')
 def one_page_plan_view(request, session_id):
@@ -1531,7 +1512,7 @@ def one_page_plan_view(request, session_id):
 @login_required
 @user_passes_test(is_coach, login_url='login') 
 def session_calendar_view(request):
-    current_django_tz = timezone.get_current_timezone()
+    """The calendar shell; its events come from session_calendar_events_api for the range on screen."""
     user = request.user
     try:
         year = int(request.GET.get('year', timezone.now().year))
@@ -1544,91 +1525,80 @@ def session_calendar_view(request):
         year = now_in_current_tz.year
         month = now_in_current_tz.month
         current_date_for_nav = date_obj(year, month, 1) 
-    
-    prev_month_date = current_date_for_nav - timedelta(days=1)
-    prev_month_date = prev_month_date.replace(day=1)   
-    if current_date_for_nav.month == 12: 
-        next_month_date = date_obj(current_date_for_nav.year + 1, 1, 1) 
-    else: 
-        next_month_date = date_obj(current_date_for_nav.year, current_date_for_nav.month + 1, 1) 
-    
-    sessions_base_qs = Session.objects.filter(
-        session_date__year=year, session_date__month=month
-    ).select_related('school_group').prefetch_related('coaches_attending', 'attendees')
-    
-    if user.is_superuser: 
-        sessions_for_month = sessions_base_qs.order_by('session_date', 'session_start_time')
-    elif hasattr(user, 'coach_profile') and user.coach_profile: 
-        coach_profile = user.coach_profile
-        sessions_for_month = sessions_base_qs.filter(coaches_attending=coach_profile).order_by('session_date', 'session_start_time')
-    else:
-        try: 
-            coach_profile = Coach.objects.get(user=user)
-            sessions_for_month = sessions_base_qs.filter(coaches_attending=coach_profile).order_by('session_date', 'session_start_time')
-        except Coach.DoesNotExist: 
-            sessions_for_month = Session.objects.none()
-            if not user.is_superuser : 
-                messages.warning(request, "Your user account is not linked to a Coach profile.")
-                
-    PREDEFINED_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf', '#aec7e8', '#ffbb78', '#98df8a', '#ff9896', '#c5b0d5', '#c49c94', '#f7b6d2', '#c7c7c7', '#dbdb8d', '#9edae5']
-    school_group_colors = {}
-    color_index = 0
-    unique_school_groups_in_month = SchoolGroup.objects.filter(sessions__in=sessions_for_month).distinct()
-    for sg in unique_school_groups_in_month:
-        if sg.id not in school_group_colors: 
-            school_group_colors[sg.id] = PREDEFINED_COLORS[color_index % len(PREDEFINED_COLORS)]
-            color_index += 1
-            
-    calendar_events = []
-    for session in sessions_for_month:
-        s_start_time = session.session_start_time if session.session_start_time else time.min
-        naive_start_datetime = dt_class.combine(session.session_date, s_start_time)
-        start_datetime_aware = naive_start_datetime.replace(tzinfo=current_django_tz)
-        end_datetime_aware = start_datetime_aware + timedelta(minutes=session.planned_duration_minutes)
-        coaches_list = [coach.name for coach in session.coaches_attending.all()]
-        if not coaches_list and hasattr(session, 'get_assigned_coaches_display'): 
-            coaches_list = [session.get_assigned_coaches_display()]
-        time_str_display = s_start_time.strftime('%H:%M')
-        school_group_name = session.school_group.name if session.school_group else "No Group"
-        event_title = f"{time_str_display} - {school_group_name}"
-        event_custom_color = school_group_colors.get(session.school_group_id) if session.school_group else None 
-        final_event_color = '#d3d3d3' if session.is_cancelled else event_custom_color
-        final_text_color = '#a9a9a9' if session.is_cancelled else ('#FFFFFF' if event_custom_color else None)
-        calendar_events.append({
-            'id': session.pk, 'title': event_title, 
-            'start': start_datetime_aware.isoformat(), 'end': end_datetime_aware.isoformat(), 
-            'allDay': False, 'color': final_event_color, 'textColor': final_text_color, 
-            'borderColor': final_event_color, 
-            'extendedProps': {
-                'school_group_name': school_group_name, 
-                'session_time_str': f"{s_start_time.strftime('%H:%M')} - {end_datetime_aware.strftime('%H:%M')}", 
-                'venue_name': getattr(session, 'venue_name', session.venue.name if session.venue else "N/A"), # Corrected venue access
-                'coaches_attending': coaches_list, 
-                'attendees_count': session.attendees.count(), 
-                'duration_minutes': session.planned_duration_minutes, 
-                'is_cancelled_bool': session.is_cancelled, 
-                'status_display': "Cancelled" if session.is_cancelled else "Scheduled", 
-                'notes': session.notes if session.notes else "", 
-                'admin_url': reverse('admin:planning_session_change', args=[session.pk]) if request.user.is_superuser else None, 
-                'session_planner_url': reverse('planning:session_detail', args=[session.pk]), 
-                'event_custom_color': final_event_color
-            }
-        })
-        
+
+    if not user.is_superuser and not Coach.objects.filter(user=user).exists():
+        messages.warning(request, "Your user account is not linked to a Coach profile.")
+
     context = {
-        'calendar_events_json': json.dumps(calendar_events), 
+        'initial_date': current_date_for_nav.isoformat(),
         'current_year': year, 'current_month': month, 
-        'current_month_display': current_date_for_nav.strftime('%B %Y'), 
-        'prev_year': prev_month_date.year, 'prev_month': prev_month_date.month, 
-        'next_year': next_month_date.year, 'next_month': next_month_date.month, 
         'page_title': 'Session Calendar', 
-        'is_staff_user': request.user.is_staff
+        'is_staff_user': request.user.is_staff,
+        'feed_url': _calendar_feed_url(request, FEED_SCOPE_MINE),
+        'all_sessions_feed_url': _calendar_feed_url(request, FEED_SCOPE_ALL) if user.is_superuser else None,
     }
     return render(request, 'planning/session_calendar.html', context)
 
+
+def _calendar_feed_url(request, scope):
+    """webcal:// URL of the user's subscribable .ics feed."""
+    url = request.build_absolute_uri(
+        reverse('planning:session_calendar_feed', args=[make_feed_token(request.user, scope)])
+    )
+    return 'webcal://' + url.split('://', 1)[1]
+
+
 @login_required
 @user_passes_test(is_coach, login_url='login')
+@require_GET
+def session_calendar_events_api(request):
+    """
+    FullCalendar event feed: the user's sessions from ?start= up to ?end=. Cached per user
+    and range; the ETag follows the cache key, so an unchanged range costs a 304.
+    """
+    try:
+        start_date, end_date = parse_calendar_range(request.GET.get('start'), request.GET.get('end'))
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    cache_key = calendar_cache_key(request.user, start_date, end_date)
+    etag = '"%s"' % hashlib.md5(cache_key.encode()).hexdigest()
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(get_calendar_events(request.user, start_date, end_date, cache_key), safe=False)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@require_GET
+def session_calendar_feed_view(request, token):
+    """
+    Subscribable .ics feed (webcal://) of the token owner's sessions, or of every session
+    for an admin token, over a rolling window. No login: calendar apps authenticate with
+    the signed token. Each request looks up the token's user (one query); polls of an
+    unchanged feed are then answered with a 304, or with the cached body, without
+    querying the sessions.
+    """
+    user, scope = user_for_feed_token(token)
+    if user is None:
+        raise Http404("Unknown calendar feed.")
+    today = timezone.localdate()
+    cache_key, etag, last_modified = feed_state(user, scope, today)
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    if request.headers.get('If-None-Match') == etag or (
+        'If-None-Match' not in request.headers and if_modified_since and if_modified_since >= last_modified
+    ):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(get_feed_body(user, scope, cache_key, today), content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="squashsync_sessions.ics"'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 @login_required
+@user_passes_test(is_coach, login_url='login')
 def export_sessions_ics_view(request):
     """
     Generates and serves an iCalendar (.ics) file for a coach's or all sessions
@@ -1643,73 +1613,37 @@ def export_sessions_ics_view(request):
         year = now.year
         month = now.month
 
-    sessions_qs = Session.objects.none()
-
-    if user.is_superuser:
-        sessions_qs = Session.objects.filter(
-            session_date__year=year, 
-            session_date__month=month,
-            is_cancelled=False
-        )
-    else:
-        try:
-            # It's better to get the Coach profile via the user object
-            coach_profile = Coach.objects.get(user=request.user)
-            sessions_qs = Session.objects.filter(
-                coaches_attending=coach_profile,
-                session_date__year=year,
-                session_date__month=month,
-                is_cancelled=False
-            )
-        except Coach.DoesNotExist:
+    sessions_qs = Session.objects.filter(session_date__year=year, session_date__month=month, is_cancelled=False)
+    if not user.is_superuser:
+        coach_profile = Coach.objects.filter(user=user).first()
+        if coach_profile is None:
             messages.error(request, "Your user account is not linked to a Coach profile.")
             return redirect('planning:session_calendar')
-    
-    # Eager load related data for efficiency
+        sessions_qs = sessions_qs.filter(coaches_attending=coach_profile)
     sessions_qs = sessions_qs.select_related('school_group', 'venue').prefetch_related('coaches_attending')
 
-    cal = Calendar()
-    for session in sessions_qs:
-        # Skip if crucial date/time info is missing
-        if not (session.session_date and session.session_start_time):
-            continue
-
-        start_datetime = timezone.make_aware(
-            dt_class.combine(session.session_date, session.session_start_time)
-        )
-        end_datetime = start_datetime + timedelta(minutes=session.planned_duration_minutes)
-        
-        coaches_str = ", ".join([coach.name for coach in session.coaches_attending.all()])
-        
-        e = Event()
-        e.name = f"{session.school_group.name if session.school_group else 'Session'}"
-        e.begin = start_datetime
-        e.end = end_datetime
-        e.description = f"Coaches: {coaches_str}\nNotes: {session.notes}"
-        if session.venue:
-            e.location = session.venue.name
-
-        # --- CORRECTED ATTENDEE LOGIC ---
-        # Create a list of Attendee objects only from saved Coach instances with an email
-        attendees = []
-        for coach in session.coaches_attending.all():
-            # This check prevents the "unhashable" error by ensuring the coach object is valid
-            if coach.pk and coach.email:
-                attendees.append(Attendee(f"mailto:{coach.email}", common_name=coach.name))
-        
-        # The ics library handles making this a set internally if needed
-        e.attendees = attendees
-        # --- END CORRECTION ---
-
-        cal.events.add(e)
-
-    response = HttpResponse(str(cal), content_type='text/calendar')
+    response = HttpResponse(build_ics(sessions_qs).serialize(), content_type='text/calendar')
     response['Content-Disposition'] = f'attachment; filename="squashsync_sessions_{year}_{month:02d}.ics"'
     return response
 
 @login_required
 @user_passes_test(is_coach, login_url='login')
+@require_GET
+def export_schedule_csv(request):
+    """
+    Streams sessions, attendance or assessments (?kind=) as CSV for any date range
+    (?start=&end=), optionally filtered by ?group=, ?coach=, ?venue= and ?cancelled=.
+    Hidden assessments are only included for superusers.
+    """
+    try:
+        filters = parse_export_filters(request.GET)
+    except ValueError as e:
+        return HttpResponse(f"Invalid export parameters: {e}", status=400)
+    return _streaming_csv_response(filters, include_hidden=request.user.is_superuser)
+
+
 @login_required
+@user_passes_test(is_coach, login_url='login')
 def export_monthly_schedule_csv(request):
     """
     Generates and serves a CSV file of all sessions for a given month and year.
@@ -1717,38 +1651,19 @@ def export_monthly_schedule_csv(request):
     try:
         year = int(request.GET.get('year'))
         month = int(request.GET.get('month'))
+        start_date, end_date = get_month_start_end(year, month)
     except (ValueError, TypeError):
         return HttpResponse("Invalid year or month provided.", status=400)
 
-    start_date, end_date = get_month_start_end(year, month)
-    
-    sessions_for_month = Session.objects.filter(
-        session_date__gte=start_date,
-        session_date__lte=end_date
-    ).select_related('school_group', 'venue').prefetch_related('coaches_attending').order_by('session_date', 'session_start_time')
-
-    response = HttpResponse(content_type='text/csv')
+    filters = parse_export_filters({'start': start_date.isoformat(), 'end': end_date.isoformat()})
+    response = _streaming_csv_response(filters)
     response['Content-Disposition'] = f'attachment; filename="sessions_{year}_{month:02d}.csv"'
+    return response
 
-    writer = csv.writer(response)
-    writer.writerow(['Date', 'Day', 'Time Slot', 'Group', 'Coaches', 'Venue', 'Status'])
-
-    for session in sessions_for_month:
-        start_time = session.session_start_time.strftime('%H:%M')
-        end_time = (session.start_datetime + timedelta(minutes=session.planned_duration_minutes)).strftime('%H:%M')
-        time_slot = f"{start_time} - {end_time}"
-        coaches_str = ", ".join([coach.name for coach in session.coaches_attending.all()]) or "N/A"
-        
-        writer.writerow([
-            session.session_date,
-            session.session_date.strftime('%A'),
-            time_slot,
-            session.school_group.name if session.school_group else "N/A",
-            coaches_str,
-            session.venue.name if session.venue else "N/A",
-            "Cancelled" if session.is_cancelled else "Scheduled"
-        ])
 
+def _streaming_csv_response(filters, include_hidden=False):
+    response = StreamingHttpResponse(stream_csv(export_rows(filters, include_hidden)), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(filters)}"'
     return response
 
 
@@ -1990,46 +1905,9 @@ def set_bulk_availability_view(request):
         selected_year = int(request.POST.get('year'))
         start_date, end_date = get_month_start_end(selected_year, selected_month)
         
-        rules = ScheduledClass.objects.filter(is_active=True)
-        
-        availability_updated_count = 0
-
-        for rule in rules:
-            availability_key = f'availability_rule_{rule.id}'
-            availability_status_str = request.POST.get(availability_key)
-
-            if not availability_status_str or availability_status_str == 'NO_CHANGE':
-                continue
-
-            is_available = None
-            notes = ""
-            if availability_status_str == 'AVAILABLE':
-                is_available = True
-            elif availability_status_str == 'UNAVAILABLE':
-                is_available = False
-            elif availability_status_str == 'EMERGENCY':
-                is_available = True # Mark as available
-                notes = "Emergency only" # Add a note to signify emergency status
-
-            sessions_to_update = Session.objects.filter(
-                generated_from_rule=rule,
-                session_date__gte=start_date,
-                session_date__lte=end_date,
-                is_cancelled=False
-            )
-            
-            for session in sessions_to_update:
-                CoachAvailability.objects.update_or_create(
-                    coach=request.user,
-                    session=session,
-                    defaults={
-                        'is_available': is_available,
-                        'notes': notes,
-                        'status_updated_at': timezone.now()
-                    }
-                )
-                availability_updated_count += 1
-        
+        statuses = bulk_statuses_from_post(request.POST, ScheduledClass.objects.filter(is_active=True).only('pk'))
+        availability_updated_count = apply_bulk_availability(request.user, statuses, start_date, end_date)
+
         month_name = calendar.month_name[selected_month]
         messages.success(request, f"Your availability preference for {availability_updated_count} potential sessions in {month_name} {selected_year} has been recorded.")
         return redirect(f"{reverse('planning:set_bulk_availability')}?year={selected_year}&month={selected_month}")
@@ -2047,15 +1925,17 @@ def set_bulk_availability_view(request):
     # Fetch all active scheduled classes
     scheduled_classes_qs = ScheduledClass.objects.filter(is_active=True).select_related('school_group', 'default_venue').order_by('day_of_week', 'start_time')
 
-    # Get the coach's current availability for these rules in the selected month
-    # This is complex because availability is per-session, not per-rule.
-    # We will handle the initial state in the template for simplicity for now.
-    
+    # The coach's current availability per rule for the month pre-fills the form.
+    scheduled_classes = list(scheduled_classes_qs)
+    start_date, end_date = get_month_start_end(selected_year, selected_month)
+    rule_states = rule_availability_states(request.user, [rule.pk for rule in scheduled_classes], start_date, end_date)
+
     # Group scheduled classes by day of the week
     grouped_classes = {
         'Monday': [], 'Tuesday': [], 'Wednesday': [], 'Thursday': [], 'Friday': [], 'Saturday': [], 'Sunday': []
     }
-    for rule in scheduled_classes_qs:
+    for rule in scheduled_classes:
+        rule.current_availability = rule_states.get(rule.pk, STATE_NONE)
         day_name = rule.get_day_of_week_display()
         if day_name in grouped_classes:
             grouped_classes[day_name].append(rule)
@@ -2167,69 +2047,11 @@ def school_group_profile(request, group_id):
 
 
     # --- Attendance Calculations ---
-    group_average_attendance = 0
-    player_attendance_in_group = []
-    
-    # Get all relevant past/current sessions for this group within the filtered period
-    relevant_sessions = Session.objects.filter(
-        school_group=school_group,
-        session_date__gte=start_date_filter,
-        session_date__lte=end_date_filter, # Ensure we only count sessions up to 'today' or selected end date
-        is_cancelled=False
-    ).prefetch_related('attendees') # Prefetch attendees for efficiency
-
-    total_session_percentage_sum = 0
-    sessions_counted_for_group_average = 0
-
-    # V1 Assumption: For group average, "expected" attendees for a session are current members of the group.
-    # This doesn't perfectly account for players joining/leaving the group over the period.
-    current_group_member_count = players_in_group.count()
-
-    if current_group_member_count > 0 and relevant_sessions.exists():
-        for session in relevant_sessions:
-            # Ensure session has actually passed or is today (and ended) to be counted for attendance
-            if session.end_datetime and session.end_datetime > timezone.now():
-                continue # Skip future sessions
-
-            actual_attendees_count = session.attendees.count()
-            # We use current_group_member_count as the 'expected' for V1 simplicity.
-            # A more accurate historical 'expected' would require tracking player-group membership over time.
-            if current_group_member_count > 0: # Avoid division by zero
-                session_attendance_percentage = (actual_attendees_count / current_group_member_count) * 100
-                total_session_percentage_sum += session_attendance_percentage
-                sessions_counted_for_group_average += 1
-        
-        if sessions_counted_for_group_average > 0:
-            group_average_attendance = total_session_percentage_sum / sessions_counted_for_group_average
-
-    # Individual Player Attendance for this Group's Sessions
-    for player in players_in_group:
-        sessions_player_attended_for_this_group = 0
-        # "Expected" sessions for this player within this group's schedule for the period
-        # V1 Assumption: If a player is currently in the group, they were "expected" at all group sessions
-        # during the filtered period. This doesn't account for when they joined/left the group.
-        total_group_sessions_in_period_for_player = 0
-
-        for session in relevant_sessions:
-             # Ensure session has actually passed or is today (and ended)
-            if session.end_datetime and session.end_datetime > timezone.now():
-                continue
-            
-            total_group_sessions_in_period_for_player +=1 # Counted as an expected session for current members
-
-            if player in session.attendees.all():
-                sessions_player_attended_for_this_group += 1
-        
-        player_group_attendance_percentage = 0
-        if total_group_sessions_in_period_for_player > 0:
-            player_group_attendance_percentage = (sessions_player_attended_for_this_group / total_group_sessions_in_period_for_player) * 100
-        
-        player_attendance_in_group.append({
-            'player': player,
-            'attended_sessions': sessions_player_attended_for_this_group,
-            'total_group_sessions': total_group_sessions_in_period_for_player,
-            'percentage': player_group_attendance_percentage
-        })
+    # Each player is expected at the sessions held while they were in the group (PlayerGroupMembership).
+    players_in_group = list(players_in_group)
+    player_attendance_in_group, group_average_attendance = group_attendance_summary(
+        school_group, players_in_group, start_date_filter, end_date_filter
+    )
 
     context = {
         'school_group': school_group,
@@ -2364,25 +2186,51 @@ def coach_profile_view(request, coach_id=None):
     }
     # --- End Availability Summary Calculation ---
 
-    # Fetch other data for the profile (sessions attended, assessments, events, hours coached)
-    # (Using the logic from our previous step for these)
-    sessions_attended = Session.objects.filter(coaches_attending=target_coach_profile, session_date__lte=timezone.now().date()).order_by('-session_date', '-session_start_time')
-    player_assessments_made = SessionAssessment.objects.filter(submitted_by=target_coach_user).select_related('player', 'session', 'session__school_group').order_by('-date_recorded')
-    group_assessments_made = GroupAssessment.objects.filter(assessing_coach=target_coach_user).select_related('session', 'session__school_group').order_by('-assessment_datetime')
-    events_attended = Event.objects.filter(attending_coaches=target_coach_profile).order_by('-event_date')
-    
-    total_minutes_coached = 0
-    for session in sessions_attended.filter(is_cancelled=False): # Only count non-cancelled
-        total_minutes_coached += session.planned_duration_minutes
+    # Sessions attended, assessments and events are paged by keyset: one page per section,
+    # each with its own cursor, the rest loaded as the section's list is scrolled.
+    sessions_attended = Session.objects.filter(
+        coaches_attending=target_coach_profile, session_date__lte=timezone.now().date()
+    ).select_related('school_group', 'venue')
+    profile_sections = {
+        'sessions': (sessions_attended, SESSION_LIST_ORDERING),
+        'assessments': (
+            SessionAssessment.objects.filter(submitted_by=target_coach_user).select_related('player', 'session', 'session__school_group'),
+            ('-date_recorded', '-id'),
+        ),
+        'group_assessments': (
+            GroupAssessment.objects.filter(assessing_coach=target_coach_user).select_related('session', 'session__school_group'),
+            ('-assessment_datetime', '-id'),
+        ),
+        'events': (Event.objects.filter(attending_coaches=target_coach_profile), ('-event_date', '-id')),
+    }
+    section = request.GET.get('section')
+    if request.GET.get('format') == 'json':
+        if section not in profile_sections:
+            return JsonResponse({'status': 'error', 'message': 'Unknown section.'}, status=400)
+        queryset, ordering = profile_sections[section]
+        page = KeysetPaginator(queryset, ordering, COACH_PROFILE_PAGE_SIZE).page(request.GET.get(f'{section}_cursor'))
+        return _keyset_page_json(
+            request, f'planning/coach_profile/_{section}.html', {'items': page}, page, cursor_param=f'{section}_cursor'
+        )
+    section_pages = {
+        name: KeysetPaginator(queryset, ordering, COACH_PROFILE_PAGE_SIZE).page(request.GET.get(f'{name}_cursor'))
+        for name, (queryset, ordering) in profile_sections.items()
+    }
+    section_counts = {name: queryset.count() for name, (queryset, _) in profile_sections.items()}
+
+    total_minutes_coached = sessions_attended.filter(is_cancelled=False).aggregate(
+        total=Sum('planned_duration_minutes')
+    )['total'] or 0 # Only count non-cancelled
     total_hours_coached = total_minutes_coached / 60 if total_minutes_coached > 0 else 0
 
     context = {
         'target_coach': target_coach_profile,
         'viewing_own_profile': viewing_own_profile,
-        'sessions_attended': sessions_attended,
-        'player_assessments_made': player_assessments_made,
-        'group_assessments_made': group_assessments_made,
-        'events_attended': events_attended,
+        'sessions_attended': section_pages['sessions'],
+        'player_assessments_made': section_pages['assessments'],
+        'group_assessments_made': section_pages['group_assessments'],
+        'events_attended': section_pages['events'],
+        'section_counts': section_counts,
         'availability_filter_form': availability_filter_form, # Add form to context
         'availability_summary': availability_summary_calculated, # Use the new calculated summary
         'total_hours_coached': total_hours_coached,